@@ -11,6 +11,9 @@
        - `start`, `stop` paradigms to launch *Office instances
          and to facilitate `setup`, `tearDown` unit testing steps 
 
+    Importing the module starts nothing: the *Office instance behind
+    `XSCRIPTCONTEXT` is started on first access, cf. `warm_up`.
+
     Instructions:
 
     1.   Copy this module into your <OFFICE>/program/ directory
@@ -52,14 +55,20 @@
         my_own_macro()  # Run
 
     Imports:
+        asyncio - concurrent connections
+        getpass, hashlib - user profile template names
         itertools - retry decorator
         json - services' running conditions
         logging
         officehelper - bootstrap *Office
         os - Check file
         re - Parse UNO-URL's
+        shutil, tempfile - user profile clones
+        psutil - optional, measure *Office memory
+        random - jittered retry delays
         subprocess - Control *Office services
         sys - Identify platform
+        threading - Runner leases
         time - sleep
         traceback
         uno
@@ -69,20 +78,24 @@
 
     Exceptions:
         BootstrapException - from `officehelper`
-        NoConnectException - in `ScriptContext`
+        NoConnectException - in `ScriptContext`, past the deadline
         NotImplementedError - in `ScriptContext`
         OSError, RuntimeError - in `Runner`
         RuntimeException - in stop
 
     Classes:
-        `Runner(soffice=None)` - Start, stop *Office services
+        `Runner(soffice=None, size=0, ..)` - Start, stop, pool *Office services
+        `OfficeInstance(pgm, options)` - One pooled *Office process
         `ScriptContext(ctx)` - Implement XSCRIPTCONTEXT
 
     Functions:
         `connect(host="localhost", port=2002, pipe=None)`
+        `connect_async(host="localhost", port=2002, pipe=None)`
         `start(soffice=None)` - Start *Office services
         `stop` - Stop *Office services
+        `warm_up` - Start the `XSCRIPTCONTEXT` instance ahead of use
         `killall_soffice` - Interrupt `soffice` running tasks
+        `profile_template(pgm)` - Build an initialized user profile once
 
     see also::
         `help(officehelper)`
@@ -107,25 +120,39 @@
 """
 from __future__ import print_function
 
-import atexit, \
+import asyncio, \
+    atexit, \
+    contextlib, \
+    getpass, \
+    hashlib, \
     itertools, \
     json, \
     logging, \
     officehelper, \
     os, \
+    random, \
     re, \
+    shutil, \
     subprocess, \
     sys, \
+    tempfile, \
+    threading, \
     time, \
     traceback, \
     uno
 
+try:
+    import psutil  # optional, RSS of soffice process trees
+except ImportError:
+    psutil = None  # then RSS is read from /proc, on Linux only
+
 _INFO, _DEBUG, _EMULATE_OFFICEHELPER = False, False, True
 logging.basicConfig(format='%(asctime)s %(levelname)8s %(message)s')
 if _INFO: logging.getLogger().setLevel(logging.INFO)
 if _DEBUG: logging.getLogger().setLevel(logging.DEBUG)
 
 #from uno import RuntimeException
+from com.sun.star.beans import PropertyValue
 from com.sun.star.lang import DisposedException
 from com.sun.star.script.provider import XScriptContext
 from com.sun.star.connection import NoConnectException
@@ -133,7 +160,18 @@ from officehelper import BootstrapException
 
 
 RUNNERS = 'Runners.json'
-_SECONDS = 3
+CONNECT_DEADLINE = 60  # seconds, beyond which an instance is deemed dead
+PING_TIMEOUT = 10  # seconds, beyond which an instance is deemed hung
+STOP_TIMEOUT = 10  # seconds granted to terminate() before a kill
+POOL_OPTIONS = ['--headless', '--invisible', '--nodefault', '--nologo',
+                '--norestore', '--nolockcheck']  # warm pool instances
+PROFILE_TIMEOUT = 120  # seconds granted to a first-run profile creation
+START_ATTEMPTS = 3  # launches granted to an instance that won't start
+PROFILE_TMPFS = os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK)
+if PROFILE_TMPFS:
+    PROFILE_ROOT = '/dev/shm'  # tmpfs: profile copies cost no disk I/O
+else:
+    PROFILE_ROOT = tempfile.gettempdir()
 
 if "UNO_PATH" in os.environ: logging.debug(os.environ["UNO_PATH"])
 
@@ -191,16 +229,140 @@ def create_service():
         json.dump(services, f)
 
 
+class OfficeInstance():
+    """ One (Libre|Open)Office process of a `Runner` pool
+
+    Holds the process, its UNO-URL and component context, and counts
+    the documents served since it was last (re)started. Given a
+    `profile_template`, each (re)start runs on a fresh private copy of
+    it, removed once the process is stopped.
+
+    see also: `Runner.lease`
+    """
+
+    def __init__(self, pgm, options):
+        self.pgm = pgm
+        self.options = list(options)  # [accept, *options]
+        self.uno_url = Runner._accept2Uno(self.options[0])
+        self.process = None
+        self.ctx = None
+        self.documents = 0  # served since (re)start
+        self.starts = 0
+        self.profile_template = None  # cf. `profile_template()`
+        self.profile = None  # private copy in use
+    def __repr__(self):
+        return '<OfficeInstance %s pid=%s documents=%d>' % (
+            self.uno_url, self.pid, self.documents)
+    @property
+    def pid(self):
+        return self.process.pid if self.process is not None else None
+    @property
+    def script_context(self):
+        return ScriptContext(self.ctx)
+    def start(self, ctx_pool, deadline=CONNECT_DEADLINE):
+        ''' Launch the process and connect to it, feeding `ctx_pool` '''
+        self.launch()
+        self.connect(ctx_pool, deadline)
+    def launch(self):
+        ''' Spawn the process, without waiting for it to be ready '''
+        options = list(self.options)
+        if self.profile_template is not None:
+            self._removeProfile()
+            self.profile = _clone_profile(self.profile_template)
+            options.append('-env:UserInstallation='
+                           + uno.systemPathToFileUrl(self.profile))
+        try:
+            self.process = subprocess.Popen([self.pgm] + options)
+        except OSError:
+            self._removeProfile()
+            raise
+        logging.debug('STARTed.. %s %s' % (self.pgm, ' '.join(options)))
+    def connect(self, ctx_pool, deadline=CONNECT_DEADLINE):
+        ''' Probe the launched process until it accepts UNO connections '''
+        ctx_pool.pop(self.uno_url, None)  # context of a previous process
+        self.ctx = ScriptContext._connect(ctx_pool, uno_url=self.uno_url,
+            flush=True, deadline=deadline, process=self.process)
+        self._started()
+    async def connect_async(self, ctx_pool, deadline=CONNECT_DEADLINE):
+        ''' `connect` variant, awaiting other instances meanwhile '''
+        ctx_pool.pop(self.uno_url, None)
+        self.ctx = await connect_async(uno_url=self.uno_url, flush=True,
+            deadline=deadline, process=self.process, ctx_pool=ctx_pool)
+        self._started()
+    def _started(self):
+        self.documents = 0
+        self.starts += 1
+    def isRunning(self):
+        return self.process is not None and self.process.poll() is None
+    def ping(self, timeout=PING_TIMEOUT):
+        ''' True when the instance answers a UNO round trip in time '''
+        if not self.isRunning() or self.ctx is None:
+            return False
+        def round_trip():
+            ScriptContext(self.ctx).getDesktop().getFrames().getCount()
+        try:
+            return _call_with_timeout(round_trip, timeout)
+        except Exception as e:  # DisposedException, RuntimeException..
+            logging.warning('PING failed %s: %s' % (self.uno_url, e))
+            return False
+    def rss(self):
+        ''' Resident memory (bytes) of the process tree, None if unknown '''
+        if not self.isRunning():
+            return None
+        return _tree_rss(self.pid)
+    def stop(self, ctx_pool, timeout=STOP_TIMEOUT):
+        ''' Terminate the desktop, kill the process if it won't exit '''
+        if self.ctx is not None and self.isRunning():
+            def terminate():
+                ScriptContext(self.ctx).getDesktop().terminate()
+            try:
+                _call_with_timeout(terminate, timeout)
+            except Exception as e:  # bridge already gone
+                logging.debug(e)
+        ctx_pool.pop(self.uno_url, None)
+        self.ctx = None
+        try:
+            if self.process is not None:
+                try:
+                    self.process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    logging.warning('KILLing hung instance %s' % self.uno_url)
+                    _kill_tree(self.process)
+                    self.process.wait()
+        finally:
+            self._removeProfile()
+    def _removeProfile(self):
+        if self.profile is not None:
+            shutil.rmtree(self.profile, ignore_errors=True)
+            self.profile = None
+
+
 class Runner():  # (Libre|Open)Office Runner
     """ (Libre|Open)`Runner` context manager
 
     o  It holds `start`, `stop` paradigms to launch `sOffice` instances &
     o  It facilitates `setup`, `tearDown` unit testing steps
+    o  It pools warm instances, leased to jobs one at a time
 
     Description:
         Starts, stops zero-to-many (Libre|Open)Office processes
         according to an optional JSON file or argument containing
-        {pgm: [accept, *options]} key-values service pairs.
+        {pgm: [accept, *options]} key-values service pairs, plus
+        `size` headless instances listening to unique pipes.
+
+        Instances are probed until ready, within `CONNECT_DEADLINE`
+        seconds, instead of being given a fixed start-up delay.
+        Each of the `size` instances runs on its own copy of a user
+        profile template, built once (first-run initialization) and
+        copied to tmpfs when available: instances don't share, nor
+        lock, a profile. `profile` is a template directory, True for
+        a default one per soffice binary, False for the user's profile.
+        `lease()` hands out an idle instance, once it answered a ping.
+        Dead or hung instances are replaced transparently; instances
+        are also restarted after `max_documents` leases or when their
+        memory exceeds `max_rss` bytes. One failing to start is
+        launched again, `START_ATTEMPTS` times at most; `available()`
+        tells how many could be started.
 
     Recommendation:
     o  Concurrent instances/services require that --accept UNO-Urls are
@@ -223,6 +385,16 @@ class Runner():  # (Libre|Open)Office Runner
         XSCRIPTCONTEXT = ide.XSCRIPTCONTEXT
         # Your code goes here
 
+    import IDE_utils as ide
+    with ide.Runner(soffice={}, size=4, max_documents=200) as relay:
+        with relay.lease() as office:  # Warm, checked instance
+            doc = office.script_context.loadDocument(url)
+            # Your code goes here
+
+    import asyncio, IDE_utils as ide
+    relay = ide.Runner(soffice={}, size=8)
+    asyncio.run(relay.start_async())  # 8 instances connected concurrently
+
     from IDE_utils import start, stop, XSCRIPTCONTEXT
     try:
         start()  # starts ALL 'soffice' JSON filed pgms
@@ -231,29 +403,46 @@ class Runner():  # (Libre|Open)Office Runner
         stop()  # interrupts ALL 'soffice' instances
 
 
-    see also: `XSCRIPTCONTEXT` built-in & `ScriptContext`
+    see also: `XSCRIPTCONTEXT` built-in, `ScriptContext` & `OfficeInstance`
     """
+    _pools = itertools.count()  # pipe names of concurrent pools differ
 
-    def __init__(self, soffice=None):
+    def __init__(self, soffice=None, size=0, max_documents=None,
+                 max_rss=None, pgm=None, profile=True):
         self.services = {}  # (pgm, serv_descr) pairs
         self.processes = {}  # (uno-url, process) key-value pairs
         self.pool = {}  # Context pool, cf. ScriptContext.pool
+        self.instances = []  # OfficeInstance's
+        self.max_documents = max_documents  # leases before a restart
+        self.max_rss = max_rss  # bytes before a restart
+        self._idle = []  # instances ready to be leased
+        self._lost = []  # instances that could not be started
+        self._condition = threading.Condition()
+        self.profile = profile  # template dir, True: default one, False
+        self._pooled = []  # the `size` instances, on cloned profiles
         if soffice is None or type(soffice) != dict:
             logging.debug("READing.. default JSON file services' list")
             self.services = Runner._read_service()
         else:
             logging.debug("READing.. JSON argument services' list")
             self.services = soffice
+        for pgm_, options in self.services.items():
+            if Runner._isOfficeBinary(pgm_):
+                self.instances.append(OfficeInstance(pgm_, options))
+        pgm = pgm or _soffice_path()
+        pool = next(Runner._pools)
+        for i in range(size):
+            pipe = 'IDE_utils_%d_%d_%d' % (os.getpid(), pool, i)
+            self._pooled.append(OfficeInstance(
+                pgm, ['--accept=pipe,name=%s;urp;' % pipe] + POOL_OPTIONS))
+        self.instances.extend(self._pooled)
     def __enter__(self):
         logging.debug("ENTERing.. Runner context manager")
         return self._start()
     def __exit__(self, exctype, exc, tb):
         logging.debug("EXITing.. Runner context manager")
-        if tb is None:  # no traceback means no error/exception
-            self._stop()
-        else:
-            pass  # Need to review this !!
-        return
+        self._stop()  # error or not: no instance, no profile copy left
+        return False  # let the exception, if any, propagate
 
     @staticmethod
     def _accept2Uno(accept_url):
@@ -318,36 +507,332 @@ class Runner():  # (Libre|Open)Office Runner
         return ctx
     def _start(self):
         logging.info('STARTing (Libre|Open)Office instances..')
-        for pgm, options in self.services.items():
-            if not Runner._isOfficeBinary(pgm): continue
+        # All processes boot side by side: the slowest one sets the pace
+        for instance in self._launch():
+            try:
+                instance.connect(self.pool)
+            except (NoConnectException, RuntimeError) as e:
+                self._discard(instance, e)
+                continue
+            self._ready(instance)
+        logging.debug('STARTed (Libre|Open)Office instances..')
+        return self
+    async def start_async(self):
+        ''' `_start` variant connecting to all instances concurrently '''
+        logging.info('STARTing (Libre|Open)Office instances..')
+        launched = self._launch()
+        outcomes = await asyncio.gather(
+            *[instance.connect_async(self.pool) for instance in launched],
+            return_exceptions=True)
+        for instance, outcome in zip(launched, outcomes):
+            if isinstance(outcome, (NoConnectException, RuntimeError)):
+                self._discard(instance, outcome)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                self._ready(instance)
+        logging.debug('STARTed (Libre|Open)Office instances..')
+        return self
+    def _launch(self):
+        if self.profile and self._pooled:
+            template = self.profile
+            if template is True:
+                template = profile_template(self._pooled[0].pgm)
+            for instance in self._pooled:
+                instance.profile_template = template
+        with self._condition:
+            del self._lost[:]
+        launched = []
+        for instance in self.instances:
             try:
-                cmd = pgm+' '.join(self.services[pgm])
-                key = self._accept2Uno(options[0])
-                options.insert(0, pgm)
-                self.processes[key] = subprocess.Popen(options).pid
-                logging.debug('STARTed.. %s ' % cmd)
-                officehelper.sleep(_SECONDS)  # No longer required ?
-                self.pool[key] = self.connect(uno_url=key)
-                XSCRIPTCONTEXT = self.connect(uno_url=key)
+                instance.launch()
             except OSError as e:  # WindowsError super class
                 ''' OSError is OS-agnostic '''
-                logging.error(pgm + " not found.")
-        logging.debug(self.processes)
-        logging.debug('STARTed (Libre|Open)Office instances..')
+                logging.error(instance.pgm + " not found.")
+                self._lose(instance)
+                continue
+            self.processes[instance.uno_url] = instance.pid
+            launched.append(instance)
+        return launched
+    def _ready(self, instance):
+        with self._condition:
+            self._idle.append(instance)
+            self._condition.notify()
+    def _discard(self, instance, error):
+        ''' Launch again an instance that failed to start, or give up on it '''
+        for attempt in range(1, START_ATTEMPTS):
+            logging.error('%s not ready: %s' % (instance.uno_url, error))
+            instance.stop(self.pool, timeout=0)
+            try:
+                self._startInstance(instance)
+            except (NoConnectException, RuntimeError, OSError) as e:
+                error = e
+                continue
+            self._ready(instance)
+            return
+        logging.error('%s not ready, given up: %s' % (instance.uno_url, error))
+        instance.stop(self.pool, timeout=0)
+        self._lose(instance)
+    def _lose(self, instance):
+        with self._condition:
+            self._lost.append(instance)
+            self._condition.notify_all()  # `acquire` may have nothing to wait for
+    def available(self):
+        ''' Number of instances started, and so leasable '''
+        with self._condition:
+            return len(self.instances) - len(self._lost)
+    def _startInstance(self, instance):
+        instance.start(self.pool)
+        self.processes[instance.uno_url] = instance.pid
+    def _restartInstance(self, instance):
+        logging.info('RESTARTing %r' % instance)
+        instance.stop(self.pool)
+        self._startInstance(instance)
     def _stop(self):
         logging.info('STOPping (Libre|Open)Office instances..')
+        with self._condition:
+            del self._idle[:]
+            self._lost[:] = self.instances  # stopped: no lease to wait for
+            self._condition.notify_all()
+        for instance in self.instances:
+            try:
+                instance.stop(self.pool)
+            except Exception as e:  # stop the others all the same
+                logging.error('STOP failed %s: %s' % (instance.uno_url, e))
         if len(self.pool) != 0:
             _terminate_desktops(self.pool)
+    def _needsRecycling(self, instance):
+        if self.max_documents is not None \
+                and instance.documents >= self.max_documents:
+            return True
+        if self.max_rss is not None:
+            rss = instance.rss()
+            if rss is not None and rss > self.max_rss:
+                return True
+        return False
+    def acquire(self, timeout=None):
+        ''' Take an idle, responsive instance out of the pool
+
+        Blocks until one is idle, or raises RuntimeError after `timeout`
+        seconds, or at once when none could be started. Dead or hung
+        instances are restarted before use.
+        '''
+        if not self.instances:
+            raise RuntimeError('Empty (Libre|Open)Office pool')
+        with self._condition:
+            alive = lambda: len(self._lost) < len(self.instances)
+            if not self._condition.wait_for(lambda: self._idle or not alive(), timeout):
+                raise RuntimeError('No idle (Libre|Open)Office instance')
+            if not self._idle:
+                raise RuntimeError('No (Libre|Open)Office instance running')
+            instance = self._idle.pop(0)
+        try:
+            if not instance.ping():
+                self._restartInstance(instance)
+        except BaseException:
+            self.release(instance, served=0)
+            raise
+        return instance
+    def release(self, instance, served=1):
+        ''' Give `instance` back, restarting it when worn out '''
+        instance.documents += served
+        try:
+            if self._needsRecycling(instance):
+                self._restartInstance(instance)
+        finally:
+            with self._condition:
+                self._idle.append(instance)
+                self._condition.notify()
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        ''' `with runner.lease() as office:` an `OfficeInstance` for one job '''
+        instance = self.acquire(timeout)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+
+def _soffice_path():
+    ''' soffice script used on *ix, Mac; soffice.exe used on Win '''
+    if "UNO_PATH" in os.environ:
+        sOffice = os.environ["UNO_PATH"]
+    else:
+        sOffice = "" # hope for the best
+
+    sOffice = os.path.join(sOffice, "soffice")
+    if sys.platform.startswith("win"):
+        sOffice += ".exe"
+    return sOffice
+
+def profile_template(pgm, path=None, timeout=PROFILE_TIMEOUT):
+    ''' Build, once, an initialized user profile for `pgm` instances
+
+    The first run of *Office in an empty -env:UserInstallation is what
+    takes long; copies of the resulting directory start warm.
+
+    :param pgm: soffice binary
+    :param path: template directory, default is one per binary and user
+                 under `PROFILE_ROOT`
+    :return: template directory
+    '''
+    if path is None:
+        key = hashlib.sha1((shutil.which(pgm) or pgm).encode('utf-8'))
+        path = os.path.join(PROFILE_ROOT, 'IDE_utils_template_%s_%s' % (
+            getpass.getuser(), key.hexdigest()[:10]))
+    if os.path.isdir(os.path.join(path, 'user')):
+        return path
+    logging.info('BUILDing user profile template ' + path)
+    building = tempfile.mkdtemp(prefix=os.path.basename(path) + '.',
+                                dir=os.path.dirname(path) or '.')
+    try:
+        subprocess.run([pgm, '-env:UserInstallation='
+                        + uno.systemPathToFileUrl(building),
+                        '--headless', '--terminate_after_init',
+                        '--nologo', '--norestore'],
+                       timeout=timeout, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        if not os.path.isdir(os.path.join(building, 'user')):
+            raise RuntimeError('%s created no user profile' % pgm)
+        if os.path.isdir(path) and not os.path.isdir(os.path.join(path, 'user')):
+            shutil.rmtree(path, ignore_errors=True)  # incomplete leftover
+        try:
+            os.rename(building, path)  # atomic: concurrent builders agree
+        except OSError:
+            if not os.path.isdir(os.path.join(path, 'user')):
+                raise
+    finally:
+        shutil.rmtree(building, ignore_errors=True)
+    return path
+
+def _clone_profile(template):
+    ''' Private copy of a profile `template`, under `PROFILE_ROOT`
+
+    Wherever the template lives, copies go to tmpfs; the temporary
+    directory is used, with a note, when tmpfs is missing or full.
+    '''
+    roots = [PROFILE_ROOT]
+    if PROFILE_TMPFS:
+        roots.append(tempfile.gettempdir())
+    else:
+        logging.info('No tmpfs, profile copied to ' + PROFILE_ROOT)
+    for root in roots:
+        clone = None
+        try:
+            clone = tempfile.mkdtemp(prefix='IDE_utils_profile_', dir=root)
+            shutil.copytree(template, clone, symlinks=True,
+                            dirs_exist_ok=True)
+            return clone
+        except OSError as e:  # shutil.Error included
+            if clone is not None:
+                shutil.rmtree(clone, ignore_errors=True)
+            if root is roots[-1]:
+                raise
+            logging.warning('tmpfs unavailable (%s), profile copied to %s'
+                            % (e, roots[-1]))
+
+def _call_with_timeout(function, timeout):
+    ''' Run `function` in a helper thread: False when it did not return
+    within `timeout` seconds, its exception re-raised otherwise '''
+    outcome = {}
+    def target():
+        try:
+            function()
+        except BaseException as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        return False  # a hung bridge call, left behind
+    if 'error' in outcome:
+        raise outcome['error']
+    return True
+
+def _tree_pids(pid):
+    ''' `pid` and its descendants, read from /proc (Linux) '''
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat' % entry) as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, todo = [], [pid]
+    while todo:
+        pids.append(todo.pop())
+        todo.extend(children.get(pids[-1], []))
+    return pids
+
+def _tree_rss(pid):
+    ''' RSS in bytes of `pid` and its children e.g. soffice + soffice.bin '''
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            return sum(p.memory_info().rss
+                       for p in [process] + process.children(recursive=True))
+        except psutil.Error:
+            return None
+    if not os.path.isdir('/proc'):
+        return None
+    rss = 0
+    for tree_pid in _tree_pids(pid):
+        try:
+            with open('/proc/%d/statm' % tree_pid) as f:
+                rss += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            pass
+    return rss
+
+def _kill_tree(process):
+    ''' Kill a *Office process and its children (e.g. soffice.bin) '''
+    if psutil is not None:
+        try:
+            for child in psutil.Process(process.pid).children(recursive=True):
+                child.kill()
+        except psutil.Error:
+            pass
+    elif os.path.isdir('/proc'):
+        for pid in _tree_pids(process.pid)[1:]:
+            try:
+                os.kill(pid, 9)
+            except OSError:
+                pass
+    process.kill()
 
 
 def start(soffice=None):
     """ START (Libre|Open)sOffice instances """
     Runner(soffice=soffice)._start()
 
+class Backoff():
+    """ Jittered exponential retry delays, bounded by `cap` seconds
+
+    Iterable as many times as needed, and endless: retries end with
+    their deadline. Each delay is drawn in [(1-jitter)*d, d] so that
+    instances started together don't probe in lockstep.
+
+    >>> delays = list(itertools.islice(Backoff(0.1, 1, jitter=0), 6))
+    >>> [round(delay, 2) for delay in delays]
+    [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+    """
+    def __init__(self, base=0.05, cap=1.0, factor=2, jitter=0.5):
+        self.base, self.cap, self.factor = base, cap, factor
+        self.jitter = jitter
+    def __iter__(self):
+        delay = self.base
+        while True:
+            yield delay * random.uniform(1 - self.jitter, 1)
+            delay = min(self.cap, delay * self.factor)
+
 _DELAYS = [(0, 1, 5, 30, 180, 600, 3600),  # try 0, 1, 5, 10, .. sec.
            [0] + [0.5] * 19,  # try 20 times each half-second.
-           (0, 1, 1, 1, 1, 1)]  # try 6 times each second.
-CONNECT_DELAYS = _DELAYS[0]
+           (0, 1, 1, 1, 1, 1),  # try 6 times each second.
+           Backoff()]  # try every 50ms..1s until the deadline
+CONNECT_DELAYS = _DELAYS[3]
 CONNECT_EXCEPTIONS = NoConnectException
 #CONNECT_REPORT = print  # How about logging.info instead ?
 CONNECT_REPORT = lambda *args: None  # Silent connections
@@ -356,12 +841,16 @@ CONNECT_REPORT = lambda *args: None  # Silent connections
 # http://code.activestate.com/recipes/580745-retry-decorator-in-python/
 def retry(delays=(0, 1, 5, 30, 180, 600, 3600),
           exception=Exception,
-          report=lambda *args: None):
-    ''' Decorator: Retry certain steps which may fail sometimes '''
+          report=lambda *args: None,
+          deadline=None):
+    ''' Decorator: Retry certain steps which may fail sometimes
+
+    No retry starts later than `deadline` seconds after the first try.
+    '''
     def wrapper(function):
         def wrapped(*args, **kwargs):
             problems = []
-            for delay in itertools.chain(delays, [ None ]):
+            for delay in _bounded(delays, deadline):
                 try:
                     return function(*args, **kwargs)
                 except exception as problem:
@@ -371,11 +860,23 @@ def retry(delays=(0, 1, 5, 30, 180, 600, 3600),
                         raise
                     else:
                         report("retryable failed:", problem,
-                            "-- delaying for %ds" % delay)
+                            "-- delaying for %.2fs" % delay)
                         time.sleep(delay)
         return wrapped
     return wrapper
 
+def _bounded(delays, deadline):
+    ''' `delays` clipped to `deadline` seconds from now, then None '''
+    expiry = None if deadline is None else time.monotonic() + deadline
+    for delay in delays:
+        if expiry is not None:
+            remaining = expiry - time.monotonic()
+            if remaining <= 0:
+                break
+            delay = min(delay, remaining)
+        yield delay
+    yield None
+
 
 class ScriptContext(XScriptContext):
     """ Substitute (Libre|Open)Office XSCRIPTCONTEXT built-in
@@ -393,6 +894,11 @@ class ScriptContext(XScriptContext):
     ctx = connect(host='localhost',port=1515)
     XSCRIPTCONTEXT = ScriptContext(ctx)
 
+    doc = XSCRIPTCONTEXT.loadDocument(uno.systemPathToFileUrl(path))
+    # Your code goes here
+    doc.store()
+    doc.close(True)
+
     see also: `Runner`
     """
     '''
@@ -408,15 +914,31 @@ class ScriptContext(XScriptContext):
         return self.ctx.getServiceManager().createInstanceWithContext("com.sun.star.frame.Desktop", self.ctx)
     def getDocument(self):
         return self.getDesktop().getCurrentComponent()
+    def loadDocument(self, url, hidden=True, **properties):
+        """ Load a document, by default Hidden i.e. without any window
+
+        Hidden documents are what batch jobs need: many documents can
+        be loaded, processed, stored and closed by one *Office process.
+
+        :param url: file URL, see `uno.systemPathToFileUrl`
+        :param properties: extra MediaDescriptor properties
+        """
+        properties['Hidden'] = hidden
+        args = tuple(PropertyValue(Name=name, Value=value)
+                     for name, value in properties.items())
+        return self.getDesktop().loadComponentFromURL(url, "_blank", 0, args)
     def getInvocationContext(self):
         raise os.NotImplementedError
     @staticmethod
     def _connect(ctx_pool, host='localhost', port=2002, pipe=None,
-                 uno_url=None, flush=True):
+                 uno_url=None, flush=True, deadline=CONNECT_DEADLINE,
+                 process=None):
         ''' (re)Connect to socket/pipe *Office instances or Fail
 
         arguments:
         ctx_pool: {key: ctx} pool of ComponentContext to explore/feed
+        deadline: seconds spent probing a starting instance at most
+        process: `Popen` of the instance, fail as soon as it exits
         
         '''
         if uno_url:
@@ -438,16 +960,15 @@ class ScriptContext(XScriptContext):
                 uno_url = ''.join(['uno:socket,host=',host,',port=',str(port)])
                 uno_url = ''.join([uno_url,';urp;StarOffice.ComponentContext'])
 
-        localContext = uno.getComponentContext()
-        resolver = localContext.getServiceManager().createInstanceWithContext(
-                        "com.sun.star.bridge.UnoUrlResolver", localContext )
+        resolver = _resolver()
 
         logging.info('CONNECTing to ' + uno_url)
         @retry(delays=CONNECT_DELAYS,
                exception=CONNECT_EXCEPTIONS,
-               report=CONNECT_REPORT)
+               report=CONNECT_REPORT,
+               deadline=deadline)
         def resolve():
-            return resolver.resolve(uno_url)
+            return _probe(resolver, uno_url, process)
         ctx = resolve()  # Raises NoConnectException
 
         if not flush: return ctx  # otherwise pool contexts to kill
@@ -468,13 +989,15 @@ ScriptContext.pool = {}
 """
 '''NOTE: Runner() objects also hold a component context pool '''
 
-def connect(host='localhost', port=2002, pipe=None, flush=False):
+def connect(host='localhost', port=2002, pipe=None, flush=False,
+            deadline=CONNECT_DEADLINE):
     ''' Connect to socket/pipe *Office instances or Fail
 
     Keyword arguments:
     host: 'localhost' or IP address
     port: socket #
     flush: Whether to force service termination ( default is False )
+    deadline: seconds to wait for a starting instance ( default is 60 )
 
     return: uno.getComponentContext() service equivalent
 
@@ -483,7 +1006,66 @@ def connect(host='localhost', port=2002, pipe=None, flush=False):
     ConnectionSetupException - malformed uno_url
     '''
     return ScriptContext._connect(ScriptContext.pool, host=host,
-        port=port, pipe=pipe, uno_url=None, flush=flush)
+        port=port, pipe=pipe, uno_url=None, flush=flush, deadline=deadline)
+
+async def connect_async(host='localhost', port=2002, pipe=None,
+                        uno_url=None, flush=False,
+                        deadline=CONNECT_DEADLINE, process=None,
+                        ctx_pool=None):
+    ''' `connect` coroutine: probes without blocking the event loop
+
+    Many instances are awaited concurrently with `asyncio.gather`, cf.
+    `Runner.start_async`. Each probe runs in the default executor,
+    backoff delays are `asyncio.sleep`s.
+    '''
+    if ctx_pool is None:
+        ctx_pool = ScriptContext.pool
+    if uno_url is None:
+        if pipe:
+            uno_url = ''.join(['uno:pipe,name=', str(pipe),
+                               ';urp;StarOffice.ComponentContext'])
+        else:
+            uno_url = ''.join(['uno:socket,host=', host, ',port=', str(port),
+                               ';urp;StarOffice.ComponentContext'])
+    if uno_url in ctx_pool:
+        return ctx_pool[uno_url]
+
+    loop = asyncio.get_running_loop()
+    resolver = _resolver()
+    logging.info('CONNECTing to ' + uno_url)
+    problems = []
+    for delay in _bounded(CONNECT_DELAYS, deadline):
+        try:
+            ctx = await loop.run_in_executor(
+                None, _probe, resolver, uno_url, process)
+            break
+        except CONNECT_EXCEPTIONS as problem:
+            problems.append(problem)
+            if delay is None:
+                CONNECT_REPORT("\n retryable failed definitely:", problems)
+                raise
+            await asyncio.sleep(delay)
+
+    if flush:
+        ctx_pool[uno_url] = ctx
+    return ctx
+
+def _resolver():
+    localContext = uno.getComponentContext()
+    return localContext.getServiceManager().createInstanceWithContext(
+                    "com.sun.star.bridge.UnoUrlResolver", localContext )
+
+def _probe(resolver, uno_url, process=None):
+    ''' One readiness probe: the context of a listening instance
+
+    raises:
+    NoConnectException - not listening yet, worth another probe
+    RuntimeError - `process` exited, no use waiting for it
+    '''
+    if process is not None and process.poll() is not None:
+        raise RuntimeError('%s exited with status %s' % (
+            uno_url, process.returncode))
+    return resolver.resolve(uno_url)
 
 
 # ============
@@ -492,16 +1074,8 @@ def connect(host='localhost', port=2002, pipe=None, flush=False):
 
 def _bootstrap():
     ''' Initialize a default piped service '''
-    # soffice script used on *ix, Mac; soffice.exe used on Win
     # --startup LibreOffice options; -startup OpenOffice options  
-    if "UNO_PATH" in os.environ:
-        sOffice = os.environ["UNO_PATH"]
-    else:
-        sOffice = "" # hope for the best
-
-    sOffice = os.path.join(sOffice, "soffice")
-    if sys.platform.startswith("win"):
-        sOffice += ".exe"
+    sOffice = _soffice_path()
 
     options = ['-accept=pipe,name=OfficeHelper;urp;', 
         '-nodefault', '-nologo']
@@ -515,15 +1089,39 @@ def _bootstrap():
 
     return ctx
 
-logging.info('BOOTSTRAPping (Libre|Open)Office instance..')
-if _EMULATE_OFFICEHELPER:
-    _ctx = _bootstrap()
-else:
-    _ctx = officehelper.bootstrap()
+_ctx = None
+_bootstrap_lock = threading.Lock()
+
+def warm_up():
+    ''' Start the default instance now, rather than on first use
+
+    Importing this module starts nothing: `XSCRIPTCONTEXT` is created
+    on first access. Call `warm_up()`, or set IDE_UTILS_WARM_UP=1
+    before the import, to pay for the start-up ahead of time.
+
+    return: the `XSCRIPTCONTEXT` substitute
+    '''
+    global _ctx, XSCRIPTCONTEXT
+    with _bootstrap_lock:
+        if _ctx is None:
+            logging.info('BOOTSTRAPping (Libre|Open)Office instance..')
+            if _EMULATE_OFFICEHELPER:
+                _ctx = _bootstrap()
+            else:
+                _ctx = officehelper.bootstrap()
+            ScriptContext.pool['officehelper'] = _ctx # Force service termination
+            XSCRIPTCONTEXT = ScriptContext(_ctx)
+            ''' Substitute XSCRIPTCONTEXT built-in '''
+    return XSCRIPTCONTEXT
+
+def __getattr__(name):
+    ''' Lazy `XSCRIPTCONTEXT`, cf. PEP 562 '''
+    if name == 'XSCRIPTCONTEXT':
+        return warm_up()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
-ScriptContext.pool['officehelper'] = _ctx # Force service termination
-XSCRIPTCONTEXT = ScriptContext(_ctx)
-''' Substitute XSCRIPTCONTEXT built-in '''
+if os.environ.get('IDE_UTILS_WARM_UP', '') not in ('', '0'):
+    warm_up()
 
 # ===========
 #  TERMINATE
@@ -540,6 +1138,7 @@ XSCRIPTCONTEXT = ScriptContext(_ctx)
 # @atexit.register
 def stop():
     """ STOP all (Libre|Open)sOffice instances """
+    global _ctx
     logging.info('EXITing '+__name__)
     try:
         if ScriptContext.pool:  # non-empty pool
@@ -547,6 +1146,11 @@ def stop():
     except (DisposedException) as e:
         ''' URP bridge already released '''
         logging.error(e)
+    with _bootstrap_lock:
+        if _ctx is not None:  # next XSCRIPTCONTEXT access bootstraps anew
+            _ctx = None
+            ScriptContext.pool.pop('officehelper', None)
+            globals().pop('XSCRIPTCONTEXT', None)
 
 def _terminate_desktops(ctx_pool):
     ''' Stop (Libre|Open)Office active sessions
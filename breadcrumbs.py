@@ -1,8 +1,26 @@
-import uno
+import contextlib
+import difflib
+import itertools
 import typing
-from com.sun.star.awt import Size
-from com.sun.star.awt import Point
-from com.sun.star.beans import PropertyValue
+try:
+    import uno
+    from com.sun.star.awt import Size
+    from com.sun.star.awt import Point
+    from com.sun.star.awt.MessageBoxType import INFOBOX
+    from com.sun.star.awt.MessageBoxButtons import BUTTONS_OK
+except ImportError:
+    # Outside of (Libre|Open)Office only the file based backends
+    # (e.g. breadcrumbs_odf.py), or UnoBackend over an in-process
+    # document model (fake_uno.py), can drive automatic_breadcrumbs
+    uno = None
+
+    class Point(typing.NamedTuple):
+        X: int
+        Y: int
+
+    class Size(typing.NamedTuple):
+        Width: int
+        Height: int
 
 # bcx millimeter
 BREADCRUMB_X = 0
@@ -28,12 +46,73 @@ SHOULD_SHOW_TAIL_DELIMITER = False
 ROOT_TITLE = "<Root>"
 # bcroot
 SHOULD_SHOW_ROOT_IN_BREADCRUMBS = False
+# directives all/offslide/layer - which text shapes may hold directives:
+# all of them (their whole text is read), those centered outside of the
+# slide or on the DIRECTIVE_LAYER layer, that layer only
+DIRECTIVE_FILTER = "all"
+DIRECTIVE_FILTERS = ("all", "offslide", "layer")
+DIRECTIVE_LAYER = "Directives"
+
+# The settings above are defaults: each run works on its own copy (see
+# default_settings), which its directives modify
+SETTING_NAMES = (
+    "BREADCRUMB_X", "BREADCRUMB_Y", "BREADCRUMB_DELIMITER",
+    "BREADCRUMB_STYLE_NAME", "TOC_STYLE_NAME", "TOC_COLOR_INACTIVE",
+    "TOC_COLOR_ACTIVE", "SHOULD_EXPAND_ALL_IN_TOC",
+    "SHOULD_EXPAND_ALL_IN_ROOT_TOC", "SHOULD_SHOW_FULL_BREADCRUMBS",
+    "SHOULD_SHOW_TAIL_DELIMITER", "ROOT_TITLE",
+    "SHOULD_SHOW_ROOT_IN_BREADCRUMBS", "DIRECTIVE_FILTER")
+DEFAULT_SETTINGS = {name: globals()[name] for name in SETTING_NAMES}
+
+def default_settings(**overrides) -> dict:
+    """ Settings of a new run
+
+    >>> settings = default_settings(BREADCRUMB_X=500)
+    >>> settings["BREADCRUMB_X"], settings["ROOT_TITLE"]
+    (500, '<Root>')
+    >>> default_settings(BREADCRUMB_Z=1)
+    Traceback (most recent call last):
+    ...
+    ValueError: unknown setting BREADCRUMB_Z
+    """
+    for name in overrides:
+        if name not in DEFAULT_SETTINGS:
+            raise ValueError("unknown setting " + name)
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(overrides)
+    return settings
+
+# Undo action of a whole pass
+UNDO_TITLE = "Automatic breadcrumbs"
+# Phases reported to backend.progress, page by page
+PHASE_SCAN = "scan"
+PHASE_PLAN = "plan"  # once, index 0: stack evaluation and TOC tree
+PHASE_APPLY = "apply"
+
+class Cancelled(Exception):
+    """ The pass was cancelled between two pages """
 
 class TocEntry(object):
-    def __init__(self, text):
+    """ Node of the TOC tree
+
+    `pre` and `post` number the entries in pre-order and post-order
+    (see number_toc_tree): an entry is an ancestor of another one when
+    its interval contains the other's.
+    """
+    __slots__ = ("text", "shapes", "children", "parent", "depth", "pre", "post")
+
+    def __init__(self, text, parent: typing.Optional["TocEntry"] = None):
         self.text = text
         self.shapes = []
         self.children = []
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.pre = 0
+        self.post = 0
+
+    def contains(self, other: "TocEntry") -> bool:
+        """ Whether `other` is this entry or one of its descendants """
+        return self.pre <= other.pre and other.post <= self.post
 
     def __str__(self):
         return "TocEntry<" + self.text + "> [ " + ", ".join(list(map(lambda x: x.__str__(), self.children))) + " ]"
@@ -42,324 +121,865 @@ class TocEntry(object):
         return self.__str__()
 
 def insert_child_and_switch_to(toc_list_stack: typing.List[TocEntry], text: str):
-    new_entry = TocEntry(text)
+    new_entry = TocEntry(text, toc_list_stack[-1])
     toc_list_stack[-1].children.append(new_entry)
     toc_list_stack.append(new_entry)
 
-class IsFirstLine(object):
-    def __init__(self, value: bool):
-        self.value = value
-
-    def set_value(self, value: bool):
-        self.value = value
-
-    def __bool__(self):
-        return self.value
-
-def do_recurse_write_toc_tree(depth: int, is_first_line: IsFirstLine, will_stress: bool, toc_root: TocEntry, curr_toc_entry_trace: typing.List[TocEntry], curr_toc_entry: TocEntry, target_toc_entry_trace: typing.List[TocEntry], target_toc_entry: TocEntry):
-    if curr_toc_entry is not toc_root:
-        if not is_first_line:
-            for shape in target_toc_entry.shapes:
-                shape.finishParagraph([])
+def number_toc_tree(toc_root: TocEntry) -> typing.List[TocEntry]:
+    """ Number the entries in pre- and post-order, return them in pre-order
+
+    Iterative, so that no outline is too deep.
+
+    >>> root = TocEntry("<Root>")
+    >>> stack = [root]
+    >>> insert_child_and_switch_to(stack, "1"); insert_child_and_switch_to(stack, "1.1")
+    >>> del stack[1:]; insert_child_and_switch_to(stack, "2")
+    >>> [(entry.text, entry.depth, entry.pre, entry.post) for entry in number_toc_tree(root)]
+    [('<Root>', 0, 0, 3), ('1', 1, 1, 1), ('1.1', 2, 2, 0), ('2', 1, 3, 2)]
+    >>> root.children[0].contains(root.children[0].children[0]), root.children[1].contains(root.children[0])
+    (True, False)
+    """
+    outline = []
+    post = 0
+    pending = [(toc_root, False)]
+    while pending:
+        entry, visited = pending.pop()
+        if visited:
+            entry.post = post
+            post += 1
+            continue
+        entry.pre = len(outline)
+        outline.append(entry)
+        pending.append((entry, True))
+        pending.extend((child, False) for child in reversed(entry.children))
+    return outline
+
+def render_tocs(toc_root: TocEntry, targets: typing.Iterable[TocEntry], settings: dict) -> dict:
+    """ TOC lines, (text, NumberingLevel, CharColor or None), of each target
+
+    The root is the target of the root TOC. The tree is numbered and
+    flattened once; the expanded TOCs take the whole outline, any
+    other TOC only lists the children of the root and of the target's
+    ancestors, with constant time ancestor tests: apart from that
+    traversal, the work is proportional to the lines rendered.
+    """
+    active_color = int(settings["TOC_COLOR_ACTIVE"], 16) if settings["TOC_COLOR_ACTIVE"] else None
+    inactive_color = int(settings["TOC_COLOR_INACTIVE"], 16) if settings["TOC_COLOR_INACTIVE"] else None
+    outline = number_toc_tree(toc_root)[1:]
+    renderings = {}
+    for target in targets:
+        if target in renderings:
+            continue
+        will_stress = target is not toc_root
+        if settings["SHOULD_EXPAND_ALL_IN_TOC"] or (settings["SHOULD_EXPAND_ALL_IN_ROOT_TOC"] and not will_stress):
+            entries = outline
+        elif not will_stress:
+            entries = toc_root.children
         else:
-            is_first_line.set_value(False)
+            entries = []
+            pending = [iter(toc_root.children)]
+            while pending:
+                entry = next(pending[-1], None)
+                if entry is None:
+                    pending.pop()
+                    continue
+                entries.append(entry)
+                if entry.contains(target):  # on the target's trace
+                    pending.append(iter(entry.children))
 
-        para_props = [
-            PropertyValue(Name = "NumberingLevel", Value = depth - 1)
-        ]
         if will_stress:
-            if curr_toc_entry is target_toc_entry or curr_toc_entry in target_toc_entry.children:
-                if TOC_COLOR_ACTIVE is not None and TOC_COLOR_ACTIVE != "":
-                    para_props.append(PropertyValue(Name = "CharColor", Value = int(TOC_COLOR_ACTIVE, 16)))
-            else:
-                if TOC_COLOR_INACTIVE is not None and TOC_COLOR_INACTIVE != "":
-                    para_props.append(PropertyValue(Name = "CharColor", Value = int(TOC_COLOR_INACTIVE, 16)))
-                
-        for shape in target_toc_entry.shapes:
-            shape.appendTextPortion(curr_toc_entry.text, para_props)
-
-    should_expand = False
-    if SHOULD_EXPAND_ALL_IN_TOC:
-        should_expand = True
-    else:
-        if SHOULD_EXPAND_ALL_IN_ROOT_TOC and target_toc_entry is toc_root:
-            should_expand = True
-        elif depth == 0:
-            should_expand = True
-        elif target_toc_entry is toc_root:
-            should_expand = False
-        elif curr_toc_entry in target_toc_entry_trace or curr_toc_entry is target_toc_entry:
-            should_expand = True
-
-    if should_expand:
-        for child_entry in curr_toc_entry.children:
-            do_recurse_write_toc_tree(depth + 1, is_first_line, will_stress, toc_root, curr_toc_entry_trace + [child_entry], child_entry, target_toc_entry_trace, target_toc_entry)
-
-def recurse_write_toc_tree(toc_root: TocEntry, target_toc_entry_trace: typing.List[TocEntry], target_toc_entry: TocEntry):
-    if len(target_toc_entry.shapes) == 0:
-        return
-        
-    for shape in target_toc_entry.shapes:
-        shape.setString("")
-    do_recurse_write_toc_tree(0, IsFirstLine(True), target_toc_entry is not toc_root, toc_root, [toc_root], toc_root, target_toc_entry_trace, target_toc_entry)
-
-
-def do_recurse_toc_entry(depth: int, trace: typing.List[TocEntry], toc_root: TocEntry, curr_toc_entry: TocEntry):
-    print(("  " * depth) + curr_toc_entry.text, end='')
-    if len(curr_toc_entry.shapes) > 0:
-        recurse_write_toc_tree(toc_root, trace, curr_toc_entry)
-        print(" (has TOC shape, written)", end='')
-    print("")
-
-    for child_entry in curr_toc_entry.children:
-        do_recurse_toc_entry(depth + 1, trace + [child_entry], toc_root, child_entry)
-
-def recurse_toc_entry(toc_root: TocEntry):
-    do_recurse_toc_entry(0, [toc_root], toc_root, toc_root)
-
-def automatic_breadcrumbs():
-    global BREADCRUMB_X
-    global BREADCRUMB_Y
-    global BREADCRUMB_DELIMITER
-    global BREADCRUMB_STYLE_NAME
-    global TOC_STYLE_NAME
-    global TOC_COLOR_INACTIVE
-    global TOC_COLOR_ACTIVE
-    global SHOULD_EXPAND_ALL_IN_TOC
-    global SHOULD_EXPAND_ALL_IN_ROOT_TOC
-    global SHOULD_SHOW_FULL_BREADCRUMBS
-    global SHOULD_SHOW_TAIL_DELIMITER
-    global ROOT_TITLE
-    global SHOULD_SHOW_ROOT_IN_BREADCRUMBS
-
-    doc = XSCRIPTCONTEXT.getDocument()
-    ctx = XSCRIPTCONTEXT.getComponentContext()
-    ctl = doc.getCurrentController()
-    sm = ctx.ServiceManager
-    pages = doc.DrawPages
-    tdm = ctx.getByName("/singletons/com.sun.star.reflection.theTypeDescriptionManager")
-    tha_enum = tdm.getByHierarchicalName("com.sun.star.drawing.TextHorizontalAdjust")
-    tha_dict = {name: value for name, value in zip(tha_enum.getEnumNames(), tha_enum.getEnumValues())}
-    tva_enum = tdm.getByHierarchicalName("com.sun.star.drawing.TextVerticalAdjust")
-    tva_dict = {name: value for name, value in zip(tva_enum.getEnumNames(), tva_enum.getEnumValues())}
-    fst_enum = tdm.getByHierarchicalName("com.sun.star.drawing.FillStyle")
-    fst_dict = {name: value for name, value in zip(fst_enum.getEnumNames(), fst_enum.getEnumValues())}
-    lst_enum = tdm.getByHierarchicalName("com.sun.star.drawing.LineStyle")
-    lst_dict = {name: value for name, value in zip(lst_enum.getEnumNames(), lst_enum.getEnumValues())}
-
-    # breadcrumbs stack
-    bc_stack = []
-
-    toc_root = TocEntry(ROOT_TITLE)
-    toc_list_stack: typing.List[TocEntry] = []
-    toc_list_stack.append(toc_root)
-
-    graph_styles = doc.StyleFamilies.getByName("graphics")
-    default_graph_style = graph_styles.getByName("standard")
-
-    if graph_styles.hasByName(BREADCRUMB_STYLE_NAME):
-        bc_graph_style = graph_styles.getByName(BREADCRUMB_STYLE_NAME)
-    else:
-        bc_graph_style = graph_styles.createInstance()
-        graph_styles.insertByName(BREADCRUMB_STYLE_NAME, bc_graph_style)
-        bc_graph_style.setParentStyle("standard")
-        bc_graph_style.TextHorizontalAdjust = tha_dict["LEFT"]
-        bc_graph_style.TextVerticalAdjust = tva_dict["TOP"]
-        bc_graph_style.FillStyle = fst_dict["NONE"]
-        bc_graph_style.LineStyle = lst_dict["NONE"]
-
-    # Adding styles to TOC breaks AutoLayouts
-    # if graph_styles.hasByName(TOC_STYLE_NAME):
-    #     toc_graph_style = graph_styles.getByName(TOC_STYLE_NAME)
-    # else:
-    #     toc_graph_style = graph_styles.createInstance()
-    #     graph_styles.insertByName(TOC_STYLE_NAME, toc_graph_style)
-    #     toc_graph_style.setParentStyle("standard")
-        
-
-    for page in pages:
-        for shape in page:
-            if not shape.supportsService("com.sun.star.drawing.TextShape"):
-                continue
-
-    for page in pages:
-        largest_shape = None
-        largest_shape_area = 0
-        top_shape = None
-        top_shape_y = 999999
-        toc_shape = None
-        bc_shape = None
-
-        is_toc = False
-        should_push_title = False
-        push_extra_list = []
-        should_hide_bc = False
-        pop_count = 0
-        set_bc_text = None
-
+            # The target and its children are active, any other line inactive
+            renderings[target] = [(entry.text, entry.depth - 1,
+                                   active_color if entry is target or entry.parent is target else inactive_color)
+                                  for entry in entries]
+        else:
+            renderings[target] = [(entry.text, entry.depth - 1, None) for entry in entries]
+    return renderings
+
+def print_toc_tree(toc_root: TocEntry, write: typing.Callable[[str], None] = print):
+    for entry in number_toc_tree(toc_root):
+        write(("  " * entry.depth) + entry.text + (" (has TOC shape)" if len(entry.shapes) > 0 else ""))
+
+def is_directive_candidate(directive_filter: str, layer: str, x: int, y: int, width: int, height: int,
+                           page_width: int, page_height: int) -> bool:
+    """ Whether a text shape may hold a directive (see DIRECTIVE_FILTER)
+
+    >>> is_directive_candidate("all", "layout", 1400, 628, 25199, 2629, 28000, 21000)
+    True
+    >>> is_directive_candidate("offslide", "layout", 1400, 628, 25199, 2629, 28000, 21000)
+    False
+    >>> is_directive_candidate("offslide", "layout", -4500, 3000, 4000, 962, 28000, 21000)
+    True
+    >>> is_directive_candidate("offslide", "layout", -6500, 10000, 7000, 2384, 28000, 21000)
+    True
+    >>> is_directive_candidate("offslide", "Directives", 1400, 628, 25199, 2629, 28000, 21000)
+    True
+    >>> is_directive_candidate("layer", "layout", -4500, 3000, 4000, 962, 28000, 21000)
+    False
+    """
+    if directive_filter == "all":
+        return True
+    if layer == DIRECTIVE_LAYER:
+        return True
+    if directive_filter == "layer":
+        return False
+    # Centered off the slide: boxes dragged aside may still overlap its edge
+    center_x, center_y = x + width // 2, y + height // 2
+    return center_x < 0 or center_y < 0 or center_x >= page_width or center_y >= page_height
+
+class ShapeRecord(object):
+    """ What the engine reads of a text shape, fetched in one go
+
+    `shape` is the backend's handle, used for writes only; sizes and
+    positions are in 1/100 mm. `text` is None when the shape can't hold
+    a directive (see DIRECTIVE_FILTER): then it was not read at all.
+    `auto_grow` tells whether the shape grows with its text both ways.
+    """
+    __slots__ = ("shape", "text", "is_breadcrumb", "width", "height", "x", "y", "auto_grow")
+
+    def __init__(self, shape, text: typing.Optional[str], is_breadcrumb: bool, width: int, height: int, x: int, y: int,
+                 auto_grow: bool = False):
+        self.shape = shape
+        self.text = text
+        self.is_breadcrumb = is_breadcrumb
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.auto_grow = auto_grow
+
+# Read with one XMultiPropertySet call per shape, names sorted as required
+SNAPSHOT_PROPERTIES = ("LayerName", "Position", "Size", "Style", "TextAutoGrowHeight", "TextAutoGrowWidth")
+
+def _utf16_length(text: str) -> int:
+    """ Length in the UTF-16 units text cursors move by
+
+    >>> _utf16_length("Agenda"), _utf16_length("\U0001F4C8 Sales")
+    (6, 8)
+    """
+    return len(text.encode("utf-16-le")) // 2
+
+class UnoBackend(object):
+    """ Shape access of `run_automatic_breadcrumbs` through UNO
+
+    Any other backend (see breadcrumbs_odf.py) implements the same
+    methods; pages and shapes are opaque handles to the engine.
+    """
+
+    def __init__(self, doc, ctx, cancel=None):
+        self.doc = doc
+        self.ctx = ctx
+        self.bc_graph_style = None
+        self.cancel = cancel  # threading.Event-like, checked between pages
+        self.status = None  # status bar progress, during an edit session
+        self.page_count = 0
+
+    @contextlib.contextmanager
+    def edit_session(self):
+        """ Run the pass as one bulk edit of the document
+
+        No redraw or relayout until the end, a single undo action for
+        all the writes, and a progress bar in the status bar. Should the
+        pass fail or be cancelled, what it already wrote is undone.
+        """
+        doc = self.doc
+        undo_manager = doc.getUndoManager()
+        undo_titles = undo_manager.getAllUndoActionTitles()
+        controller = doc.getCurrentController()
+        self.page_count = doc.DrawPages.getCount()
+        if controller is not None:  # not when loaded hidden
+            self.status = controller.getFrame().createStatusIndicator()
+            self.status.start(UNDO_TITLE, 2 * self.page_count)
+        action_lockable = hasattr(doc, "addActionLock")
+        doc.lockControllers()
+        if action_lockable:
+            doc.addActionLock()
+        undo_manager.enterUndoContext(UNDO_TITLE)
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            undo_manager.leaveUndoContext()
+            if action_lockable:
+                doc.removeActionLock()
+            doc.unlockControllers()
+            if self.status is not None:
+                self.status.end()
+                self.status = None
+            # An empty undo context adds no action: only undo our own
+            if not completed and undo_manager.getAllUndoActionTitles() != undo_titles:
+                undo_manager.undo()
+
+    def progress(self, phase: str, index: int):
+        """ Called before each page of each phase; raise Cancelled to stop """
+        if self.cancel is not None and self.cancel.is_set():
+            raise Cancelled()
+        if self.status is not None:
+            self.status.setValue(index + (self.page_count if phase != PHASE_SCAN else 0))
+
+    def get_pages(self):
+        return self.doc.DrawPages
+
+    def snapshot_page(self, page, directive_filter: str) -> typing.List[ShapeRecord]:
+        # Three bridge round trips per shape: services, properties, text;
+        # the text only of the shapes that may hold a directive
+        page_width = page_height = None
+        if directive_filter == "offslide":
+            page_height, page_width = page.getPropertyValues(("Height", "Width"))
+        records = []
         for shape in page:
-            if not shape.supportsService("com.sun.star.drawing.Text"):
+            services = shape.getSupportedServiceNames()
+            if "com.sun.star.drawing.Text" not in services:
                 continue
 
-            if not shape.supportsService("com.sun.star.drawing.Shape"):
+            if "com.sun.star.drawing.Shape" not in services:
                 continue
 
-            s: str = shape.getString()
-            s = s.strip()
-            if s == "#toc":
-                is_toc = True
-            elif s == "#push":
-                should_push_title = True
-            elif s.startswith("#push "):
-                push_strs = s[len("#push "):].split("|")
-                push_extra_list += push_strs
-            elif s == "#pop":
-                pop_count += 1
-            elif s.startswith("#popto "):
-                pop_count = len(bc_stack) - int(s[len("#popto "):])
-            elif s.startswith("#pop "):
-                pop_count += int(s[len("#pop "):])
-
-            elif s == "#poppush":
-                pop_count += 1
-                should_push_title = True
-            elif s.startswith("#poppush "):
-                pop_count += 1
-                push_strs = s[len("#poppush "):].split("|")
-                push_extra_list += push_strs
-
-            elif s == "#poppoppush":
-                pop_count += 2
-                should_push_title = True
-            elif s.startswith("#poppoppush "):
-                pop_count += 2
-                push_strs = s[len("#poppoppush "):].split("|")
-                push_extra_list += push_strs
-
-            elif s == "#poppoppoppush":
-                pop_count += 3
-                should_push_title = True
-            elif s.startswith("#poppoppoppush "):
-                pop_count += 3
-                push_strs = s[len("#poppoppoppush "):].split("|")
-                push_extra_list += push_strs
-            elif s.startswith("#poptopush "):
-                args = s[len("#poptopush "):].split(" ", 1)
-                pop_count = len(bc_stack) - int(args[0])
-                if len(args) > 1:
-                    push_strs = args[1].split("|")
-                    push_extra_list += push_strs
-                else:
-                    should_push_title = True
-            elif s == "#hidebc":
-                should_hide_bc = True
-            elif s == "#nobc":
-                should_hide_bc = True
-            elif s.startswith("#bc "):
-                set_bc_text = s[len("#bc "):]
-            elif s.startswith("#bcx "):
-                BREADCRUMB_X = int(s[len("#bcx "):])
-            elif s.startswith("#bcy "):
-                BREADCRUMB_Y = int(s[len("#bcy "):])
-            elif s == "#nodelimit":
-                BREADCRUMB_DELIMITER = ""
-            elif s.startswith("#delimit ("):
-                BREADCRUMB_DELIMITER = s[len("#delimit ("):-1]
-            elif s == "#tocexpand":
-                SHOULD_EXPAND_ALL_IN_TOC = True
-            elif s == "#tocrootexpand":
-                SHOULD_EXPAND_ALL_IN_ROOT_TOC = True
-            elif s.startswith("#toccolora "):
-                TOC_COLOR_ACTIVE = s[len("#toccolora "):]
-            elif s.startswith("#toccolorina "):
-                TOC_COLOR_INACTIVE = s[len("#toccolorina "):]
-            elif s == "#bcfull":
-                SHOULD_SHOW_FULL_BREADCRUMBS = True
-            elif s == "#bctail":
-                SHOULD_SHOW_TAIL_DELIMITER = True
-            elif s == "#bcroot":
-                SHOULD_SHOW_ROOT_IN_BREADCRUMBS = True
-            elif s.startswith("#root "):
-                ROOT_TITLE = s[len("#root "):]
-                toc_root.text = ROOT_TITLE
-            # elif shape.Style.Name == TOC_STYLE_NAME:
-            #     toc_shape = shape
-            elif shape.Style.Name == BREADCRUMB_STYLE_NAME:
-                bc_shape = shape
+            layer, position, size, style, grow_height, grow_width = shape.getPropertyValues(SNAPSHOT_PROPERTIES)
+            text = None
+            if is_directive_candidate(directive_filter, layer, position.X, position.Y, size.Width, size.Height,
+                                      page_width, page_height):
+                text = shape.getString()
+            records.append(ShapeRecord(
+                shape, text,
+                # Identity of UNO objects is checked without a round trip
+                style == self.bc_graph_style,
+                size.Width, size.Height, position.X, position.Y,
+                grow_height and grow_width))
+        return records
+
+    def get_string(self, shape) -> str:
+        return shape.getString()
+
+    def ensure_breadcrumb_style(self, create: bool = True):
+        tdm = self.ctx.getByName("/singletons/com.sun.star.reflection.theTypeDescriptionManager")
+        tha_enum = tdm.getByHierarchicalName("com.sun.star.drawing.TextHorizontalAdjust")
+        tha_dict = {name: value for name, value in zip(tha_enum.getEnumNames(), tha_enum.getEnumValues())}
+        tva_enum = tdm.getByHierarchicalName("com.sun.star.drawing.TextVerticalAdjust")
+        tva_dict = {name: value for name, value in zip(tva_enum.getEnumNames(), tva_enum.getEnumValues())}
+        fst_enum = tdm.getByHierarchicalName("com.sun.star.drawing.FillStyle")
+        fst_dict = {name: value for name, value in zip(fst_enum.getEnumNames(), fst_enum.getEnumValues())}
+        lst_enum = tdm.getByHierarchicalName("com.sun.star.drawing.LineStyle")
+        lst_dict = {name: value for name, value in zip(lst_enum.getEnumNames(), lst_enum.getEnumValues())}
+
+        graph_styles = self.doc.StyleFamilies.getByName("graphics")
+
+        if graph_styles.hasByName(BREADCRUMB_STYLE_NAME):
+            self.bc_graph_style = graph_styles.getByName(BREADCRUMB_STYLE_NAME)
+        elif not create:  # dry run: no breadcrumb in the document yet
+            self.bc_graph_style = None
+        else:
+            self.bc_graph_style = graph_styles.createInstance()
+            graph_styles.insertByName(BREADCRUMB_STYLE_NAME, self.bc_graph_style)
+            self.bc_graph_style.setParentStyle("standard")
+            self.bc_graph_style.TextHorizontalAdjust = tha_dict["LEFT"]
+            self.bc_graph_style.TextVerticalAdjust = tva_dict["TOP"]
+            self.bc_graph_style.FillStyle = fst_dict["NONE"]
+            self.bc_graph_style.LineStyle = lst_dict["NONE"]
+
+        # Adding styles to TOC breaks AutoLayouts
+        # if graph_styles.hasByName(TOC_STYLE_NAME):
+        #     toc_graph_style = graph_styles.getByName(TOC_STYLE_NAME)
+        # else:
+        #     toc_graph_style = graph_styles.createInstance()
+        #     graph_styles.insertByName(TOC_STYLE_NAME, toc_graph_style)
+        #     toc_graph_style.setParentStyle("standard")
+
+    def remove_shape(self, page, shape):
+        page.remove(shape)
+
+    def write_breadcrumb(self, page, shape, text: str, x: int, y: int):
+        if shape is None:
+            shape = self.doc.createInstance("com.sun.star.drawing.TextShape")
+            page.add(shape)
+        shape.TextAutoGrowHeight = True
+        shape.TextAutoGrowWidth = True
+        shape.setString(text)
+        shape.setPosition(Point(x, y))
+        shape.Style = self.bc_graph_style
+        return shape
+
+    def set_string(self, shape, text: str):
+        shape.setString(text)
+
+    def get_toc_lines(self, shape) -> typing.Optional[typing.List[tuple]]:
+        """ (text, NumberingLevel, CharColor or None) of each paragraph
+
+        Reading the paragraphs back costs far less than rewriting them.
+        """
+        lines = []
+        paragraphs = shape.getText().createEnumeration()
+        while paragraphs.hasMoreElements():
+            paragraph = paragraphs.nextElement()
+            color, level = paragraph.getPropertyValues(("CharColor", "NumberingLevel"))
+            lines.append((paragraph.getString(), level, color if color != -1 else None))
+        if lines == [("", 0, None)]:
+            return []  # empty text, still one paragraph
+        return lines
+
+    def write_toc(self, shape, lines: typing.List[tuple]):
+        """ Set the whole text at once, then the properties run by run
+
+        Consecutive lines sharing a NumberingLevel (or a CharColor) get
+        it in one call: a few bridge calls per run rather than two calls
+        and two PropertyValue lists per line.
+        """
+        shape.setString("\n".join(text for text, _, _ in lines))
+        if not lines:
+            return
+        cursor = shape.createTextCursor()
+        self._set_runs(cursor, lines, 1, "NumberingLevel")
+        self._set_runs(cursor, lines, 2, "CharColor")
+
+    @staticmethod
+    def _set_runs(cursor, lines: typing.List[tuple], column: int, property_name: str):
+        cursor.gotoStart(False)
+        for value, run in itertools.groupby(lines, key=lambda line: line[column]):
+            # Each paragraph break is selected too: paragraph properties
+            # spill over to the next run's first line, which gets its own
+            # value right after
+            length = sum(_utf16_length(text) + 1 for text, _, _ in run)
+            while length > 0:  # goRight takes a short
+                step = min(length, 0x7fff)
+                cursor.goRight(step, True)
+                length -= step
+            if value is None:
+                cursor.setPropertyToDefault(property_name)
             else:
-                area = shape.Size.Width * shape.Size.Height
-                if area > largest_shape_area:
-                    largest_shape = shape
-                    largest_shape_area = area
-
-                if shape.Position.X >= 0 and shape.Position.Y >= 0:
-                    if shape.Position.Y < top_shape_y:
-                        top_shape = shape
-                        top_shape_y = shape.Position.Y
-                    
-        if pop_count < 0 or pop_count > len(bc_stack):
+                cursor.setPropertyValue(property_name, value)
+            cursor.collapseToEnd()
+
+# =========
+#  COMPILE
+# =========
+
+# Operation kinds a directive compiles into
+OP_TOC = "toc"  # fill the largest shape with the TOC
+OP_PUSH_TITLE = "push_title"  # push the title of the page
+OP_PUSH = "push"  # arg: list of strings to push
+OP_POP = "pop"  # arg: count
+OP_POP_TO = "pop_to"  # arg: depth of the stack to pop to
+OP_HIDE_BC = "hide_bc"
+OP_SET_BC = "set_bc"  # arg: breadcrumb text of the page
+OP_SET = "set"  # arg: (setting name, value)
+OP_ROOT = "root"  # arg: root title
+
+class Op(typing.NamedTuple):
+    kind: str
+    arg: typing.Any = None
+
+def _set(name: str, value) -> typing.List[Op]:
+    return [Op(OP_SET, (name, value))]
+
+def _compile_poptopush(arg: str) -> typing.List[Op]:
+    args = arg.split(" ", 1)
+    ops = [Op(OP_POP_TO, int(args[0]))]
+    if len(args) > 1:
+        ops.append(Op(OP_PUSH, args[1].split("|")))
+    else:
+        ops.append(Op(OP_PUSH_TITLE))
+    return ops
+
+def _compile_delimit(arg: str) -> typing.Optional[typing.List[Op]]:
+    if not arg.startswith("("):
+        return None
+    return _set("BREADCRUMB_DELIMITER", arg[1:-1])
+
+def _compile_directives(arg: str) -> typing.List[Op]:
+    directive_filter = arg.strip()
+    if directive_filter not in DIRECTIVE_FILTERS:
+        raise ValueError("unknown #directives filter " + directive_filter)
+    return _set("DIRECTIVE_FILTER", directive_filter)
+
+# Directives without argument
+EXACT_DIRECTIVES = {
+    "#toc": [Op(OP_TOC)],
+    "#push": [Op(OP_PUSH_TITLE)],
+    "#pop": [Op(OP_POP, 1)],
+    "#poppush": [Op(OP_POP, 1), Op(OP_PUSH_TITLE)],
+    "#poppoppush": [Op(OP_POP, 2), Op(OP_PUSH_TITLE)],
+    "#poppoppoppush": [Op(OP_POP, 3), Op(OP_PUSH_TITLE)],
+    "#hidebc": [Op(OP_HIDE_BC)],
+    "#nobc": [Op(OP_HIDE_BC)],
+    "#nodelimit": _set("BREADCRUMB_DELIMITER", ""),
+    "#tocexpand": _set("SHOULD_EXPAND_ALL_IN_TOC", True),
+    "#tocrootexpand": _set("SHOULD_EXPAND_ALL_IN_ROOT_TOC", True),
+    "#bcfull": _set("SHOULD_SHOW_FULL_BREADCRUMBS", True),
+    "#bctail": _set("SHOULD_SHOW_TAIL_DELIMITER", True),
+    "#bcroot": _set("SHOULD_SHOW_ROOT_IN_BREADCRUMBS", True),
+}
+
+# Directives followed by a space and an argument: keyword -> compiler,
+# returning the operations, or None when it is not a directive after all
+ARGUMENT_DIRECTIVES = {
+    "#push": lambda arg: [Op(OP_PUSH, arg.split("|"))],
+    "#pop": lambda arg: [Op(OP_POP, int(arg))],
+    "#popto": lambda arg: [Op(OP_POP_TO, int(arg))],
+    "#poppush": lambda arg: [Op(OP_POP, 1), Op(OP_PUSH, arg.split("|"))],
+    "#poppoppush": lambda arg: [Op(OP_POP, 2), Op(OP_PUSH, arg.split("|"))],
+    "#poppoppoppush": lambda arg: [Op(OP_POP, 3), Op(OP_PUSH, arg.split("|"))],
+    "#poptopush": _compile_poptopush,
+    "#bc": lambda arg: [Op(OP_SET_BC, arg)],
+    "#bcx": lambda arg: _set("BREADCRUMB_X", int(arg)),
+    "#bcy": lambda arg: _set("BREADCRUMB_Y", int(arg)),
+    "#delimit": _compile_delimit,
+    "#toccolora": lambda arg: _set("TOC_COLOR_ACTIVE", arg),
+    "#toccolorina": lambda arg: _set("TOC_COLOR_INACTIVE", arg),
+    "#root": lambda arg: [Op(OP_ROOT, arg)],
+    "#directives": _compile_directives,
+}
+
+def compile_directive(text: str) -> typing.Optional[typing.List[Op]]:
+    """ Operations of a directive, None if `text` is not a directive
+
+    >>> compile_directive("#poptopush 1 Intro|Goals")
+    [Op(kind='pop_to', arg=1), Op(kind='push', arg=['Intro', 'Goals'])]
+    >>> compile_directive("#delimit ( > )")
+    [Op(kind='set', arg=('BREADCRUMB_DELIMITER', ' > '))]
+    >>> compile_directive("#bc") is None, compile_directive("Title") is None
+    (True, True)
+    """
+    ops = EXACT_DIRECTIVES.get(text)
+    if ops is not None:
+        return list(ops)
+    keyword, space, arg = text.partition(" ")
+    if space and keyword in ARGUMENT_DIRECTIVES:
+        return ARGUMENT_DIRECTIVES[keyword](arg)
+    return None
+
+class PageDirectives(object):
+    """ A page compiled: its operations and the shapes they refer to """
+    __slots__ = ("page", "ops", "title", "toc_shape", "bc_record")
+
+    def __init__(self, page, ops: typing.List[Op], title: typing.Optional[str] = None,
+                 toc_shape=None, bc_record: typing.Optional[ShapeRecord] = None):
+        self.page = page
+        self.ops = ops
+        self.title = title  # text of the title shape, read if pushed only
+        self.toc_shape = toc_shape  # largest shape, of #toc pages only
+        self.bc_record = bc_record  # existing breadcrumb
+
+def compile_page(backend, page, records: typing.List[ShapeRecord]) -> PageDirectives:
+    largest_shape = None
+    largest_shape_area = 0
+    top_record = None
+    top_shape_y = 999999
+    bc_record = None
+    ops = []
+
+    for record in records:
+        # No text read: matches no directive, only shape geometry counts
+        s: str = record.text.strip() if record.text is not None else ""
+        directive_ops = compile_directive(s)
+        if directive_ops is not None:
+            ops += directive_ops
+        elif record.is_breadcrumb:
+            bc_record = record
+        else:
+            area = record.width * record.height
+            if area > largest_shape_area:
+                largest_shape = record.shape
+                largest_shape_area = area
+
+            if record.x >= 0 and record.y >= 0:
+                if record.y < top_shape_y:
+                    top_record = record
+                    top_shape_y = record.y
+
+    title = None
+    if any(op.kind == OP_PUSH_TITLE for op in ops):
+        if top_record is None:
+            raise ValueError("no title to push")
+        title = top_record.text
+        if title is None:  # the only text read beyond directives
+            title = backend.get_string(top_record.shape)
+    # Only the shapes referred to outlive the page's compilation
+    if not any(op.kind == OP_TOC for op in ops):
+        largest_shape = None
+    return PageDirectives(page, ops, title, largest_shape, bc_record)
+
+# ======
+#  PLAN
+# ======
+
+class PagePlan(object):
+    """ What a page should look like: its breadcrumb, None for none """
+    __slots__ = ("page", "bc_record", "breadcrumb", "x", "y", "stack", "toc_shape", "toc_entry")
+
+    def __init__(self, page, bc_record: typing.Optional[ShapeRecord], breadcrumb: typing.Optional[str],
+                 x: int, y: int, stack: typing.Tuple[str, ...]):
+        self.page = page
+        self.bc_record = bc_record  # existing breadcrumb
+        self.breadcrumb = breadcrumb
+        self.x = x
+        self.y = y
+        self.stack = stack  # content hierarchy stack of the page
+        self.toc_shape = None  # filled with the TOC of toc_entry
+        self.toc_entry = None
+
+class DeckPlan(object):
+    def __init__(self, pages: typing.List[PagePlan], toc_root: TocEntry, settings: dict):
+        self.pages = pages
+        self.toc_root = toc_root  # TOC tree, TOC shapes attached to its entries
+        self.settings = settings  # settings after the last page
+
+class _PageState(object):
+    def __init__(self):
+        self.is_toc = False
+        self.pop_count = 0
+        self.push_title = False
+        self.push_extra_list = []
+        self.hide_bc = False
+        self.bc_text = None
+
+class _DeckState(object):
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self.bc_stack = []
+        self.stack_version = 0  # changes with any push or pop
+        self.toc_root = TocEntry(settings["ROOT_TITLE"])
+        self.toc_list_stack = [self.toc_root]
+        self.rendered = {}  # (stack version, rendering settings) -> breadcrumb text
+        self._versions = itertools.count(1)
+
+    def stack_changed(self):
+        self.stack_version = next(self._versions)
+
+def _render_breadcrumb(deck: _DeckState) -> typing.Optional[str]:
+    """ Breadcrumb text of the current stack, memoized per stack version """
+    settings = deck.settings
+    key = (deck.stack_version, deck.toc_root.text, settings["BREADCRUMB_DELIMITER"],
+           settings["SHOULD_SHOW_FULL_BREADCRUMBS"], settings["SHOULD_SHOW_ROOT_IN_BREADCRUMBS"],
+           settings["SHOULD_SHOW_TAIL_DELIMITER"])
+    if key in deck.rendered:
+        return deck.rendered[key]
+
+    bc_stack = deck.bc_stack
+    if settings["SHOULD_SHOW_FULL_BREADCRUMBS"]:
+        showing_bc_stack = bc_stack
+    else:
+        showing_bc_stack = bc_stack[:-1]
+
+    if settings["SHOULD_SHOW_ROOT_IN_BREADCRUMBS"] and len(showing_bc_stack) > 0:
+        showing_bc_stack = [deck.toc_root.text] + showing_bc_stack
+
+    final_bc_text = None
+    if len(showing_bc_stack) > 0:
+        final_bc_text = settings["BREADCRUMB_DELIMITER"].join(showing_bc_stack)
+        if settings["SHOULD_SHOW_TAIL_DELIMITER"]:
+            final_bc_text += settings["BREADCRUMB_DELIMITER"]
+    deck.rendered[key] = final_bc_text
+    return final_bc_text
+
+def _plan_toc(deck: _DeckState, page: _PageState, arg):
+    page.is_toc = True
+
+def _plan_push_title(deck: _DeckState, page: _PageState, arg):
+    page.push_title = True
+
+def _plan_push(deck: _DeckState, page: _PageState, arg):
+    page.push_extra_list += arg
+
+def _plan_pop(deck: _DeckState, page: _PageState, arg):
+    page.pop_count += arg
+
+def _plan_pop_to(deck: _DeckState, page: _PageState, arg):
+    page.pop_count = len(deck.bc_stack) - arg
+
+def _plan_hide_bc(deck: _DeckState, page: _PageState, arg):
+    page.hide_bc = True
+
+def _plan_set_bc(deck: _DeckState, page: _PageState, arg):
+    page.bc_text = arg
+
+def _plan_set(deck: _DeckState, page: _PageState, arg):
+    name, value = arg
+    deck.settings[name] = value
+
+def _plan_root(deck: _DeckState, page: _PageState, arg):
+    deck.settings["ROOT_TITLE"] = arg
+    deck.toc_root.text = arg
+
+OP_PLANNERS = {
+    OP_TOC: _plan_toc,
+    OP_PUSH_TITLE: _plan_push_title,
+    OP_PUSH: _plan_push,
+    OP_POP: _plan_pop,
+    OP_POP_TO: _plan_pop_to,
+    OP_HIDE_BC: _plan_hide_bc,
+    OP_SET_BC: _plan_set_bc,
+    OP_SET: _plan_set,
+    OP_ROOT: _plan_root,
+}
+
+def plan_deck(pages: typing.Iterable[PageDirectives], settings: typing.Optional[dict] = None) -> DeckPlan:
+    """ Breadcrumbs and TOC tree of the whole deck, without any document access
+
+    `settings` (default: default_settings()) is copied, not modified.
+    """
+    if settings is None:
+        settings = DEFAULT_SETTINGS
+    deck = _DeckState(dict(settings))
+    page_plans = []
+
+    for directives in pages:
+        page = _PageState()
+        for op in directives.ops:
+            OP_PLANNERS[op.kind](deck, page, op.arg)
+        settings = deck.settings
+        bc_stack = deck.bc_stack
+
+        if page.pop_count < 0 or page.pop_count > len(bc_stack):
             raise ValueError("pop too much")
 
-        if toc_shape is None:
-            toc_shape = largest_shape
-        title_shape = top_shape
+        if page.pop_count > 0 or page.push_title or page.push_extra_list:
+            deck.stack_changed()
 
-        for i in range(pop_count):
+        for i in range(page.pop_count):
             bc_stack.pop()
-            toc_list_stack.pop()
+            deck.toc_list_stack.pop()
 
-        if should_push_title:
-            title_text = title_shape.getString().strip()
+        if page.push_title:
+            title_text = directives.title.strip()
             bc_stack.append(title_text)
-            insert_child_and_switch_to(toc_list_stack, title_text)
+            insert_child_and_switch_to(deck.toc_list_stack, title_text)
 
-        bc_stack += push_extra_list
-        for push_extra in push_extra_list:
-            insert_child_and_switch_to(toc_list_stack, push_extra)
+        bc_stack += page.push_extra_list
+        for push_extra in page.push_extra_list:
+            insert_child_and_switch_to(deck.toc_list_stack, push_extra)
 
-        if should_hide_bc:
-            if bc_shape is not None:
-                page.remove(bc_shape)
+        final_bc_text = None
+        if page.hide_bc:
+            pass
+        elif page.bc_text is not None:
+            final_bc_text = page.bc_text
         else:
-            final_bc_text = None
-            if set_bc_text is not None:
-                final_bc_text = set_bc_text
-            else:
-                if SHOULD_SHOW_FULL_BREADCRUMBS:
-                    showing_bc_stack = bc_stack
-                else:
-                    showing_bc_stack = bc_stack[:-1]
-
-                if SHOULD_SHOW_ROOT_IN_BREADCRUMBS and len(showing_bc_stack) > 0:
-                    showing_bc_stack = [toc_root.text] + showing_bc_stack
-
-                if len(showing_bc_stack) > 0:
-                    final_bc_text = BREADCRUMB_DELIMITER.join(showing_bc_stack)
-                    if SHOULD_SHOW_TAIL_DELIMITER:
-                        final_bc_text += BREADCRUMB_DELIMITER
-                
-            if final_bc_text is not None:
-                if bc_shape is None:
-                    bc_shape = doc.createInstance("com.sun.star.drawing.TextShape")
-                    page.add(bc_shape)
-                bc_shape.TextAutoGrowHeight = True
-                bc_shape.TextAutoGrowWidth = True
-                bc_shape.setString(final_bc_text)
-                bc_shape.setPosition(Point(BREADCRUMB_X, BREADCRUMB_Y))
-                bc_shape.Style = bc_graph_style
+            final_bc_text = _render_breadcrumb(deck)
+
+        page_plan = PagePlan(directives.page, directives.bc_record, final_bc_text,
+                             settings["BREADCRUMB_X"], settings["BREADCRUMB_Y"], tuple(bc_stack))
+        page_plans.append(page_plan)
+
+        if page.is_toc:
+            if directives.toc_shape is None:
+                raise ValueError("#toc on a page without any shape to fill")
+            deck.toc_list_stack[-1].shapes.append(directives.toc_shape)
+            page_plan.toc_shape = directives.toc_shape
+            page_plan.toc_entry = deck.toc_list_stack[-1]
+
+    return DeckPlan(page_plans, deck.toc_root, deck.settings)
+
+# =======
+#  APPLY
+# =======
+
+def _current_text(backend, record: ShapeRecord) -> str:
+    return record.text if record.text is not None else backend.get_string(record.shape)
+
+def is_breadcrumb_current(backend, page_plan: PagePlan) -> bool:
+    """ Whether the page's breadcrumb shape already reads and sits as planned """
+    record = page_plan.bc_record
+    if record is None or page_plan.breadcrumb is None:
+        return record is None and page_plan.breadcrumb is None
+    return record.auto_grow and (record.x, record.y) == (page_plan.x, page_plan.y) \
+        and _current_text(backend, record) == page_plan.breadcrumb
+
+def apply_page(backend, page_plan: PagePlan, toc_lines: typing.Optional[typing.List[tuple]]):
+    """ Write one page of the plan, skipping what is already up to date """
+    if not is_breadcrumb_current(backend, page_plan):
+        bc_shape = page_plan.bc_record.shape if page_plan.bc_record is not None else None
+        if page_plan.breadcrumb is not None:
+            backend.write_breadcrumb(page_plan.page, bc_shape, page_plan.breadcrumb,
+                                     page_plan.x, page_plan.y)
+        elif bc_shape is not None:
+            backend.remove_shape(page_plan.page, bc_shape)
+
+    if toc_lines is not None and backend.get_toc_lines(page_plan.toc_shape) != toc_lines:
+        backend.write_toc(page_plan.toc_shape, toc_lines)
+
+def apply_plan(backend, plan: DeckPlan):
+    """ Write the plan, page by page, skipping what is already up to date
+
+    Every breadcrumb and TOC is checked against the page, so that hand
+    edits, new pages and moved pages are all caught.
+
+    >>> import fake_uno
+    >>> doc = fake_uno.FakeDocument()
+    >>> def add_page(title, *directives):
+    ...     page = doc.add_page()
+    ...     _ = page.add_text_shape(title, y=1000)
+    ...     for directive in directives:
+    ...         _ = page.add_text_shape(directive, x=-15000)
+    ...     return page
+    >>> def run():
+    ...     run_automatic_breadcrumbs(UnoBackend(doc, fake_uno.FakeContext()), toc_dump=None)
+    ...     return [[text for text, _, _, style, _ in page if style == BREADCRUMB_STYLE_NAME]
+    ...             for page in doc.dump()]
+    >>> _ = add_page("Intro", "#push", "#bcfull"); _ = add_page("Slide A"); page = add_page("Slide B")
+    >>> run()
+    [['Intro'], ['Intro'], ['Intro']]
+
+    A second run leaves the deck as it is:
+
+    >>> _ = run(); doc.getUndoManager().getAllUndoActionTitles()
+    ('Automatic breadcrumbs',)
+
+    New pages, and pages whose breadcrumb was deleted, get one:
+
+    >>> _ = add_page("New slide C"); page.remove(page.getByIndex(1))
+    >>> run()
+    [['Intro'], ['Intro'], ['Intro'], ['Intro']]
+    """
+    renderings = render_tocs(plan.toc_root, [page_plan.toc_entry for page_plan in plan.pages
+                                             if page_plan.toc_shape is not None], plan.settings)
+    for index, page_plan in enumerate(plan.pages):
+        backend.progress(PHASE_APPLY, index)
+        toc_lines = renderings[page_plan.toc_entry] if page_plan.toc_shape is not None else None
+        apply_page(backend, page_plan, toc_lines)
+
+def compile_deck(backend, settings: dict) -> typing.Iterator[PageDirectives]:
+    """ Compile the pages one by one, starting with the `settings` of the run """
+    directive_filter = settings["DIRECTIVE_FILTER"]
+    for index, page in enumerate(backend.get_pages()):
+        backend.progress(PHASE_SCAN, index)
+        directives = compile_page(backend, page, backend.snapshot_page(page, directive_filter))
+        # The filter decides what the next pages' snapshots read
+        for op in directives.ops:
+            if op.kind == OP_SET and op.arg[0] == "DIRECTIVE_FILTER":
+                directive_filter = op.arg[1]
+        yield directives
+
+def run_automatic_breadcrumbs(backend, settings: typing.Optional[dict] = None,
+                              toc_dump: typing.Optional[typing.Callable[[str], None]] = print):
+    """ Regenerate the breadcrumbs and TOCs of the deck
+
+    The whole pass is one edit session of the backend, see
+    UnoBackend.edit_session.
+
+    All the state of the run is local to it, starting from `settings`
+    (default: default_settings()): runs on different documents may
+    share the module, and even run concurrently. `toc_dump` receives
+    the lines of the TOC tree, None to drop them.
+    """
+    if settings is None:
+        settings = DEFAULT_SETTINGS
+    with backend.edit_session():
+        backend.ensure_breadcrumb_style()
+        pages = list(compile_deck(backend, settings))
+        backend.progress(PHASE_PLAN, 0)
+        plan = plan_deck(pages, settings)
+        apply_plan(backend, plan)
+    if toc_dump is not None:
+        print_toc_tree(plan.toc_root, toc_dump)
+
+# =========
+#  DRY RUN
+# =========
+
+def diff_plan(backend, plan: DeckPlan) -> dict:
+    """ Per-slide changes `apply_plan` would make, as a JSON-able dict
+
+    Only the current breadcrumb and TOC texts are read.
+    """
+    renderings = render_tocs(plan.toc_root, [page_plan.toc_entry for page_plan in plan.pages
+                                             if page_plan.toc_shape is not None], plan.settings)
+    slides = []
+    summary = {"slides": len(plan.pages), "breadcrumbs_added": 0, "breadcrumbs_removed": 0,
+               "breadcrumbs_changed": 0, "tocs_rewritten": 0}
+    for number, page_plan in enumerate(plan.pages, 1):
+        slide = {"slide": number, "stack": list(page_plan.stack)}
+        record = page_plan.bc_record
+        old_text = None
+        if record is not None:
+            old_text = _current_text(backend, record)
+        if record is None and page_plan.breadcrumb is not None:
+            action = "added"
+        elif record is not None and page_plan.breadcrumb is None:
+            action = "removed"
+        elif not is_breadcrumb_current(backend, page_plan):
+            action = "changed"
+        else:
+            action = None
+        if action is not None:
+            summary["breadcrumbs_" + action] += 1
+            slide["breadcrumb"] = {
+                "action": action, "old": old_text, "new": page_plan.breadcrumb,
+                "old_position": [record.x, record.y] if record is not None else None,
+                "new_position": [page_plan.x, page_plan.y] if page_plan.breadcrumb is not None else None,
+            }
+
+        lines = None
+        if page_plan.toc_shape is not None:
+            lines = renderings[page_plan.toc_entry]
+            if backend.get_toc_lines(page_plan.toc_shape) == lines:
+                lines = None  # already up to date
+        if lines is not None:
+            new_text = "\n".join(text for text, _, _ in lines)
+            old_text = backend.get_string(page_plan.toc_shape)
+            summary["tocs_rewritten"] += 1
+            slide["toc"] = {
+                "text_changed": old_text != new_text, "old": old_text, "new": new_text,
+                "lines": [[text, level, "%06X" % color if color is not None else None]
+                          for text, level, color in lines],
+            }
+
+        if "breadcrumb" in slide or "toc" in slide:
+            slides.append(slide)
+    return {"summary": summary, "slides": slides}
+
+def dry_run(backend, settings: typing.Optional[dict] = None) -> dict:
+    """ Scan and plan the whole deck like a real run, but write nothing """
+    if settings is None:
+        settings = DEFAULT_SETTINGS
+    backend.ensure_breadcrumb_style(create=False)
+    plan = plan_deck(compile_deck(backend, settings), settings)
+    return diff_plan(backend, plan)
+
+def format_diff(diff: dict) -> str:
+    """ Human readable form of `diff_plan` """
+    out = []
+    for slide in diff["slides"]:
+        out.append("Slide %d" % slide["slide"])
+        breadcrumb = slide.get("breadcrumb")
+        if breadcrumb is not None:
+            if breadcrumb["action"] == "added":
+                out.append("  + breadcrumb %r at %s" % (breadcrumb["new"], tuple(breadcrumb["new_position"])))
+            elif breadcrumb["action"] == "removed":
+                out.append("  - breadcrumb %r" % breadcrumb["old"])
             else:
-                if bc_shape is not None:
-                    page.remove(bc_shape)
+                out.append("  ~ breadcrumb %r -> %r" % (breadcrumb["old"], breadcrumb["new"]))
+                if breadcrumb["old_position"] != breadcrumb["new_position"]:
+                    out.append("    moved %s -> %s" % (tuple(breadcrumb["old_position"]),
+                                                       tuple(breadcrumb["new_position"])))
+        toc = slide.get("toc")
+        if toc is not None:
+            out.append("  ~ TOC rewritten (%d lines%s)" % (
+                len(toc["lines"]), "" if toc["text_changed"] else ", same text"))
+            for line in difflib.unified_diff(toc["old"].splitlines(), toc["new"].splitlines(), lineterm="", n=0):
+                if not line.startswith(("---", "+++", "@@")):
+                    out.append("    " + line)
+    summary = diff["summary"]
+    out.append("%d slides: %d breadcrumbs added, %d removed, %d changed, %d TOCs rewritten" % (
+        summary["slides"], summary["breadcrumbs_added"], summary["breadcrumbs_removed"],
+        summary["breadcrumbs_changed"], summary["tocs_rewritten"]))
+    return "\n".join(out)
 
-        if is_toc:
-            toc_list_stack[-1].shapes.append(toc_shape)
-            toc_shape.setString("<TOC>")
-            # Adding styles to TOC breaks AutoLayouts
-            # toc_shape.Style = toc_graph_style
+def automatic_breadcrumbs():
+    doc = XSCRIPTCONTEXT.getDocument()
+    ctx = XSCRIPTCONTEXT.getComponentContext()
+    run_automatic_breadcrumbs(UnoBackend(doc, ctx))
 
-    recurse_toc_entry(toc_root)
+def automatic_breadcrumbs_dry_run():
+    """ Show what automatic_breadcrumbs would change, without changing it """
+    doc = XSCRIPTCONTEXT.getDocument()
+    ctx = XSCRIPTCONTEXT.getComponentContext()
+    report = format_diff(dry_run(UnoBackend(doc, ctx)))
+    window = doc.getCurrentController().getFrame().getContainerWindow()
+    box = window.getToolkit().createMessageBox(window, INFOBOX, BUTTONS_OK, "Breadcrumbs dry run", report)
+    box.execute()
 
-g_exportedScripts = automatic_breadcrumbs,
+g_exportedScripts = automatic_breadcrumbs, automatic_breadcrumbs_dry_run
 
 if __name__ == '__main__':
     print()
@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Regenerate breadcrumbs of many .odp and .pptx decks in parallel
+
+    Files, directories (searched recursively for *.odp and *.pptx) and
+    glob patterns are accepted. Decks are spread over a pool of worker
+    processes, largest files first so that the slowest ones do not end
+    up alone at the tail of the run. Each deck goes through
+    `breadcrumbs_odf.automatic_breadcrumbs_file`, or
+    `breadcrumbs_pptx.automatic_breadcrumbs_file` for .pptx decks: no
+    soffice needed.
+
+    Usage:
+
+    python breadcrumbs_batch.py [-j JOBS] [-o OUTPUT_DIR] [--report FILE]
+                                PATH [PATH ...]
+
+    Decks are modified in place unless an output directory is given.
+    The exit status is 1 when any deck failed.
+"""
+import argparse
+import concurrent.futures
+import fnmatch
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+import typing
+
+import breadcrumbs_instrument
+import breadcrumbs_odf
+import breadcrumbs_pptx
+
+# Module processing each file extension
+FILE_BACKENDS = {
+    ".odp": breadcrumbs_odf,
+    ".pptx": breadcrumbs_pptx,
+}
+DEFAULT_PATTERN = "*.odp,*.pptx"
+
+def collect_decks(paths: typing.Iterable[str], pattern: str = DEFAULT_PATTERN) -> typing.List[str]:
+    """ Expand files, directories and glob patterns into a list of decks
+
+    `pattern` is a comma separated list of file patterns, searched in
+    directories.
+    """
+    patterns = [p.strip() for p in pattern.split(",") if p.strip()]
+    decks = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                decks += [os.path.join(root, name) for name in sorted(files)
+                          if any(fnmatch.fnmatch(name, p) for p in patterns)]
+        elif os.path.isfile(path):
+            decks.append(path)
+        else:
+            decks += sorted(p for p in glob.glob(path, recursive=True) if os.path.isfile(p))
+    unique_decks = []
+    seen = set()
+    for deck in decks:
+        if os.path.abspath(deck) not in seen:
+            seen.add(os.path.abspath(deck))
+            unique_decks.append(deck)
+    return unique_decks
+
+def output_path(deck: str, output_dir: typing.Optional[str]) -> typing.Optional[str]:
+    if output_dir is None:
+        return None
+    return os.path.join(output_dir, os.path.basename(deck))
+
+def check_output_dir(decks: typing.List[str], output_dir: typing.Optional[str]):
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        names = [os.path.basename(deck) for deck in decks]
+        if len(set(names)) != len(names):
+            raise ValueError("decks with identical file names can't share an output directory")
+
+def summarize(results: typing.List[dict], wall_seconds: float, jobs: int) -> dict:
+    failed = [result for result in results if not result["ok"]]
+    return {
+        "jobs": jobs,
+        "decks": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": len(failed),
+        "bytes": sum(result["size"] for result in results),
+        "wall_seconds": wall_seconds,
+        "cpu_seconds": sum(result["seconds"] for result in results),
+        "results": sorted(results, key=lambda result: result["path"]),
+    }
+
+def process_deck(src: str, dst: typing.Optional[str] = None, instrument: bool = False) -> dict:
+    """ Worker: run the breadcrumbs pass on one deck, never raising
+
+    With `instrument`, result["instrument"] is the report of the run.
+    """
+    result = {"path": src, "output": dst or src, "ok": False, "error": None,
+              "size": os.path.getsize(src), "seconds": 0.0}
+    start = time.perf_counter()
+    run_instrument = breadcrumbs_instrument.Instrument() if instrument else None
+    try:
+        module = FILE_BACKENDS.get(os.path.splitext(src)[1].lower(), breadcrumbs_odf)
+        result["changed"] = module.automatic_breadcrumbs_file(src, dst, toc_dump=None,
+                                                              instrument=run_instrument)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+    if run_instrument is not None:
+        result["instrument"] = run_instrument.report()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def run_batch(decks: typing.List[str], jobs: typing.Optional[int] = None,
+              output_dir: typing.Optional[str] = None,
+              on_result: typing.Optional[typing.Callable[[dict], None]] = None,
+              instrument: bool = False) -> dict:
+    """ Process `decks` over `jobs` worker processes, return a summary dict """
+    check_output_dir(decks, output_dir)
+
+    # Largest first: the makespan is not dictated by a big deck started last
+    decks = sorted(decks, key=os.path.getsize, reverse=True)
+    start = time.perf_counter()
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(process_deck, deck, output_path(deck, output_dir), instrument)
+                   for deck in decks]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+    return summarize(results, time.perf_counter() - start, jobs or os.cpu_count())
+
+def print_result(result: dict):
+    status = "ok" if result["ok"] else "FAILED"
+    print("%-6s %8.2fs  %s" % (status, result["seconds"], result["path"]))
+    if not result["ok"]:
+        print("       " + result["error"])
+
+def print_summary(summary: dict):
+    print("%d decks, %d failed, %.2fs wall, %.2fs cpu, %d workers" % (
+        summary["decks"], summary["failed"], summary["wall_seconds"],
+        summary["cpu_seconds"], summary["jobs"]))
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Regenerate breadcrumbs and TOCs of many .odp and .pptx decks in parallel.")
+    parser.add_argument("paths", nargs="+", metavar="PATH", help="deck, directory or glob pattern")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="worker processes (default: number of CPUs)")
+    parser.add_argument("-o", "--output-dir", default=None,
+                        help="write decks there instead of modifying them in place")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN,
+                        help="comma separated file patterns searched in directories (default: %(default)s)")
+    parser.add_argument("--report", default=None, help="write the JSON summary to this file")
+    parser.add_argument("--instrument", action="store_true",
+                        help="add call counts and timings of each deck to the --report summary")
+    args = parser.parse_args(argv)
+
+    decks = collect_decks(args.paths, args.pattern)
+    if not decks:
+        parser.error("no deck found")
+    summary = run_batch(decks, jobs=args.jobs, output_dir=args.output_dir, on_result=print_result,
+                        instrument=args.instrument)
+    print_summary(summary)
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
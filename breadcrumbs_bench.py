@@ -0,0 +1,555 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Benchmark breadcrumbs passes on synthetic decks
+
+    `generate_deck` lays out an outline of sections `depth` levels deep,
+    `branching` children per section and as many content slides per
+    innermost section, with an agenda (#toc) slide every `agenda_every`
+    slides and `text_size` characters of body text per content slide.
+    Decks are written as .odp (`write_odp`) or .pptx (`write_pptx`), or
+    built as a `fake_uno.FakeDocument` (`build_fake`).
+
+    `run_case` times a full pass on one deck, best of `repeat`, through
+    a `breadcrumbs_instrument.Instrument`: total and per phase (scan,
+    plan, apply, write), time spent writing breadcrumbs and TOCs,
+    slides per second, peak traced memory (on a separate pass, tracing
+    slows everything down) and, on the fake document, bridge calls.
+    Against a baseline, `compare` lists the regressions.
+
+    Usage:
+
+    python breadcrumbs_bench.py run [--backend odf|pptx|fake ..] [--sizes 100,1000,5000]
+                                    [--baseline FILE] [--save-baseline FILE] [--report FILE]
+    python breadcrumbs_bench.py generate --slides 20000 deck.odp
+
+    `run` exits with status 1 when a case regressed against --baseline:
+    slower or bigger than --tolerance allows, or more bridge calls.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import typing
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+import breadcrumbs
+import breadcrumbs_instrument
+import breadcrumbs_odf
+import breadcrumbs_pptx
+import fake_uno
+
+BASELINE_VERSION = 1
+BACKENDS = ("odf", "pptx", "fake")
+DEFAULT_SIZES = (100, 1000, 5000)
+# Relative slowdown (and memory growth) tolerated against the baseline
+DEFAULT_TOLERANCE = 0.25
+# Timings closer than this to the baseline are noise, whatever the ratio
+NOISE_SECONDS = 0.01
+PHASES = (breadcrumbs.PHASE_SCAN, breadcrumbs.PHASE_PLAN, breadcrumbs.PHASE_APPLY, "write")
+
+# Layout, 1/100 mm, of a 28 cm x 15.75 cm slide
+PAGE_WIDTH = 28000
+PAGE_HEIGHT = 15750
+TITLE_BOX = (2000, 800, 24000, 1800)  # x, y, width, height
+BODY_BOX = (2000, 3200, 24000, 9000)
+TOC_BOX = (2000, 3000, 24000, 12000)
+DIRECTIVE_BOX = (-9000, 800, 8000, 1000)
+BODY_LINE = 80  # characters per body paragraph
+ODP_MIMETYPE = "application/vnd.oasis.opendocument.presentation"
+
+WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india",
+         "juliett", "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo",
+         "sierra", "tango", "uniform", "victor", "whiskey", "xray", "yankee", "zulu")
+
+# ======
+#  DECKS
+# ======
+
+class Slide(typing.NamedTuple):
+    title: str
+    directives: typing.Tuple[str, ...] = ()
+    body: typing.Tuple[str, ...] = ()  # paragraphs
+    agenda: bool = False  # has a box for the TOC
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+def _body(rng: random.Random, size: int) -> typing.Tuple[str, ...]:
+    text = ""
+    while len(text) < size:
+        text += _words(rng, 1) + " "
+    text = text[:size].strip()
+    return tuple(text[i:i + BODY_LINE] for i in range(0, len(text), BODY_LINE))
+
+def _outline(depth: int, branching: int, level: int = 0, prefix: typing.Tuple[int, ...] = ()):
+    """ (section number, None) of each section and (None, index) of each
+    content slide, in order; top-level sections never run out """
+    for i in (itertools.count(1) if level == 0 else range(1, branching + 1)):
+        number = prefix + (i,)
+        yield number, None
+        if level + 1 < depth:
+            yield from _outline(depth, branching, level + 1, number)
+        else:
+            for j in range(branching):
+                yield None, j
+
+def generate_deck(slides: int, depth: int = 3, branching: int = 4, agenda_every: int = 20,
+                  text_size: int = 200, offslide: bool = False, seed: int = 0) -> typing.List[Slide]:
+    """ A synthetic deck of `slides` slides, the same for the same arguments
+
+    >>> [(s.title, s.directives) for s in generate_deck(6, depth=2, branching=1, agenda_every=4)]
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [('Synthetic deck', ('#root Synthetic deck',)), ('1 mike yankee', ('#poptopush 0',)),
+     ('1.1 november bravo', ('#poptopush 1',)), ('Agenda', ('#toc',)),
+     ('Slide 5', ()), ('2 november kilo', ('#poptopush 0',))]
+    """
+    if slides < 1 or depth < 1 or branching < 1:
+        raise ValueError("slides, depth and branching must be at least 1")
+    rng = random.Random(seed)
+    first = ("#root Synthetic deck",) + (("#directives offslide",) if offslide else ())
+    deck = [Slide("Synthetic deck", first)]
+    outline = _outline(depth, branching)
+    while len(deck) < slides:
+        if agenda_every and len(deck) % agenda_every == agenda_every - 1:
+            deck.append(Slide("Agenda", ("#toc",), agenda=True))
+            continue
+        number, _ = next(outline)
+        if number is None:
+            deck.append(Slide("Slide %d" % (len(deck) + 1), body=_body(rng, text_size)))
+        else:
+            title = "%s %s" % (".".join(str(n) for n in number), _words(rng, 2))
+            deck.append(Slide(title, ("#poptopush %d" % (len(number) - 1),)))
+    return deck
+
+def build_fake(deck: typing.List[Slide], latency: float = 0.0) -> fake_uno.FakeDocument:
+    doc = fake_uno.FakeDocument(latency, width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    for slide in deck:
+        page = doc.add_page()
+        page.add_text_shape(slide.title, *TITLE_BOX)
+        if slide.body:
+            page.add_text_shape("\n".join(slide.body), *BODY_BOX)
+        if slide.agenda:
+            page.add_text_shape("", *TOC_BOX)
+        for directive in slide.directives:
+            page.add_text_shape(directive, *DIRECTIVE_BOX)
+    return doc
+
+_NAMESPACES = " ".join('xmlns:%s="%s"' % (prefix, uri) for prefix, uri in sorted(breadcrumbs_odf.NS.items()))
+
+def _frame(box: typing.Tuple[int, int, int, int], paragraphs: typing.Iterable[str]) -> str:
+    x, y, width, height = (breadcrumbs_odf.from_hmm(value) for value in box)
+    return ('<draw:frame draw:style-name="gr1" draw:layer="layout" svg:width="%s" svg:height="%s" '
+            'svg:x="%s" svg:y="%s"><draw:text-box>%s</draw:text-box></draw:frame>' % (
+                width, height, x, y, "".join("<text:p>%s</text:p>" % escape(p) for p in paragraphs)))
+
+def _write_content(deck: typing.List[Slide], out: typing.BinaryIO):
+    out.write(('<?xml version="1.0" encoding="UTF-8"?>\n<office:document-content %s office:version="1.3">'
+               '<office:automatic-styles><style:style style:name="gr1" style:family="graphic" '
+               'style:parent-style-name="standard"/></office:automatic-styles>'
+               '<office:body><office:presentation>' % _NAMESPACES).encode("utf-8"))
+    for i, slide in enumerate(deck):
+        shapes = [_frame(TITLE_BOX, [slide.title])]
+        if slide.body:
+            shapes.append(_frame(BODY_BOX, slide.body))
+        if slide.agenda:
+            shapes.append(_frame(TOC_BOX, [""]))
+        shapes += [_frame(DIRECTIVE_BOX, [directive]) for directive in slide.directives]
+        out.write(('<draw:page draw:name=%s draw:master-page-name="Default">%s</draw:page>' % (
+            quoteattr("page%d" % (i + 1)), "".join(shapes))).encode("utf-8"))
+    out.write(b'</office:presentation></office:body></office:document-content>')
+
+def write_odp(deck: typing.List[Slide], path: str):
+    """ The smallest .odp holding `deck` that LibreOffice still opens """
+    styles = ('<?xml version="1.0" encoding="UTF-8"?>\n<office:document-styles %s office:version="1.3">'
+              '<office:styles><style:style style:name="standard" style:family="graphic"/></office:styles>'
+              '<office:automatic-styles><style:page-layout style:name="PM1"><style:page-layout-properties '
+              'fo:page-width="%s" fo:page-height="%s"/></style:page-layout></office:automatic-styles>'
+              '<office:master-styles><style:master-page style:name="Default" style:page-layout-name="PM1"/>'
+              '</office:master-styles></office:document-styles>' % (
+                  _NAMESPACES, breadcrumbs_odf.from_hmm(PAGE_WIDTH), breadcrumbs_odf.from_hmm(PAGE_HEIGHT)))
+    meta = ('<?xml version="1.0" encoding="UTF-8"?>\n<office:document-meta %s office:version="1.3">'
+            '<office:meta/></office:document-meta>' % _NAMESPACES)
+    manifest = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" '
+                'manifest:version="1.3">'
+                '<manifest:file-entry manifest:full-path="/" manifest:media-type="%s"/>'
+                '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+                '<manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>'
+                '<manifest:file-entry manifest:full-path="meta.xml" manifest:media-type="text/xml"/>'
+                '</manifest:manifest>' % ODP_MIMETYPE)
+    with zipfile.ZipFile(path, "w") as zout:
+        zout.writestr(breadcrumbs_odf.MIMETYPE, ODP_MIMETYPE, zipfile.ZIP_STORED)
+        info = zipfile.ZipInfo(breadcrumbs_odf.CONTENT, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with zout.open(info, "w") as out:  # streamed: 20,000 slides are never held as a string
+            _write_content(deck, out)
+        zout.writestr(breadcrumbs_odf.STYLES, styles, zipfile.ZIP_DEFLATED)
+        zout.writestr("meta.xml", meta, zipfile.ZIP_DEFLATED)
+        zout.writestr("META-INF/manifest.xml", manifest, zipfile.ZIP_DEFLATED)
+
+# PresentationML parts every .pptx needs, besides its slides
+_PPTX_NS = ('xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+            'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"')
+_PPTX_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_PPTX_RELS = '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">%s</Relationships>'
+_PPTX_REL = '<Relationship Id="%s" Type="http://schemas.openxmlformats.org/%s" Target="%s"/>'
+_PPTX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.%s+xml"
+_PPTX_TREE = ('<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+              '<p:grpSpPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/>'
+              '<a:chOff x="0" y="0"/><a:chExt cx="0" cy="0"/></a:xfrm></p:grpSpPr>')
+_PPTX_THEME = (
+    '<a:theme xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" name="Synthetic">'
+    '<a:themeElements><a:clrScheme name="Synthetic">'
+    '<a:dk1><a:srgbClr val="000000"/></a:dk1><a:lt1><a:srgbClr val="FFFFFF"/></a:lt1>'
+    '<a:dk2><a:srgbClr val="1F497D"/></a:dk2><a:lt2><a:srgbClr val="EEECE1"/></a:lt2>'
+    + "".join('<a:accent%d><a:srgbClr val="4F81BD"/></a:accent%d>' % (i, i) for i in range(1, 7)) +
+    '<a:hlink><a:srgbClr val="0000FF"/></a:hlink><a:folHlink><a:srgbClr val="800080"/></a:folHlink>'
+    '</a:clrScheme><a:fontScheme name="Synthetic">'
+    '<a:majorFont><a:latin typeface="Calibri"/><a:ea typeface=""/><a:cs typeface=""/></a:majorFont>'
+    '<a:minorFont><a:latin typeface="Calibri"/><a:ea typeface=""/><a:cs typeface=""/></a:minorFont>'
+    '</a:fontScheme><a:fmtScheme name="Synthetic">'
+    '<a:fillStyleLst>' + '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>' * 3 + '</a:fillStyleLst>'
+    '<a:lnStyleLst>' + '<a:ln w="9525"><a:solidFill><a:schemeClr val="phClr"/></a:solidFill></a:ln>' * 3 +
+    '</a:lnStyleLst><a:effectStyleLst>' + '<a:effectStyle><a:effectLst/></a:effectStyle>' * 3 +
+    '</a:effectStyleLst><a:bgFillStyleLst>' + '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>' * 3 +
+    '</a:bgFillStyleLst></a:fmtScheme></a:themeElements></a:theme>')
+
+def _pptx_xfrm(box: typing.Tuple[int, int, int, int]) -> str:
+    x, y, width, height = (value * 360 for value in box)  # EMU
+    return '<a:xfrm><a:off x="%d" y="%d"/><a:ext cx="%d" cy="%d"/></a:xfrm>' % (x, y, width, height)
+
+def _pptx_shape(shape_id: int, name: str, paragraphs: typing.Iterable[str],
+                box: typing.Optional[typing.Tuple[int, int, int, int]] = None,
+                placeholder: typing.Optional[str] = None) -> str:
+    if placeholder is not None:
+        nv = '<p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr><p:nvPr>%s</p:nvPr>' % placeholder
+    else:
+        nv = '<p:cNvSpPr txBox="1"/><p:nvPr/>'
+    geometry = _pptx_xfrm(box) + '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom>' if box is not None else ""
+    text = "".join('<a:p><a:r><a:rPr lang="en-US"/><a:t>%s</a:t></a:r></a:p>' % escape(p) if p else
+                   '<a:p><a:endParaRPr lang="en-US"/></a:p>' for p in paragraphs)
+    return ('<p:sp><p:nvSpPr><p:cNvPr id="%d" name=%s/>%s</p:nvSpPr><p:spPr>%s</p:spPr>'
+            '<p:txBody><a:bodyPr/><a:lstStyle/>%s</p:txBody></p:sp>' % (
+                shape_id, quoteattr(name), nv, geometry, text))
+
+def _pptx_slide(slide: Slide) -> str:
+    # The title placeholder has no geometry: it takes the master's
+    shapes = [_pptx_shape(2, "Title 1", [slide.title], placeholder='<p:ph type="title"/>')]
+    if slide.body:
+        shapes.append(_pptx_shape(3, "Content 2", slide.body, BODY_BOX, '<p:ph idx="1"/>'))
+    if slide.agenda:
+        shapes.append(_pptx_shape(4, "TOC 3", [""], TOC_BOX))
+    shapes += [_pptx_shape(5 + i, "Directive %d" % (i + 4), [directive], DIRECTIVE_BOX)
+               for i, directive in enumerate(slide.directives)]
+    return _PPTX_HEADER + '<p:sld %s><p:cSld><p:spTree>%s%s</p:spTree></p:cSld></p:sld>' % (
+        _PPTX_NS, _PPTX_TREE, "".join(shapes))
+
+def write_pptx(deck: typing.List[Slide], path: str):
+    """ The smallest .pptx holding `deck`: one master, one layout """
+    rel = "officeDocument/2006/relationships/"
+    master = _PPTX_HEADER + (
+        '<p:sldMaster %s><p:cSld><p:spTree>%s%s%s</p:spTree></p:cSld>'
+        '<p:clrMap bg1="lt1" tx1="dk1" bg2="lt2" tx2="dk2" accent1="accent1" accent2="accent2" '
+        'accent3="accent3" accent4="accent4" accent5="accent5" accent6="accent6" hlink="hlink" '
+        'folHlink="folHlink"/><p:sldLayoutIdLst><p:sldLayoutId id="2147483649" r:id="rId1"/>'
+        '</p:sldLayoutIdLst></p:sldMaster>' % (
+            _PPTX_NS, _PPTX_TREE,
+            _pptx_shape(2, "Title Placeholder 1", [""], TITLE_BOX, '<p:ph type="title"/>'),
+            _pptx_shape(3, "Text Placeholder 2", [""], BODY_BOX, '<p:ph type="body" idx="1"/>')))
+    layout = _PPTX_HEADER + (
+        '<p:sldLayout %s type="obj"><p:cSld name="Title and Content"><p:spTree>%s%s%s</p:spTree></p:cSld>'
+        '<p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sldLayout>' % (
+            _PPTX_NS, _PPTX_TREE, _pptx_shape(2, "Title 1", [""], placeholder='<p:ph type="title"/>'),
+            _pptx_shape(3, "Content Placeholder 2", [""], placeholder='<p:ph idx="1"/>')))
+    presentation = _PPTX_HEADER + (
+        '<p:presentation %s><p:sldMasterIdLst><p:sldMasterId id="2147483648" r:id="rId1"/></p:sldMasterIdLst>'
+        '<p:sldIdLst>%s</p:sldIdLst><p:sldSz cx="%d" cy="%d"/><p:notesSz cx="6858000" cy="9144000"/>'
+        '</p:presentation>' % (_PPTX_NS, "".join('<p:sldId id="%d" r:id="rId%d"/>' % (256 + i, i + 3)
+                                                  for i in range(len(deck))),
+                               PAGE_WIDTH * 360, PAGE_HEIGHT * 360))
+    presentation_rels = _PPTX_RELS % "".join(
+        [_PPTX_REL % ("rId1", rel + "slideMaster", "slideMasters/slideMaster1.xml"),
+         _PPTX_REL % ("rId2", rel + "theme", "theme/theme1.xml")] +
+        [_PPTX_REL % ("rId%d" % (i + 3), rel + "slide", "slides/slide%d.xml" % (i + 1)) for i in range(len(deck))])
+    content_types = (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/ppt/presentation.xml" ContentType="%s"/>'
+        '<Override PartName="/ppt/slideMasters/slideMaster1.xml" ContentType="%s"/>'
+        '<Override PartName="/ppt/slideLayouts/slideLayout1.xml" ContentType="%s"/>'
+        '<Override PartName="/ppt/theme/theme1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.theme+xml"/>%s</Types>' % (
+            _PPTX_CONTENT_TYPE % "presentation.main", _PPTX_CONTENT_TYPE % "slideMaster",
+            _PPTX_CONTENT_TYPE % "slideLayout",
+            "".join('<Override PartName="/ppt/slides/slide%d.xml" ContentType="%s"/>' % (
+                i + 1, _PPTX_CONTENT_TYPE % "slide") for i in range(len(deck)))))
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zout:
+        zout.writestr("[Content_Types].xml", _PPTX_HEADER + content_types)
+        zout.writestr("_rels/.rels", _PPTX_HEADER + _PPTX_RELS % (
+            _PPTX_REL % ("rId1", rel + "officeDocument", "ppt/presentation.xml")))
+        zout.writestr("ppt/presentation.xml", presentation)
+        zout.writestr("ppt/_rels/presentation.xml.rels", _PPTX_HEADER + presentation_rels)
+        zout.writestr("ppt/theme/theme1.xml", _PPTX_HEADER + _PPTX_THEME)
+        zout.writestr("ppt/slideMasters/slideMaster1.xml", master)
+        zout.writestr("ppt/slideMasters/_rels/slideMaster1.xml.rels", _PPTX_HEADER + _PPTX_RELS % (
+            _PPTX_REL % ("rId1", rel + "slideLayout", "../slideLayouts/slideLayout1.xml") +
+            _PPTX_REL % ("rId2", rel + "theme", "../theme/theme1.xml")))
+        zout.writestr("ppt/slideLayouts/slideLayout1.xml", layout)
+        zout.writestr("ppt/slideLayouts/_rels/slideLayout1.xml.rels", _PPTX_HEADER + _PPTX_RELS % (
+            _PPTX_REL % ("rId1", rel + "slideMaster", "../slideMasters/slideMaster1.xml")))
+        slide_rels = _PPTX_HEADER + _PPTX_RELS % (
+            _PPTX_REL % ("rId1", rel + "slideLayout", "../slideLayouts/slideLayout1.xml"))
+        for i, slide in enumerate(deck):
+            zout.writestr("ppt/slides/slide%d.xml" % (i + 1), _pptx_slide(slide))
+            zout.writestr("ppt/slides/_rels/slide%d.xml.rels" % (i + 1), slide_rels)
+
+# ======
+#  CASES
+# ======
+
+class Case(typing.NamedTuple):
+    backend: str  # "odf" or "fake"
+    slides: int
+    depth: int = 3
+    branching: int = 4
+    agenda_every: int = 20
+    text_size: int = 200
+    offslide: bool = False
+    latency: float = 0.0  # fake only, seconds per bridge call
+
+    @property
+    def name(self) -> str:
+        name = "%s-%d-d%db%da%dt%d" % (self.backend, self.slides, self.depth, self.branching,
+                                       self.agenda_every, self.text_size)
+        if self.offslide:
+            name += "-offslide"
+        if self.backend == "fake" and self.latency:
+            name += "-l%g" % self.latency
+        return name
+
+# File backends: deck writer, processing module
+FILE_BACKENDS = {
+    "odf": (".odp", write_odp, breadcrumbs_odf),
+    "pptx": (".pptx", write_pptx, breadcrumbs_pptx),
+}
+
+def _run_once(case: Case, deck: typing.List[Slide], path: typing.Optional[str],
+              instrument: breadcrumbs_instrument.Instrument) -> typing.Optional[int]:
+    """ One full pass; the bridge calls it made on a fake document """
+    if case.backend in FILE_BACKENDS:
+        extension, _, module = FILE_BACKENDS[case.backend]
+        fd, out = tempfile.mkstemp(suffix=extension)
+        os.close(fd)
+        try:
+            module.automatic_breadcrumbs_file(path, out, toc_dump=None, instrument=instrument)
+        finally:
+            os.remove(out)
+        return None
+    doc = build_fake(deck, case.latency)  # not measured
+    backend = instrument.backend(breadcrumbs.UnoBackend(doc, fake_uno.FakeContext()))
+    with instrument.measure():
+        breadcrumbs.run_automatic_breadcrumbs(backend, toc_dump=None)
+    return doc.call_count
+
+def run_case(case: Case, repeat: int = 3, memory: bool = True) -> dict:
+    """ Timings of the fastest of `repeat` passes, and peak memory """
+    if case.backend not in BACKENDS:
+        raise ValueError("unknown backend " + case.backend)
+    deck = generate_deck(case.slides, case.depth, case.branching, case.agenda_every, case.text_size,
+                         case.offslide)
+    path = None
+    if case.backend in FILE_BACKENDS:
+        extension, write, _ = FILE_BACKENDS[case.backend]
+        fd, path = tempfile.mkstemp(suffix=extension)
+        os.close(fd)
+        write(deck, path)
+    try:
+        best = None
+        for _ in range(max(repeat, 1)):
+            instrument = breadcrumbs_instrument.Instrument()
+            calls = _run_once(case, deck, path, instrument)
+            if best is None or instrument.seconds < best[0].seconds:
+                best = instrument, calls
+        instrument, calls = best
+        peak = None
+        if memory:
+            traced = breadcrumbs_instrument.Instrument(trace_memory=True)
+            _run_once(case, deck, path, traced)
+            peak = traced.memory["peak_bytes"]
+    finally:
+        if path is not None:
+            os.remove(path)
+    return {
+        "case": case.name,
+        "backend": case.backend,
+        "slides": case.slides,
+        "seconds": instrument.seconds,
+        "phases": {phase: instrument.phases.get(phase, 0.0) for phase in PHASES},
+        "breadcrumbs_seconds": instrument.writes["breadcrumbs"],
+        "tocs_seconds": instrument.writes["tocs"],
+        "slides_per_second": case.slides / instrument.seconds if instrument.seconds else None,
+        "peak_bytes": peak,
+        "bridge_calls": calls,
+    }
+
+def scaling(results: typing.List[dict]):
+    """ Fill result["scaling"], the exponent of time against slides
+    since the previous size of the same configuration (1.0: linear) """
+    previous = {}
+    for result in sorted(results, key=lambda result: result["slides"]):
+        key = result["case"].replace("-%d-" % result["slides"], "-", 1)
+        before = previous.get(key)
+        result["scaling"] = None
+        if before is not None and before["seconds"] > 0 and result["seconds"] > 0:
+            result["scaling"] = math.log(result["seconds"] / before["seconds"]) / \
+                                math.log(result["slides"] / before["slides"])
+        previous[key] = result
+
+# ==========
+#  BASELINE
+# ==========
+
+def save_baseline(results: typing.List[dict], path: str):
+    with open(path, "w") as f:
+        json.dump({"version": BASELINE_VERSION, "cases": {result["case"]: result for result in results}},
+                  f, indent=2, sort_keys=True)
+
+def load_baseline(path: str) -> typing.Dict[str, dict]:
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError("unsupported baseline version in " + path)
+    return baseline["cases"]
+
+def _slower(new: float, old: float, tolerance: float) -> bool:
+    return new > old * (1 + tolerance) and new - old > NOISE_SECONDS
+
+def compare(results: typing.List[dict], baseline: typing.Dict[str, dict],
+            tolerance: float = DEFAULT_TOLERANCE) -> typing.List[str]:
+    """ Regressions of `results` against the `baseline` cases they share
+
+    >>> old = {"fake-1": {"seconds": 1.0, "phases": {"scan": 0.5}, "peak_bytes": 100, "bridge_calls": 10}}
+    >>> compare([{"case": "fake-1", "seconds": 1.1, "phases": {"scan": 0.9},
+    ...           "peak_bytes": 100, "bridge_calls": 11}], old)
+    ['fake-1: scan 0.900s, baseline 0.500s', 'fake-1: 11 bridge calls, baseline 10']
+    """
+    regressions = []
+    for result in results:
+        old = baseline.get(result["case"])
+        if old is None:
+            continue
+        name = result["case"]
+        if _slower(result["seconds"], old["seconds"], tolerance):
+            regressions.append("%s: %.3fs, baseline %.3fs" % (name, result["seconds"], old["seconds"]))
+        for phase, seconds in sorted(result["phases"].items()):
+            if phase in old["phases"] and _slower(seconds, old["phases"][phase], tolerance):
+                regressions.append("%s: %s %.3fs, baseline %.3fs" % (name, phase, seconds, old["phases"][phase]))
+        if result["peak_bytes"] is not None and old.get("peak_bytes") is not None \
+                and result["peak_bytes"] > old["peak_bytes"] * (1 + tolerance):
+            regressions.append("%s: peak memory %d bytes, baseline %d" % (name, result["peak_bytes"],
+                                                                          old["peak_bytes"]))
+        # Deterministic: any increase is a regression
+        if result["bridge_calls"] is not None and old.get("bridge_calls") is not None \
+                and result["bridge_calls"] > old["bridge_calls"]:
+            regressions.append("%s: %d bridge calls, baseline %d" % (name, result["bridge_calls"],
+                                                                     old["bridge_calls"]))
+    return regressions
+
+# =====
+#  CLI
+# =====
+
+def print_results(results: typing.List[dict]):
+    print("%-34s %8s %8s %8s %8s %8s %8s %8s %10s %8s %9s %7s" % (
+        "case", "seconds", "scan", "plan", "apply", "write", "bc", "tocs", "slides/s", "peak MB", "calls",
+        "scaling"))
+    for result in results:
+        phases = result["phases"]
+        print("%-34s %8.3f %8.3f %8.3f %8.3f %8.3f %8.3f %8.3f %10.0f %8s %9s %7s" % (
+            result["case"], result["seconds"], phases["scan"], phases["plan"], phases["apply"], phases["write"],
+            result["breadcrumbs_seconds"], result["tocs_seconds"], result["slides_per_second"] or 0,
+            "%.1f" % (result["peak_bytes"] / 1e6) if result["peak_bytes"] is not None else "-",
+            result["bridge_calls"] if result["bridge_calls"] is not None else "-",
+            "%.2f" % result["scaling"] if result.get("scaling") is not None else "-"))
+
+def _add_deck_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--depth", type=int, default=3, help="outline levels (default: 3)")
+    parser.add_argument("--branching", type=int, default=4,
+                        help="subsections per section, slides per innermost section (default: 4)")
+    parser.add_argument("--agenda-every", type=int, default=20,
+                        help="one agenda (#toc) slide every this many slides, 0 for none (default: 20)")
+    parser.add_argument("--text-size", type=int, default=200,
+                        help="characters of body text per content slide (default: 200)")
+    parser.add_argument("--offslide", action="store_true", help="start the deck with #directives offslide")
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark breadcrumbs passes on synthetic decks.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="time passes, compare them to a baseline")
+    run_parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=list(BACKENDS),
+                            help="odf: breadcrumbs_odf.py on an .odp, pptx: breadcrumbs_pptx.py on a .pptx, "
+                                 "fake: UnoBackend on fake_uno")
+    run_parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                            help="comma separated slide counts (default: %(default)s)")
+    _add_deck_arguments(run_parser)
+    run_parser.add_argument("--latency", type=float, default=0.0,
+                            help="seconds per bridge call of the fake document (default: 0)")
+    run_parser.add_argument("--repeat", type=int, default=3, help="passes per case, the fastest counts")
+    run_parser.add_argument("--no-memory", action="store_true", help="skip the peak memory pass")
+    run_parser.add_argument("--baseline", default=None, help="compare to this baseline JSON")
+    run_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                            help="relative slowdown tolerated (default: %(default)s)")
+    run_parser.add_argument("--save-baseline", default=None, help="store the results as a baseline")
+    run_parser.add_argument("--report", default=None, help="write the results as JSON")
+
+    generate_parser = commands.add_parser("generate", help="write a synthetic .odp or .pptx deck")
+    generate_parser.add_argument("output", help=".odp or .pptx file to write")
+    generate_parser.add_argument("--slides", type=int, default=1000, help="slide count (default: 1000)")
+    _add_deck_arguments(generate_parser)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        write = write_pptx if args.output.lower().endswith(".pptx") else write_odp
+        write(generate_deck(args.slides, args.depth, args.branching, args.agenda_every, args.text_size,
+                            args.offslide), args.output)
+        return 0
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",")]
+    except ValueError:
+        parser.error("--sizes takes comma separated integers")
+    baseline = load_baseline(args.baseline) if args.baseline is not None else None
+    results = []
+    for backend in args.backend:
+        for size in sizes:
+            case = Case(backend, size, args.depth, args.branching, args.agenda_every, args.text_size,
+                        args.offslide, args.latency)
+            results.append(run_case(case, args.repeat, not args.no_memory))
+    scaling(results)
+    print_results(results)
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline is not None:
+        save_baseline(results, args.save_baseline)
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,494 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Long-running breadcrumbs service with a job queue
+
+    The daemon keeps its backends warm: worker processes with the
+    breadcrumbs modules already imported (.odp and .pptx decks, no
+    soffice), or a pool of soffice instances (`--instances N`, any format
+    soffice can load). Jobs are queued by priority, highest first; a path
+    submitted again while still queued is not queued twice.
+
+    Usage:
+
+    python breadcrumbs_daemon.py serve [--port PORT | --socket PATH]
+                                       [-j JOBS | --instances N]
+    python breadcrumbs_daemon.py submit [--priority P] [--no-wait]
+                                        [-o OUTPUT] PATH [PATH ...]
+    python breadcrumbs_daemon.py stats
+
+    HTTP API (JSON):
+
+    POST /jobs        {"path": .., "output": .., "priority": 0, "wait": false}
+    GET  /jobs        queued, running and latest finished jobs
+    GET  /jobs/<id>   one job; ?wait=1 blocks until it is finished
+    GET  /stats       queue depth, counters and latency percentiles
+"""
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import heapq
+import http.client
+import http.server
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import typing
+import urllib.parse
+
+import breadcrumbs_batch
+
+DEFAULT_PORT = 8471
+HISTORY = 1000  # finished jobs (and latency samples) kept
+
+class Job(object):
+    """ One "process this file" request and its outcome """
+    _ids = itertools.count(1)
+
+    def __init__(self, path: str, output: typing.Optional[str], priority: int):
+        self.id = next(Job._ids)
+        self.path = path
+        self.output = output
+        self.priority = priority
+        self.state = "queued"  # running, done, failed
+        self.submissions = 1
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.done = threading.Event()
+
+    @property
+    def key(self):
+        return (os.path.abspath(self.path),
+                os.path.abspath(self.output) if self.output else None)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "path": self.path, "output": self.output,
+                "priority": self.priority, "state": self.state,
+                "submissions": self.submissions, "submitted": self.submitted,
+                "started": self.started, "finished": self.finished,
+                "result": self.result}
+
+def percentiles(samples: typing.List[float], points=(50, 90, 99)) -> dict:
+    """ Nearest-rank percentiles, None without samples
+
+    >>> percentiles([4.0, 1.0, 3.0, 2.0])
+    {'p50': 2.0, 'p90': 4.0, 'p99': 4.0}
+    >>> percentiles([])
+    {'p50': None, 'p90': None, 'p99': None}
+    """
+    ordered = sorted(samples)
+    stats = {}
+    for point in points:
+        if ordered:
+            rank = max(1, -(-point * len(ordered) // 100))  # ceiling
+            stats["p%d" % point] = ordered[rank - 1]
+        else:
+            stats["p%d" % point] = None
+    return stats
+
+class JobQueue(object):
+    """ Priority queue of jobs, deduplicated on (path, output) while queued
+
+    Jobs of the same (path, output) never run at the same time: one
+    submitted while another is running waits until that one finishes,
+    then starts from the file it saved.
+
+    >>> queue = JobQueue()
+    >>> first, _ = queue.submit("a.odp")
+    >>> queue.take() is first
+    True
+    >>> again, deduplicated = queue.submit("a.odp", priority=1)
+    >>> other, _ = queue.submit("b.odp")
+    >>> again is first, deduplicated, queue.take() is other
+    (False, False, True)
+    >>> queue.finish(first, {"ok": True})
+    >>> queue.take() is again
+    True
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._heap = []  # (-priority, sequence, job); stale entries skipped
+        self._sequence = itertools.count()
+        self._queued = {}  # job.key -> queued job
+        self._running = {}  # job.id -> job
+        self._busy = set()  # job.key of the running jobs
+        self._finished = collections.OrderedDict()  # job.id -> job
+        self._latencies = collections.deque(maxlen=HISTORY)  # (wait, run, total)
+        self._closed = False
+        self.counters = collections.Counter()
+
+    def submit(self, path: str, output: typing.Optional[str] = None,
+               priority: int = 0) -> typing.Tuple[Job, bool]:
+        """ Queue a job, or return the one already queued for the same file
+
+        :return: (job, deduplicated)
+        """
+        job = Job(path, output, priority)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("queue closed")
+            self.counters["submitted"] += 1
+            queued = self._queued.get(job.key)
+            if queued is not None:
+                queued.submissions += 1
+                self.counters["deduplicated"] += 1
+                if priority > queued.priority:  # re-queued at the new rank
+                    queued.priority = priority
+                    heapq.heappush(self._heap, (-priority, next(self._sequence), queued))
+                return queued, True
+            self._queued[job.key] = job
+            heapq.heappush(self._heap, (-priority, next(self._sequence), job))
+            self._condition.notify()
+        return job, False
+
+    def take(self) -> typing.Optional[Job]:
+        """ Block until a job can run, None once the queue is closed """
+        with self._condition:
+            while True:
+                held = []  # entries of jobs whose file is being processed
+                job = None
+                while self._heap:
+                    entry = heapq.heappop(self._heap)
+                    priority, _, candidate = entry
+                    if candidate.state != "queued" or -priority != candidate.priority:
+                        continue  # stale entry of a re-prioritized job
+                    if candidate.key in self._busy:
+                        held.append(entry)
+                        continue
+                    job = candidate
+                    break
+                for entry in held:
+                    heapq.heappush(self._heap, entry)
+                if job is not None:
+                    del self._queued[job.key]
+                    self._busy.add(job.key)
+                    job.state = "running"
+                    job.started = time.time()
+                    self._running[job.id] = job
+                    return job
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def finish(self, job: Job, result: dict):
+        with self._condition:
+            job.result = result
+            job.finished = time.time()
+            job.state = "done" if result["ok"] else "failed"
+            self.counters[job.state] += 1
+            del self._running[job.id]
+            self._busy.discard(job.key)
+            self._condition.notify_all()  # a job of the same file may be held
+            self._finished[job.id] = job
+            while len(self._finished) > HISTORY:
+                self._finished.popitem(last=False)
+            self._latencies.append((job.started - job.submitted,
+                                    job.finished - job.started,
+                                    job.finished - job.submitted))
+        job.done.set()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def get(self, job_id: int) -> typing.Optional[Job]:
+        with self._condition:
+            for jobs in (self._running, self._finished):
+                if job_id in jobs:
+                    return jobs[job_id]
+            for job in self._queued.values():
+                if job.id == job_id:
+                    return job
+        return None
+
+    def jobs(self) -> typing.List[dict]:
+        with self._condition:
+            jobs = (sorted(self._queued.values(), key=lambda job: (-job.priority, job.id))
+                    + list(self._running.values()) + list(self._finished.values()))
+            return [job.to_dict() for job in jobs]
+
+    def stats(self) -> dict:
+        with self._condition:
+            latencies = list(self._latencies)
+            return {
+                "queued": len(self._queued),
+                "running": len(self._running),
+                "submitted": self.counters["submitted"],
+                "deduplicated": self.counters["deduplicated"],
+                "done": self.counters["done"],
+                "failed": self.counters["failed"],
+                "wait_seconds": percentiles([sample[0] for sample in latencies]),
+                "run_seconds": percentiles([sample[1] for sample in latencies]),
+                "total_seconds": percentiles([sample[2] for sample in latencies]),
+            }
+
+def _failure(job: Job, error: str) -> dict:
+    return {"path": job.path, "output": job.output or job.path, "ok": False,
+            "error": error, "size": 0, "seconds": 0.0}
+
+def _ignore_interrupt():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C stops the daemon, not its workers
+
+class OdfWorkers(object):
+    """ Warm worker processes running `breadcrumbs_batch.process_deck` """
+
+    def __init__(self, jobs: typing.Optional[int] = None):
+        self.size = jobs or os.cpu_count()
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.size, initializer=_ignore_interrupt)
+
+    def process(self, job: Job) -> dict:
+        return self.executor.submit(breadcrumbs_batch.process_deck, job.path, job.output).result()
+
+    def close(self):
+        self.executor.shutdown()
+
+class UnoWorkers(object):
+    """ Warm soffice instances of an `IDE_utils.Runner` pool """
+
+    def __init__(self, instances: int, recycle: typing.Optional[int] = None):
+        import IDE_utils
+        import breadcrumbs_uno
+        self.process_document = breadcrumbs_uno.process_document
+        self.size = instances
+        self.stack = contextlib.ExitStack()
+        self.runner = self.stack.enter_context(
+            IDE_utils.Runner(soffice={}, size=instances, max_documents=recycle))
+        if not self.runner.available():
+            self.stack.close()
+            raise RuntimeError("no soffice instance could be started")
+
+    def process(self, job: Job) -> dict:
+        with self.runner.lease() as office:
+            return self.process_document(office.script_context, job.path, job.output)
+
+    def close(self):
+        self.stack.close()
+
+class Daemon(object):
+    """ A `JobQueue` drained by one dispatcher thread per warm backend slot """
+
+    def __init__(self, workers, on_result: typing.Optional[typing.Callable[[dict], None]] = None):
+        self.queue = JobQueue()
+        self.workers = workers
+        self.on_result = on_result
+        self.threads = [threading.Thread(target=self._dispatch, daemon=True)
+                        for _ in range(workers.size)]
+        for thread in self.threads:
+            thread.start()
+
+    def _dispatch(self):
+        while True:
+            job = self.queue.take()
+            if job is None:
+                return
+            try:
+                if not os.path.isfile(job.path):
+                    raise IOError("no such file: " + job.path)
+                result = self.workers.process(job)
+            except Exception as e:  # broken worker pool, dead soffice..
+                result = _failure(job, "".join(traceback.format_exception_only(type(e), e)).strip())
+            self.queue.finish(job, result)
+            if self.on_result is not None:
+                self.on_result(result)
+
+    def close(self):
+        self.queue.close()
+        for thread in self.threads:
+            thread.join()
+        self.workers.close()
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    server_version = "breadcrumbs-daemon"
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def _reply(self, status: int, body):
+        data = json.dumps(body, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        queue = self.server.daemon.queue
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+        if parts == ["stats"]:
+            self._reply(200, queue.stats())
+        elif parts == ["jobs"]:
+            self._reply(200, queue.jobs())
+        elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            job = queue.get(int(parts[1]))
+            if job is None:
+                self._reply(404, {"error": "no such job"})
+                return
+            if query.get("wait", ["0"])[0] not in ("0", ""):
+                job.done.wait()
+            self._reply(200, job.to_dict())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            path = request["path"]
+            priority = int(request.get("priority", 0))
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": "bad request: %s" % e})
+            return
+        job, deduplicated = self.server.daemon.queue.submit(path, request.get("output"), priority)
+        if request.get("wait"):
+            job.done.wait()
+        body = job.to_dict()
+        body["deduplicated"] = deduplicated
+        self._reply(200 if request.get("wait") else 202, body)
+
+    def log_message(self, format, *args):
+        pass  # one line per job is printed by `serve`, not per request
+
+class HttpServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+if hasattr(socket, "AF_UNIX"):
+    class UnixHttpServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def server_bind(self):
+            if os.path.exists(self.server_address):
+                os.unlink(self.server_address)  # left by a previous daemon
+            socketserver.UnixStreamServer.server_bind(self)
+            self.server_name, self.server_port = "localhost", 0
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout=None):
+        http.client.HTTPConnection.__init__(self, "localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+def request(method: str, path: str, body=None, port: int = DEFAULT_PORT,
+            socket_path: typing.Optional[str] = None):
+    """ Call the daemon API, return the decoded JSON answer """
+    if socket_path is not None:
+        connection = UnixHTTPConnection(socket_path)
+    else:
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+    try:
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        connection.request(method, path, body=data,
+                           headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        answer = json.loads(response.read())
+        if response.status >= 400:
+            raise RuntimeError(answer.get("error", response.reason))
+        return answer
+    finally:
+        connection.close()
+
+def serve(args) -> int:
+    if args.instances is not None:
+        try:
+            workers = UnoWorkers(args.instances, args.recycle)
+        except (RuntimeError, OSError) as e:  # no soffice, or none starting
+            print("breadcrumbs daemon: %s" % e, file=sys.stderr)
+            return 1
+    else:
+        workers = OdfWorkers(args.jobs)
+    daemon = Daemon(workers, on_result=breadcrumbs_batch.print_result)
+    if args.socket is not None:
+        server = UnixHttpServer(args.socket, RequestHandler)
+        where = args.socket
+    else:
+        server = HttpServer(("127.0.0.1", args.port), RequestHandler)
+        where = "http://127.0.0.1:%d" % args.port
+    server.daemon = daemon
+    print("breadcrumbs daemon on %s, %d workers" % (where, workers.size))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+def submit(args) -> int:
+    failed = False
+    for path in args.paths:
+        job = request("POST", "/jobs", {
+            "path": os.path.abspath(path),
+            "output": os.path.abspath(args.output) if args.output else None,
+            "priority": args.priority, "wait": not args.no_wait,
+        }, port=args.port, socket_path=args.socket)
+        if args.no_wait:
+            print("queued %-6d %s%s" % (job["id"], path,
+                                        " (deduplicated)" if job["deduplicated"] else ""))
+        else:
+            breadcrumbs_batch.print_result(job["result"])
+            failed = failed or not job["result"]["ok"]
+    return 1 if failed else 0
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Breadcrumbs regeneration daemon and its client.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="localhost TCP port (default: %d)" % DEFAULT_PORT)
+    parser.add_argument("--socket", default=None, help="Unix socket path, instead of --port")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    serve_parser = commands.add_parser("serve", help="run the daemon")
+    backend = serve_parser.add_mutually_exclusive_group()
+    backend.add_argument("-j", "--jobs", type=int, default=None,
+                         help="ODF worker processes (default: number of CPUs)")
+    backend.add_argument("--instances", type=int, default=None,
+                         help="process decks in a pool of this many soffice instances")
+    serve_parser.add_argument("--recycle", type=int, default=None,
+                              help="restart a pooled soffice instance after this many decks")
+
+    submit_parser = commands.add_parser("submit", help="queue decks")
+    submit_parser.add_argument("paths", nargs="+", metavar="PATH")
+    submit_parser.add_argument("-o", "--output", default=None,
+                               help="output file (default: in place)")
+    submit_parser.add_argument("--priority", type=int, default=0,
+                               help="higher priorities run first (default: 0)")
+    submit_parser.add_argument("--no-wait", action="store_true",
+                               help="return once queued")
+
+    commands.add_parser("stats", help="print queue statistics")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        return serve(args)
+    if args.command == "submit":
+        if args.output is not None and len(args.paths) > 1:
+            parser.error("-o takes a single PATH")
+        return submit(args)
+    print(json.dumps(request("GET", "/stats", port=args.port, socket_path=args.socket), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Opt-in measurements of breadcrumbs runs, reported as JSON
+
+    An `Instrument` follows one run of `breadcrumbs.run_automatic_breadcrumbs`
+    through a wrapped backend:
+    o  calls to the backend, counted and timed by method,
+    o  wall time per phase (setup, scan, plan, apply) and per slide, as
+       delimited by the engine's `progress` calls,
+    o  time spent writing breadcrumbs and TOCs (reads to compare included),
+    o  with `bridge`, the UNO calls made through the document, by method,
+    o  optionally a cProfile summary and the peak traced memory.
+
+    import breadcrumbs, breadcrumbs_instrument
+    instrument = breadcrumbs_instrument.Instrument(profile=True)
+    backend = breadcrumbs.UnoBackend(instrument.bridge(doc), ctx)
+    with instrument.measure():
+        breadcrumbs.run_automatic_breadcrumbs(instrument.backend(backend), toc_dump=None)
+    instrument.write_report('report.json')
+
+    breadcrumbs_odf.py, breadcrumbs_batch.py and breadcrumbs_uno.py expose
+    it as --instrument.
+"""
+import collections
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+import typing
+
+import breadcrumbs
+
+REPORT_VERSION = 1
+# Backend methods whose time counts as writing breadcrumbs / TOCs
+BREADCRUMB_METHODS = {"write_breadcrumb", "remove_shape"}
+TOC_METHODS = {"write_toc", "get_toc_lines"}
+# Entries of the cProfile and tracemalloc summaries
+TOP_COUNT = 20
+
+class Instrument(object):
+    """ Measurements of one run; not thread-safe, use one per run """
+
+    def __init__(self, profile: bool = False, trace_memory: bool = False):
+        self.profiler = cProfile.Profile() if profile else None
+        self.trace_memory = trace_memory
+        self.backend_calls = {}  # method -> [count, seconds]
+        self.bridge_calls = collections.Counter()  # UNO method -> count
+        self.phases = {}  # phase -> seconds
+        self.writes = {"breadcrumbs": 0.0, "tocs": 0.0}
+        self.slides = []  # {"slide": number, phase: seconds..}
+        self.seconds = 0.0
+        self.memory = None
+        self._phase = None
+        self._slide = None
+        self._mark = None
+
+    # --------
+    #  Timing
+    # --------
+
+    def enter(self, phase: typing.Optional[str], slide: typing.Optional[int] = None):
+        """ Close the current phase/slide, start the next one
+
+        Called by the wrapped backend's `progress`, also by callers for
+        their own phases (e.g. writing the file).
+        """
+        now = time.perf_counter()
+        if self._phase is not None:
+            elapsed = now - self._mark
+            self.phases[self._phase] = self.phases.get(self._phase, 0.0) + elapsed
+            if self._slide is not None:
+                while len(self.slides) <= self._slide:
+                    self.slides.append({"slide": len(self.slides) + 1})
+                record = self.slides[self._slide]
+                record[self._phase] = record.get(self._phase, 0.0) + elapsed
+        self._phase, self._slide, self._mark = phase, slide, now
+
+    @contextlib.contextmanager
+    def measure(self):
+        """ Around the run: total time, profiler and memory tracing """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory and hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        self.enter("setup", None)
+        if self.profiler is not None:
+            self.profiler.enable()
+        try:
+            yield self
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            self.enter(None, None)
+            self.seconds += time.perf_counter() - start
+            if self.trace_memory:
+                self.memory = self._memory_summary()
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def _memory_summary(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_COUNT]
+        return {
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top": [{"where": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                    for stat in top],
+        }
+
+    def _profile_summary(self) -> typing.List[dict]:
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({"function": "%s:%d(%s)" % (filename, line, name), "calls": calls,
+                         "total_seconds": total, "cumulative_seconds": cumulative})
+        rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+        return rows[:TOP_COUNT]
+
+    # ----------
+    #  Wrappers
+    # ----------
+
+    def backend(self, backend) -> "InstrumentedBackend":
+        return InstrumentedBackend(backend, self)
+
+    def bridge(self, obj):
+        """ Count the UNO calls made through `obj` and what it returns """
+        return _wrap(obj, self.bridge_calls)
+
+    # --------
+    #  Report
+    # --------
+
+    def report(self) -> dict:
+        report = {
+            "version": REPORT_VERSION,
+            "seconds": self.seconds,
+            "phases": dict(self.phases),
+            "writes": dict(self.writes),
+            "backend_calls": {name: {"count": count, "seconds": seconds}
+                              for name, (count, seconds) in sorted(self.backend_calls.items())},
+            "bridge_calls": dict(sorted(self.bridge_calls.items())),
+            "bridge_calls_total": sum(self.bridge_calls.values()),
+            "slides": self.slides,
+        }
+        if self.profiler is not None:
+            report["profile"] = self._profile_summary()
+        if self.memory is not None:
+            report["memory"] = self.memory
+        return report
+
+    def write_report(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+class InstrumentedBackend(object):
+    """ Any backend, its method calls counted and timed """
+
+    def __init__(self, backend, instrument: Instrument):
+        self._backend = backend
+        self._instrument = instrument
+
+    def progress(self, phase: str, index: int):
+        self._instrument.enter(phase, index if phase != breadcrumbs.PHASE_PLAN else None)
+        self._backend.progress(phase, index)
+
+    def __getattr__(self, name: str):
+        value = getattr(self._backend, name)
+        if not callable(value):
+            return value
+        instrument = self._instrument
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                counts = instrument.backend_calls.setdefault(name, [0, 0.0])
+                counts[0] += 1
+                counts[1] += elapsed
+                if name in TOC_METHODS:
+                    instrument.writes["tocs"] += elapsed
+                elif name in BREADCRUMB_METHODS or \
+                        (name == "get_string" and instrument._phase == breadcrumbs.PHASE_APPLY):
+                    instrument.writes["breadcrumbs"] += elapsed
+        return timed
+
+
+# =============
+#  UNO BRIDGE
+# =============
+
+def _is_interface(obj) -> bool:
+    # Structs (Point, Size..) are copied by value: no bridge call
+    return type(obj).__name__ == "pyuno" and hasattr(obj, "queryInterface")
+
+def _wrap(value, counter: collections.Counter):
+    if isinstance(value, tuple):
+        return tuple(_wrap(item, counter) for item in value)
+    if _is_interface(value):
+        return _UnoProxy(value, counter)
+    return value
+
+def _unwrap(value):
+    if isinstance(value, _UnoProxy):
+        return object.__getattribute__(value, "_target")
+    if isinstance(value, (tuple, list)):
+        return type(value)(_unwrap(item) for item in value)
+    return value
+
+class _UnoProxy(object):
+    """ A UNO object counting the calls made through it
+
+    Attribute reads and writes are property accesses, iterating is
+    one getByIndex per item.
+    """
+    __slots__ = ("_target", "_counter")
+
+    def __init__(self, target, counter: collections.Counter):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_counter", counter)
+
+    def __getattr__(self, name: str):
+        target = object.__getattribute__(self, "_target")
+        counter = object.__getattribute__(self, "_counter")
+        value = getattr(target, name)
+        if not callable(value):
+            counter["getPropertyValue"] += 1
+            return _wrap(value, counter)
+
+        def call(*args):
+            counter[name] += 1
+            return _wrap(value(*_unwrap(args)), counter)
+        return call
+
+    def __setattr__(self, name: str, value):
+        object.__getattribute__(self, "_counter")["setPropertyValue"] += 1
+        setattr(object.__getattribute__(self, "_target"), name, _unwrap(value))
+
+    def __iter__(self):
+        counter = object.__getattribute__(self, "_counter")
+        for item in object.__getattribute__(self, "_target"):
+            counter["getByIndex"] += 1
+            yield _wrap(item, counter)
+
+    def __len__(self):
+        object.__getattribute__(self, "_counter")["getCount"] += 1
+        return len(object.__getattribute__(self, "_target"))
+
+    def __eq__(self, other):
+        return object.__getattribute__(self, "_target") == _unwrap(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(object.__getattribute__(self, "_target"))
@@ -0,0 +1,1117 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Run `automatic_breadcrumbs` on .odp files without (Libre|Open)Office
+
+    The document zip is opened directly: `content.xml` is streamed
+    through twice (scan, then rewrite) so memory use is bounded by the
+    largest slide, `styles.xml` is rewritten only when the
+    "Breadcrumb (Auto-generated)" graphic style has to be created.
+    Every other part of the package (pictures, media..) is copied
+    without being decompressed nor recompressed.
+
+    Usage:
+
+    python breadcrumbs_odf.py deck.odp [output.odp]
+    python breadcrumbs_odf.py --dry-run [--json] deck.odp
+    python breadcrumbs_odf.py --instrument report.json [--profile] deck.odp
+
+    import breadcrumbs_odf
+    breadcrumbs_odf.automatic_breadcrumbs_file('deck.odp', 'out.odp')
+
+    Lengths are converted to 1/100 mm, so directives such as `#bcx` and
+    `#bcy` mean the same as in the UNO macro.
+"""
+import argparse
+import contextlib
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import typing
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+
+import breadcrumbs
+
+NS = {
+    "office": "urn:oasis:names:tc:opendocument:xmlns:office:1.0",
+    "style": "urn:oasis:names:tc:opendocument:xmlns:style:1.0",
+    "text": "urn:oasis:names:tc:opendocument:xmlns:text:1.0",
+    "draw": "urn:oasis:names:tc:opendocument:xmlns:drawing:1.0",
+    "fo": "urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0",
+    "svg": "urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0",
+    "presentation": "urn:oasis:names:tc:opendocument:xmlns:presentation:1.0",
+    "anim": "urn:oasis:names:tc:opendocument:xmlns:animation:1.0",
+}
+
+def _qn(qname: str) -> str:
+    """ 'draw:page' -> '{urn:...:drawing:1.0}page' """
+    prefix, local = qname.split(":")
+    return "{%s}%s" % (NS[prefix], local)
+
+DRAW_PAGE = _qn("draw:page")
+DRAW_FRAME = _qn("draw:frame")
+DRAW_TEXT_BOX = _qn("draw:text-box")
+DRAW_IMAGE = _qn("draw:image")
+DRAW_STYLE_NAME = _qn("draw:style-name")
+DRAW_LAYER = _qn("draw:layer")
+DRAW_TRANSFORM = _qn("draw:transform")
+PRESENTATION_STYLE_NAME = _qn("presentation:style-name")
+TEXT_P = _qn("text:p")
+TEXT_H = _qn("text:h")
+TEXT_SPAN = _qn("text:span")
+TEXT_LIST = _qn("text:list")
+TEXT_LIST_ITEM = _qn("text:list-item")
+TEXT_S = _qn("text:s")
+TEXT_C = _qn("text:c")
+TEXT_TAB = _qn("text:tab")
+TEXT_LINE_BREAK = _qn("text:line-break")
+TEXT_STYLE_NAME = _qn("text:style-name")
+OFFICE_ANNOTATION = _qn("office:annotation")
+OFFICE_AUTOMATIC_STYLES = _qn("office:automatic-styles")
+OFFICE_STYLES = _qn("office:styles")
+STYLE_STYLE = _qn("style:style")
+STYLE_NAME = _qn("style:name")
+STYLE_DISPLAY_NAME = _qn("style:display-name")
+STYLE_FAMILY = _qn("style:family")
+STYLE_PARENT_STYLE_NAME = _qn("style:parent-style-name")
+STYLE_GRAPHIC_PROPERTIES = _qn("style:graphic-properties")
+STYLE_TEXT_PROPERTIES = _qn("style:text-properties")
+STYLE_MASTER_PAGE = _qn("style:master-page")
+STYLE_PAGE_LAYOUT = _qn("style:page-layout")
+STYLE_PAGE_LAYOUT_NAME = _qn("style:page-layout-name")
+STYLE_PAGE_LAYOUT_PROPERTIES = _qn("style:page-layout-properties")
+DRAW_MASTER_PAGE_NAME = _qn("draw:master-page-name")
+
+# Shapes which support the com.sun.star.drawing.Text service in UNO
+TEXT_SHAPE_TAGS = {_qn("draw:" + name) for name in (
+    "rect", "line", "polyline", "polygon", "regular-polygon", "path",
+    "circle", "ellipse", "connector", "caption", "measure", "custom-shape")}
+# draw:frame is a text shape only when it holds a text box or an image
+TEXT_FRAME_CONTENT_TAGS = (DRAW_TEXT_BOX, DRAW_IMAGE)
+# draw:page children that come after the shapes
+PAGE_TRAILER_TAGS = {_qn("presentation:animations"), _qn("anim:par"),
+                     _qn("anim:seq"), _qn("presentation:notes")}
+
+MIMETYPE = "mimetype"
+CONTENT = "content.xml"
+STYLES = "styles.xml"
+
+BREADCRUMB_AUTO_STYLE_NAME = "grbc"
+TOC_COLOR_AUTO_STYLE_NAME = "Tbc"
+
+
+# ======
+#  UNITS
+# ======
+
+_HMM_PER_UNIT = {
+    "cm": 1000.0,
+    "mm": 100.0,
+    "in": 2540.0,
+    "inch": 2540.0,
+    "pt": 2540.0 / 72,
+    "pc": 2540.0 / 6,
+    "px": 2540.0 / 96,
+}
+_LENGTH = re.compile(r'^\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([a-z]*)\s*$')
+_TRANSLATE = re.compile(r'translate\s*\(\s*([^\s,)]+)[\s,]+([^\s,)]+)\s*\)')
+
+def to_hmm(length: typing.Optional[str]) -> int:
+    """ Convert an ODF length into 1/100 mm, the unit used by UNO
+
+    >>> to_hmm('1.4cm')
+    1400
+    >>> to_hmm('-4.5cm')
+    -4500
+    >>> to_hmm('72pt')
+    2540
+    >>> to_hmm(None)
+    0
+    """
+    if not length:
+        return 0
+    match = _LENGTH.match(length)
+    if match is None:
+        return 0
+    value, unit = match.groups()
+    return int(round(float(value) * _HMM_PER_UNIT.get(unit, 1.0)))
+
+def from_hmm(value: int) -> str:
+    """ Convert 1/100 mm into an ODF length
+
+    >>> from_hmm(9500)
+    '95mm'
+    >>> from_hmm(-420)
+    '-4.2mm'
+    """
+    return "%gmm" % (value / 100.0)
+
+
+# =======
+#  STYLES
+# =======
+
+def encode_style_name(name: str) -> str:
+    """ Encode a display name into an ODF style:name, like LibreOffice does
+
+    >>> encode_style_name('Breadcrumb (Auto-generated)')
+    'Breadcrumb_20__28_Auto-generated_29_'
+    >>> encode_style_name('standard')
+    'standard'
+    """
+    encoded = []
+    for i, c in enumerate(name):
+        if c.isalpha() or (i > 0 and (c.isdigit() or c in "-.")):
+            encoded.append(c)
+        else:
+            encoded.append("_%x_" % ord(c))
+    return "".join(encoded)
+
+
+# =====
+#  TEXT
+# =====
+
+_WHITESPACES = re.compile(r'[ \t\r\n]+')
+
+def _collapse(text: typing.Optional[str]) -> str:
+    return _WHITESPACES.sub(" ", text) if text else ""
+
+def _paragraph_text(elem) -> str:
+    parts = [_collapse(elem.text)]
+    for child in elem:
+        if child.tag == TEXT_S:
+            parts.append(" " * int(child.get(TEXT_C, "1")))
+        elif child.tag == TEXT_TAB:
+            parts.append("\t")
+        elif child.tag == TEXT_LINE_BREAK:
+            parts.append("\n")
+        elif child.tag != OFFICE_ANNOTATION:
+            parts.append(_paragraph_text(child))
+        parts.append(_collapse(child.tail))
+    return "".join(parts)
+
+def _text_container(shape):
+    """ Element holding the paragraphs of a text shape """
+    if shape.tag == DRAW_FRAME:
+        for child in shape:
+            if child.tag in TEXT_FRAME_CONTENT_TAGS:
+                return child
+        return None
+    if shape.tag in TEXT_SHAPE_TAGS:
+        return shape
+    return None
+
+def _paragraphs(container):
+    for elem in container.iter():
+        if elem.tag == TEXT_P or elem.tag == TEXT_H:
+            yield elem
+
+def get_shape_string(shape) -> str:
+    """ Text of a shape, paragraphs joined by '\\n' as XText.getString() """
+    container = _text_container(shape)
+    if container is None:
+        return ""
+    return "\n".join(_paragraph_text(p) for p in _paragraphs(container))
+
+def get_toc_lines(shape, text_colors: typing.Dict[str, int]) -> typing.Optional[typing.List[tuple]]:
+    """ (text, NumberingLevel, CharColor or None) of the lines of a TOC shape
+
+    Only the nested text:list written by `OdfBackend.write_toc` is
+    understood, `text_colors` giving the fo:color of the text automatic
+    styles; None when the shape holds anything else.
+    """
+    container = _text_container(shape)
+    if container is None:
+        return None
+    content = [child for child in container if child.tag in (TEXT_P, TEXT_H, TEXT_LIST)]
+    if not content:
+        return []
+    if len(content) > 1 or content[0].tag != TEXT_LIST:
+        return None
+
+    lines = []
+    pending = [(iter(content[0]), 0)]  # children still to visit, list level
+    while pending:
+        children, level = pending[-1]
+        child = next(children, None)
+        if child is None:
+            pending.pop()
+        elif child.tag == TEXT_LIST_ITEM:
+            pending.append((iter(child), level))
+        elif child.tag == TEXT_LIST:
+            pending.append((iter(child), level + 1))
+        elif child.tag == TEXT_P:
+            color = None
+            spans = list(child)
+            if spans:
+                style_name = spans[0].get(TEXT_STYLE_NAME)
+                if len(spans) > 1 or spans[0].tag != TEXT_SPAN or child.text or spans[0].tail \
+                        or style_name not in text_colors:
+                    return None
+                color = text_colors[style_name]
+            lines.append((_paragraph_text(child), level, color))
+        else:
+            return None
+    return lines
+
+def _replace_paragraphs(container, new_children: typing.List[ET.Element]):
+    """ Swap the text content of `container` for `new_children` """
+    index = None
+    for i, child in enumerate(list(container)):
+        if child.tag in (TEXT_P, TEXT_H, TEXT_LIST):
+            if index is None:
+                index = i
+            container.remove(child)
+    if index is None:
+        index = len(container)
+    for offset, child in enumerate(new_children):
+        container.insert(index + offset, child)
+
+def _first_attribute(container, tag: str, attribute: str):
+    for elem in container.iter(tag):
+        value = elem.get(attribute)
+        if value is not None:
+            return value
+    return None
+
+
+# ============
+#  SERIALIZER
+# ============
+
+def _escape_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;") \
+        .replace(">", "&gt;").replace("\r", "&#13;")
+
+def _escape_attribute(text: str) -> str:
+    return _escape_text(text).replace('"', "&quot;") \
+        .replace("\n", "&#10;").replace("\t", "&#9;")
+
+class XmlNamespaces(object):
+    """ uri -> prefix map, kept as declared by the source document
+
+    ElementTree drops unused namespace declarations, yet ODF stores
+    prefixed names inside attribute values (e.g. 'ooow:' formulas),
+    so every declaration read is written back on the root element.
+    """
+
+    def __init__(self, default_namespace: bool = False):
+        self.default_namespace = default_namespace  # keep an xmlns="..", as OOXML parts use
+        self.prefixes = {}  # uri -> prefix
+        self.declared = []  # (prefix, uri) in document order
+        self.qnames = {}  # '{uri}local' -> 'prefix:local' cache
+
+    def add(self, prefix: str, uri: str):
+        if uri in self.prefixes:
+            return
+        taken = set(self.prefixes.values())
+        if prefix in taken or not (prefix or self.default_namespace):
+            base = prefix or "ns"
+            i = 0
+            while "%s%d" % (base, i) in taken:
+                i += 1
+            prefix = "%s%d" % (base, i)
+        self.prefixes[uri] = prefix
+        self.declared.append((prefix, uri))
+
+    def add_defaults(self, defaults: typing.Dict[str, str] = NS):
+        for prefix, uri in defaults.items():
+            self.add(prefix, uri)
+
+    def qname(self, name: str) -> str:
+        qname = self.qnames.get(name)
+        if qname is None:
+            if name[0] != "{":
+                qname = name
+            else:
+                uri, local = name[1:].split("}", 1)
+                if uri == "http://www.w3.org/XML/1998/namespace":
+                    qname = "xml:" + local
+                elif self.prefixes[uri]:
+                    qname = self.prefixes[uri] + ":" + local
+                else:
+                    qname = local
+            self.qnames[name] = qname
+        return qname
+
+    def start_tag(self, elem, declare: bool = False) -> str:
+        parts = ["<", self.qname(elem.tag)]
+        if declare:
+            for prefix, uri in self.declared:
+                parts.append(' xmlns%s="%s"' % (":" + prefix if prefix else "", _escape_attribute(uri)))
+        for key, value in elem.items():
+            parts.append(' %s="%s"' % (self.qname(key), _escape_attribute(value)))
+        parts.append(">")
+        return "".join(parts)
+
+    def end_tag(self, elem) -> str:
+        return "</%s>" % self.qname(elem.tag)
+
+    def write(self, write, elem, declare: bool = False):
+        """ Serialize `elem` and its subtree, without its tail """
+        start = self.start_tag(elem, declare)
+        if len(elem) == 0 and not elem.text:
+            write(start[:-1] + "/>")
+            return
+        write(start)
+        if elem.text:
+            write(_escape_text(elem.text))
+        for child in elem:
+            self.write(write, child)
+            if child.tail:
+                write(_escape_text(child.tail))
+        write(self.end_tag(elem))
+
+def parse_xml(source, defaults: typing.Dict[str, str] = NS,
+              default_namespace: bool = False) -> typing.Tuple[ET.Element, XmlNamespaces]:
+    """ Parse a whole part; `defaults` are the prefixes of namespaces
+    elements may be added in (ODF ones, unless another format's) """
+    namespaces = XmlNamespaces(default_namespace)
+    root = None
+    for event, item in ET.iterparse(source, events=("start-ns", "start")):
+        if event == "start-ns":
+            namespaces.add(*item)
+        elif root is None:
+            root = item
+    namespaces.add_defaults(defaults)
+    return root, namespaces
+
+def serialize_xml(root: ET.Element, namespaces: XmlNamespaces) -> bytes:
+    chunks = ['<?xml version="1.0" encoding="UTF-8"?>\n']
+    namespaces.write(chunks.append, root, declare=True)
+    return "".join(chunks).encode("utf-8")
+
+
+# ===========
+#  STREAMING
+# ===========
+
+# Elements streamed tag by tag; their other children (automatic styles,
+# pages, ..) are handled as whole subtrees, then dropped from memory.
+STREAMED_TAGS = {_qn("office:document-content"), _qn("office:body"),
+                 _qn("office:presentation"), _qn("office:drawing")}
+
+def iter_blocks(source, namespaces: XmlNamespaces, on_streamed=None):
+    """ Yield (depth, element) for each complete child of a streamed element
+
+    The element is removed from the tree once the consumer resumes the
+    iteration, so memory stays bounded by the largest block (in
+    practice: the largest draw:page), whatever the document size.
+    `on_streamed(event, element, depth)` sees the start/end events of
+    streamed elements themselves.
+    """
+    stack = []  # (element, is_streamed)
+    for event, item in ET.iterparse(source, events=("start-ns", "start", "end")):
+        if event == "start-ns":
+            namespaces.add(*item)
+        elif event == "start":
+            is_streamed = not stack or (stack[-1][1] and item.tag in STREAMED_TAGS)
+            stack.append((item, is_streamed))
+            if is_streamed and on_streamed is not None:
+                on_streamed(event, item, len(stack))
+        else:
+            _, is_streamed = stack.pop()
+            if is_streamed:
+                if on_streamed is not None:
+                    on_streamed(event, item, len(stack) + 1)
+            elif stack[-1][1]:
+                yield len(stack), item
+                stack[-1][0].remove(item)
+
+
+# =========
+#  BACKEND
+# =========
+
+class OdfShape(object):
+    """ Snapshot of a text shape, taken while its draw:page streams by
+
+    `index` is the position of the shape among the page children, or
+    None for a breadcrumb shape still to be created. Its text is only
+    read on demand from `element`: once the page is compiled, only the
+    shapes the engine still refers to stay in memory. After a write,
+    `element` is dropped for the `text` and `toc_lines` written.
+    """
+
+    def __init__(self, page_index: int, index: typing.Optional[int], element: typing.Optional[ET.Element] = None,
+                 style_name: str = "", size: typing.Tuple[int, int] = (0, 0),
+                 position: typing.Tuple[int, int] = (0, 0), layer: str = "", auto_grow: bool = False):
+        self.page_index = page_index
+        self.index = index
+        self.element = element
+        self.text = ""
+        self.toc_lines = None
+        self.style_name = style_name
+        self.size = size
+        self.position = position
+        self.layer = layer
+        self.auto_grow = auto_grow
+
+class OdfPage(object):
+    def __init__(self, index: int, shapes: typing.List[OdfShape], size: typing.Tuple[int, int] = (0, 0)):
+        self.index = index
+        self.shapes = shapes  # until the page is compiled
+        self.size = size
+
+class OdfBackend(object):
+    """ Shape access of `breadcrumbs.run_automatic_breadcrumbs` on ODF XML
+
+    content.xml is read twice, both times as a stream:
+    o  `get_pages` snapshots the text shapes of one draw:page at a time,
+       in document (z-)order as DrawPages iterates them in UNO, and
+       every write of the engine is recorded against its page,
+    o  `write_content` replays the recorded edits while copying the
+       document to the output, one draw:page at a time.
+    styles.xml is small and handled as a tree.
+    """
+
+    def __init__(self, zin: zipfile.ZipFile):
+        self.zin = zin
+        self.styles, self.styles_namespaces = parse_xml(zin.open(STYLES))
+        self.styles_modified = False
+        self.namespaces = XmlNamespaces()
+        self.parents = {}  # automatic style name -> parent style name
+        self.auto_grows = set()  # automatic styles growing both ways
+        self.text_colors = {}  # text automatic style -> fo:color, as CharColor
+        self.auto_style_names = set()
+        self.display_names = {}  # style:name -> display name
+        common_styles = self.styles.find(OFFICE_STYLES)
+        if common_styles is not None:
+            for style in common_styles.iter(STYLE_STYLE):
+                name = style.get(STYLE_NAME)
+                self.display_names[name] = style.get(STYLE_DISPLAY_NAME, name)
+        self.bc_style_name = None  # style:name of the breadcrumb style
+        self.bc_auto_style_name = None
+        self.needs_bc_auto_style = False  # a breadcrumb shape lacks it
+        self.toc_colors = []  # CharColor values used by TOC lines
+        self.toc_color_style_names = {}  # color -> text automatic style
+        self.new_auto_styles = None  # built once, as a retry writes content.xml again
+        self.edits = {}  # page index -> [(OdfShape, operation, args)]
+        self.page_sizes = self._index_page_sizes()  # master page -> (width, height)
+
+    def _index_page_sizes(self) -> typing.Dict[str, typing.Tuple[int, int]]:
+        layout_sizes = {}
+        for layout in self.styles.iter(STYLE_PAGE_LAYOUT):
+            props = layout.find(STYLE_PAGE_LAYOUT_PROPERTIES)
+            if props is not None:
+                layout_sizes[layout.get(STYLE_NAME)] = (
+                    to_hmm(props.get(_qn("fo:page-width"))), to_hmm(props.get(_qn("fo:page-height"))))
+        return {master.get(STYLE_NAME): layout_sizes.get(master.get(STYLE_PAGE_LAYOUT_NAME), (0, 0))
+                for master in self.styles.iter(STYLE_MASTER_PAGE)}
+
+    def _index_auto_style(self, style: ET.Element):
+        name = style.get(STYLE_NAME)
+        self.auto_style_names.add(name)
+        parent = style.get(STYLE_PARENT_STYLE_NAME)
+        if parent is not None:
+            self.parents[name] = parent
+        props = style.find(STYLE_GRAPHIC_PROPERTIES)
+        if props is not None \
+                and props.get(_qn("draw:auto-grow-height")) == "true" \
+                and props.get(_qn("draw:auto-grow-width")) == "true":
+            self.auto_grows.add(name)
+        props = style.find(STYLE_TEXT_PROPERTIES)
+        if style.get(STYLE_FAMILY) == "text" and props is not None \
+                and re.match(r"#[0-9a-fA-F]{6}$", props.get(_qn("fo:color"), "")):
+            self.text_colors[name] = int(props.get(_qn("fo:color"))[1:], 16)
+
+    def _new_auto_style(self, base: str, family: str, parent: typing.Optional[str]) -> ET.Element:
+        i = 1
+        while "%s%d" % (base, i) in self.auto_style_names:
+            i += 1
+        style = ET.Element(STYLE_STYLE)
+        style.set(STYLE_NAME, "%s%d" % (base, i))
+        style.set(STYLE_FAMILY, family)
+        if parent is not None:
+            style.set(STYLE_PARENT_STYLE_NAME, parent)
+        self.auto_style_names.add(style.get(STYLE_NAME))
+        return style
+
+    def _resolve_style_name(self, elem) -> str:
+        name = elem.get(DRAW_STYLE_NAME) or elem.get(PRESENTATION_STYLE_NAME)
+        if name is None:
+            return ""
+        name = self.parents.get(name, name)
+        return self.display_names.get(name, name)
+
+    def _snapshot(self, page_index: int, page: ET.Element) -> OdfPage:
+        shapes = []
+        for index, elem in enumerate(page):
+            if _text_container(elem) is None:
+                continue
+            position = (to_hmm(elem.get(_qn("svg:x"))), to_hmm(elem.get(_qn("svg:y"))))
+            if elem.get(_qn("svg:x")) is None and elem.get(DRAW_TRANSFORM):
+                match = _TRANSLATE.search(elem.get(DRAW_TRANSFORM))
+                if match is not None:
+                    position = (to_hmm(match.group(1)), to_hmm(match.group(2)))
+            shapes.append(OdfShape(
+                page_index, index, elem,
+                style_name=self._resolve_style_name(elem),
+                size=(to_hmm(elem.get(_qn("svg:width"))), to_hmm(elem.get(_qn("svg:height")))),
+                position=position,
+                layer=elem.get(DRAW_LAYER, ""),
+                auto_grow=elem.get(DRAW_STYLE_NAME) in self.auto_grows))
+        return OdfPage(page_index, shapes, self.page_sizes.get(page.get(DRAW_MASTER_PAGE_NAME), (0, 0)))
+
+    def get_pages(self):
+        page_index = 0
+        for depth, elem in iter_blocks(self.zin.open(CONTENT), self.namespaces):
+            if elem.tag == OFFICE_AUTOMATIC_STYLES and depth == 1:
+                for style in elem.iter(STYLE_STYLE):
+                    self._index_auto_style(style)
+            elif elem.tag == DRAW_PAGE:
+                page = self._snapshot(page_index, elem)
+                yield page
+                page.shapes = None  # compiled: the shapes the engine dropped can go
+                page_index += 1
+
+    def snapshot_page(self, page: OdfPage, directive_filter: str) -> typing.List[breadcrumbs.ShapeRecord]:
+        records = []
+        for shape in page.shapes:
+            (width, height), (x, y) = shape.size, shape.position
+            # Same directive filtering as over UNO, for the same result
+            candidate = breadcrumbs.is_directive_candidate(
+                directive_filter, shape.layer, x, y, width, height, *page.size)
+            records.append(breadcrumbs.ShapeRecord(
+                shape, self.get_string(shape) if candidate else None,
+                shape.style_name == breadcrumbs.BREADCRUMB_STYLE_NAME,
+                width, height, x, y, shape.auto_grow))
+        return records
+
+    def get_string(self, shape: OdfShape) -> str:
+        if shape.element is not None:
+            return get_shape_string(shape.element)
+        return shape.text
+
+    def edit_session(self):
+        # Edits are only recorded until write_content: nothing to batch
+        return contextlib.nullcontext()
+
+    def progress(self, phase: str, index: int):
+        pass
+
+    def get_toc_lines(self, shape: OdfShape) -> typing.Optional[typing.List[tuple]]:
+        if shape.element is not None:
+            return get_toc_lines(shape.element, self.text_colors)
+        return shape.toc_lines
+
+    def ensure_breadcrumb_style(self, create: bool = True):
+        common_styles = self.styles.find(OFFICE_STYLES)
+        if common_styles is None:
+            common_styles = ET.SubElement(self.styles, OFFICE_STYLES)
+        self.bc_style_name = encode_style_name(breadcrumbs.BREADCRUMB_STYLE_NAME)
+        for name, display_name in self.display_names.items():
+            if display_name == breadcrumbs.BREADCRUMB_STYLE_NAME:
+                self.bc_style_name = name
+                break
+        else:
+            if not create:  # dry run
+                return
+            style = ET.SubElement(common_styles, STYLE_STYLE)
+            style.set(STYLE_NAME, self.bc_style_name)
+            style.set(STYLE_DISPLAY_NAME, breadcrumbs.BREADCRUMB_STYLE_NAME)
+            style.set(STYLE_FAMILY, "graphic")
+            style.set(STYLE_PARENT_STYLE_NAME, "standard")
+            props = ET.SubElement(style, STYLE_GRAPHIC_PROPERTIES)
+            props.set(_qn("draw:stroke"), "none")
+            props.set(_qn("draw:fill"), "none")
+            props.set(_qn("draw:textarea-horizontal-align"), "left")
+            props.set(_qn("draw:textarea-vertical-align"), "top")
+            self.display_names[self.bc_style_name] = breadcrumbs.BREADCRUMB_STYLE_NAME
+            self.styles_modified = True
+
+    def _edit(self, shape: OdfShape, operation: str, *args):
+        self.edits.setdefault(shape.page_index, []).append((shape, operation, args))
+
+    def remove_shape(self, page: OdfPage, shape: OdfShape):
+        self._edit(shape, "remove")
+
+    def write_breadcrumb(self, page: OdfPage, shape: OdfShape, text: str, x: int, y: int):
+        if shape is None:
+            shape = OdfShape(page.index, None, style_name=breadcrumbs.BREADCRUMB_STYLE_NAME)
+        if not shape.auto_grow or shape.style_name != breadcrumbs.BREADCRUMB_STYLE_NAME:
+            self.needs_bc_auto_style = True
+        shape.element = None
+        shape.text = text
+        shape.toc_lines = None
+        shape.position = (x, y)
+        self._edit(shape, "breadcrumb", text, x, y)
+        return shape
+
+    def set_string(self, shape: OdfShape, text: str):
+        shape.element = None
+        shape.text = text
+        shape.toc_lines = None
+        self._edit(shape, "string", text)
+
+    def write_toc(self, shape: OdfShape, lines: typing.List[tuple]):
+        for _, _, color in lines:
+            if color is not None and color not in self.toc_colors:
+                self.toc_colors.append(color)
+        shape.element = None
+        shape.text = "\n".join(text for text, _, _ in lines)
+        shape.toc_lines = list(lines)
+        self._edit(shape, "toc", lines)
+
+    # --------
+    #  Replay
+    # --------
+
+    def _new_auto_styles(self) -> typing.List[ET.Element]:
+        """ Automatic styles the recorded edits refer to
+
+        The ones a previous run added are reused, so that running again
+        does not pile up identical styles.
+        """
+        new_styles = []
+        if self.needs_bc_auto_style:
+            for name in sorted(self.auto_grows):
+                if name.startswith(BREADCRUMB_AUTO_STYLE_NAME) and self.parents.get(name) == self.bc_style_name:
+                    self.bc_auto_style_name = name
+                    break
+            else:
+                # TextAutoGrowHeight/Width live in the shape's automatic style
+                style = self._new_auto_style(BREADCRUMB_AUTO_STYLE_NAME, "graphic", self.bc_style_name)
+                props = ET.SubElement(style, STYLE_GRAPHIC_PROPERTIES)
+                props.set(_qn("draw:auto-grow-height"), "true")
+                props.set(_qn("draw:auto-grow-width"), "true")
+                self.bc_auto_style_name = style.get(STYLE_NAME)
+                new_styles.append(style)
+        for name, color in sorted(self.text_colors.items()):
+            if name.startswith(TOC_COLOR_AUTO_STYLE_NAME):
+                self.toc_color_style_names.setdefault(color, name)
+        for color in self.toc_colors:
+            if color in self.toc_color_style_names:
+                continue
+            style = self._new_auto_style(TOC_COLOR_AUTO_STYLE_NAME, "text", None)
+            props = ET.SubElement(style, STYLE_TEXT_PROPERTIES)
+            props.set(_qn("fo:color"), "#%06x" % color)
+            self.toc_color_style_names[color] = style.get(STYLE_NAME)
+            new_styles.append(style)
+        return new_styles
+
+    def _apply_edits(self, page: ET.Element, edits):
+        children = list(page)
+        elements = {}  # OdfShape -> element, once created or rewritten
+        text_styles = {}  # element -> (list style, paragraph style) before any rewrite
+        for shape, operation, args in edits:
+            elem = elements.get(shape)
+            if elem is None and shape.index is not None:
+                elem = children[shape.index]
+            if elem is not None and elem not in text_styles:
+                container = _text_container(elem)
+                text_styles[elem] = (
+                    _first_attribute(container, TEXT_LIST, TEXT_STYLE_NAME),
+                    _first_attribute(container, TEXT_P, TEXT_STYLE_NAME))
+            if operation == "remove":
+                page.remove(elem)
+            elif operation == "breadcrumb":
+                elements[shape] = elem = self._write_breadcrumb_element(page, elem, *args)
+                text_styles.setdefault(elem, (None, None))
+            elif operation == "string":
+                self._write_string_element(elem, text_styles[elem], *args)
+            elif operation == "toc":
+                self._write_toc_element(elem, text_styles[elem], *args)
+
+    def _write_breadcrumb_element(self, page: ET.Element, elem, text: str, x: int, y: int) -> ET.Element:
+        if elem is None:
+            elem = ET.Element(DRAW_FRAME)
+            elem.set(DRAW_LAYER, "layout")
+            # Auto-grown by (Libre|Open)Office once laid out
+            elem.set(_qn("svg:width"), from_hmm(250 * max(len(text), 1)))
+            elem.set(_qn("svg:height"), from_hmm(712))
+            ET.SubElement(elem, DRAW_TEXT_BOX)
+            index = len(page)
+            for i, child in enumerate(page):
+                if child.tag in PAGE_TRAILER_TAGS:
+                    index = i
+                    break
+            page.insert(index, elem)
+        if elem.get(DRAW_STYLE_NAME) not in self.auto_grows \
+                or self._resolve_style_name(elem) != breadcrumbs.BREADCRUMB_STYLE_NAME:
+            elem.set(DRAW_STYLE_NAME, self.bc_auto_style_name)
+        elem.attrib.pop(DRAW_TRANSFORM, None)
+        elem.set(_qn("svg:x"), from_hmm(x))
+        elem.set(_qn("svg:y"), from_hmm(y))
+        self._write_string_element(elem, (None, None), text)
+        return elem
+
+    def _write_string_element(self, elem: ET.Element, text_styles, text: str):
+        _, style_name = text_styles
+        paragraphs = []
+        for line in text.split("\n"):
+            p = ET.Element(TEXT_P)
+            if style_name is not None:
+                p.set(TEXT_STYLE_NAME, style_name)
+            p.text = line
+            paragraphs.append(p)
+        _replace_paragraphs(_text_container(elem), paragraphs)
+
+    def _write_toc_element(self, elem: ET.Element, text_styles, lines: typing.List[tuple]):
+        """ Lines become nested text:list items, one list level per NumberingLevel """
+        list_style_name, para_style_name = text_styles
+        top_list = ET.Element(TEXT_LIST)
+        if list_style_name is not None:
+            top_list.set(TEXT_STYLE_NAME, list_style_name)
+        lists = [top_list]  # lists[level] is the text:list of that level
+        for text, level, color in lines:
+            level = max(level, 0)
+            del lists[level + 1:]
+            while len(lists) <= level:
+                parent_items = lists[-1].findall(TEXT_LIST_ITEM)
+                if parent_items:
+                    parent_item = parent_items[-1]
+                else:
+                    parent_item = ET.SubElement(lists[-1], TEXT_LIST_ITEM)
+                lists.append(ET.SubElement(parent_item, TEXT_LIST))
+            item = ET.SubElement(lists[level], TEXT_LIST_ITEM)
+            p = ET.SubElement(item, TEXT_P)
+            if para_style_name is not None:
+                p.set(TEXT_STYLE_NAME, para_style_name)
+            if color is None:
+                p.text = text
+            else:
+                span = ET.SubElement(p, TEXT_SPAN)
+                span.set(TEXT_STYLE_NAME, self.toc_color_style_names[color])
+                span.text = text
+        _replace_paragraphs(_text_container(elem), [top_list] if lines else [])
+
+    def write_content(self, out: typing.BinaryIO):
+        """ Stream content.xml into `out`, applying the recorded edits """
+        namespaces = self.namespaces
+        if self.new_auto_styles is None:
+            self.new_auto_styles = self._new_auto_styles()
+        new_auto_styles = list(self.new_auto_styles)
+
+        def write(text: str):
+            out.write(text.encode("utf-8"))
+
+        def on_streamed(event: str, elem: ET.Element, depth: int):
+            if event == "end":
+                write(namespaces.end_tag(elem))
+                return
+            if elem.tag == _qn("office:body") and new_auto_styles:
+                # No office:automatic-styles in the source document
+                auto_styles = ET.Element(OFFICE_AUTOMATIC_STYLES)
+                auto_styles.extend(new_auto_styles)
+                namespaces.write(write, auto_styles)
+                del new_auto_styles[:]
+            write(namespaces.start_tag(elem, declare=depth == 1))
+
+        write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        page_index = 0
+        for depth, elem in iter_blocks(self.zin.open(CONTENT), namespaces, on_streamed):
+            if elem.tag == OFFICE_AUTOMATIC_STYLES and depth == 1:
+                elem.extend(new_auto_styles)
+                del new_auto_styles[:]
+            elif elem.tag == DRAW_PAGE:
+                self._apply_edits(elem, self.edits.get(page_index, ()))
+                page_index += 1
+            chunks = []
+            namespaces.write(chunks.append, elem)
+            if elem.tail:
+                chunks.append(_escape_text(elem.tail))
+            write("".join(chunks))
+
+    def write_styles(self, out: typing.BinaryIO):
+        out.write(serialize_xml(self.styles, self.styles_namespaces))
+
+
+# =========
+#  PACKAGE
+# =========
+
+@contextlib.contextmanager
+def atomic_output(dst: str, mode_from: typing.Optional[str] = None):
+    """ Yield a temporary path, moved over `dst` once the block succeeds """
+    fd, tmp = tempfile.mkstemp(suffix=os.path.splitext(dst)[1],
+                               dir=os.path.dirname(os.path.abspath(dst)))
+    os.close(fd)
+    try:
+        if mode_from is not None:
+            shutil.copymode(mode_from, tmp)
+        yield tmp
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, dst)
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<4sBBBBHHHHIIIHHHHHII")
+_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sHHHHIIH")
+_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+_ZIP64_EXTRA_ID = 0x0001
+_ZIP32_LIMIT = 0xFFFFFFFF
+_UTF8_FLAG = 0x800
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+def _dos_date_time(date_time) -> typing.Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    return (max(year - 1980, 0) << 9 | month << 5 | day,
+            hour << 11 | minute << 5 | second // 2)
+
+def _has_zip64_extra(extra: bytes) -> bool:
+    i = 0
+    while i + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, i)
+        if header_id == _ZIP64_EXTRA_ID:
+            return True
+        i += 4 + size
+    return False
+
+class _PackageWriter(object):
+    """ Minimal zip writer able to copy members without recompressing them
+
+    No zip64 support: `write_package` falls back to `zipfile` for
+    archives needing it.
+    """
+
+    def __init__(self, out: typing.BinaryIO):
+        self.out = out
+        self.offset = 0
+        self.central_directory = []
+
+    def _write(self, data):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def _record(self, info: zipfile.ZipInfo, name: bytes, flag_bits: int, compress_type: int,
+                crc: int, compress_size: int, file_size: int, extra: bytes, header_offset: int):
+        date, time = _dos_date_time(info.date_time)
+        self.central_directory.append(_CENTRAL_HEADER.pack(
+            b"PK\x01\x02", info.create_version, info.create_system,
+            info.extract_version, 0, flag_bits, compress_type, time, date,
+            crc, compress_size, file_size, len(name), len(extra),
+            len(info.comment), 0, info.internal_attr, info.external_attr,
+            header_offset) + name + extra + info.comment)
+
+    def copy(self, source: mmap.mmap, info: zipfile.ZipInfo):
+        """ Copy the local header, compressed bytes and data descriptor of `info` """
+        header = _LOCAL_HEADER.unpack_from(source, info.header_offset)
+        name_length, extra_length = header[9], header[10]
+        end = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length + info.compress_size
+        if info.flag_bits & _DATA_DESCRIPTOR_FLAG:
+            end += 12
+            if source[end - 12:end - 8] == _DATA_DESCRIPTOR_SIGNATURE:
+                end += 4
+        name = info.filename.encode("utf-8" if info.flag_bits & _UTF8_FLAG else "cp437")
+        header_offset = self.offset
+        view = memoryview(source)[info.header_offset:end]
+        try:
+            self._write(view)
+        finally:
+            view.release()
+        self._record(info, name, info.flag_bits, info.compress_type, info.CRC,
+                     info.compress_size, info.file_size, info.extra, header_offset)
+
+    def write(self, info: zipfile.ZipInfo, compress_type: int, writer: typing.Callable[[typing.BinaryIO], None]):
+        """ Add `info` as a new member, its data streamed by `writer` """
+        with tempfile.SpooledTemporaryFile(max_size=16 << 20) as spool:
+            sink = _CompressingSink(spool, compress_type)
+            writer(sink)
+            sink.flush()
+            if sink.file_size > _ZIP32_LIMIT or sink.compress_size > _ZIP32_LIMIT:
+                raise _NeedsZip64()
+            name = info.filename.encode("utf-8")
+            flag_bits = 0 if name.isascii() else _UTF8_FLAG
+            date, time = _dos_date_time(info.date_time)
+            header_offset = self.offset
+            self._write(_LOCAL_HEADER.pack(
+                b"PK\x03\x04", 20, flag_bits, compress_type, time, date,
+                sink.crc, sink.compress_size, sink.file_size, len(name), 0) + name)
+            spool.seek(0)
+            for chunk in iter(lambda: spool.read(1 << 20), b""):
+                self._write(chunk)
+        self._record(info, name, flag_bits, compress_type, sink.crc,
+                     sink.compress_size, sink.file_size, b"", header_offset)
+
+    def close(self):
+        start = self.offset
+        for record in self.central_directory:
+            self._write(record)
+        count = len(self.central_directory)
+        if count > 0xFFFF or self.offset > _ZIP32_LIMIT:
+            raise _NeedsZip64()
+        self._write(_END_OF_CENTRAL_DIRECTORY.pack(
+            b"PK\x05\x06", 0, 0, count, count, self.offset - start, start, 0))
+
+class _CompressingSink(object):
+    """ Write-only file object compressing into `out`, with CRC and sizes """
+
+    def __init__(self, out: typing.BinaryIO, compress_type: int):
+        self.out = out
+        self.compressor = None
+        if compress_type == zipfile.ZIP_DEFLATED:
+            self.compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self.crc = 0
+        self.file_size = 0
+        self.compress_size = 0
+
+    def write(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.file_size += len(data)
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        self.compress_size += len(data)
+        self.out.write(data)
+        return len(data)
+
+    def flush(self):
+        if self.compressor is not None:
+            data = self.compressor.flush()
+            self.compressor = None
+            self.compress_size += len(data)
+            self.out.write(data)
+
+class _NeedsZip64(Exception):
+    pass
+
+def _write_package_recompressed(src: str, dst: str,
+                                parts: typing.Dict[str, typing.Callable[[typing.BinaryIO], None]]):
+    """ `write_package` through `zipfile`, for archives needing zip64 """
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w") as zout:
+        infos = zin.infolist()
+        infos.sort(key=lambda info: info.filename != MIMETYPE)
+        for info in infos:
+            if info.filename == MIMETYPE:
+                info.compress_type = zipfile.ZIP_STORED
+            writer = parts.get(info.filename)
+            if writer is None:
+                zout.writestr(info, zin.read(info))
+                continue
+            new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+            new_info.compress_type = zipfile.ZIP_DEFLATED
+            new_info.external_attr = info.external_attr
+            with zout.open(new_info, "w", force_zip64=True) as out:
+                writer(out)
+        for name in sorted(set(parts) - {info.filename for info in infos}):
+            new_info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            new_info.compress_type = zipfile.ZIP_DEFLATED
+            with zout.open(new_info, "w", force_zip64=True) as out:
+                parts[name](out)
+
+def write_package(src: str, dst: str,
+                  parts: typing.Dict[str, typing.Callable[[typing.BinaryIO], None]]):
+    """ Copy the `src` zip into `dst`, replacing members found in `parts`
+
+    Each replaced member is streamed by its `parts` writer function and
+    deflated, as are the `parts` members `src` lacks, added at the end.
+    Every other member is copied byte for byte from a memory map of
+    `src`: no decompression, no recompression.
+    The `mimetype` member is written first and stored, as ODF requires.
+    """
+    parts = dict(parts)
+    with zipfile.ZipFile(src) as zin:
+        infos = zin.infolist()
+        for info in infos:
+            if info.filename == MIMETYPE and info.compress_type != zipfile.ZIP_STORED \
+                    and MIMETYPE not in parts:
+                mimetype = zin.read(info)
+                parts[MIMETYPE] = lambda sink: sink.write(mimetype)
+    infos.sort(key=lambda info: info.filename != MIMETYPE)
+    if any(_has_zip64_extra(info.extra) for info in infos):
+        _write_package_recompressed(src, dst, parts)
+        return
+
+    try:
+        with open(src, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source, \
+                open(dst, "wb") as out:
+            package = _PackageWriter(out)
+            for info in infos:
+                writer = parts.get(info.filename)
+                if writer is None:
+                    package.copy(source, info)
+                elif info.filename == MIMETYPE:
+                    package.write(info, zipfile.ZIP_STORED, writer)
+                else:
+                    package.write(info, zipfile.ZIP_DEFLATED, writer)
+            for name in sorted(set(parts) - {info.filename for info in infos}):
+                package.write(zipfile.ZipInfo(name, date_time=time.localtime()[:6]),
+                              zipfile.ZIP_DEFLATED, parts[name])
+            package.close()
+    except _NeedsZip64:
+        _write_package_recompressed(src, dst, parts)
+
+def automatic_breadcrumbs_file(src: str, dst: typing.Optional[str] = None,
+                               settings: typing.Optional[dict] = None,
+                               toc_dump: typing.Optional[typing.Callable[[str], None]] = print,
+                               instrument=None) -> bool:
+    """ Run the breadcrumbs pass on the `src` .odp, saving to `dst` (default: in place)
+
+    Return whether anything changed. An up to date deck is not
+    rewritten in place, and only copied to another `dst`. See
+    `breadcrumbs.run_automatic_breadcrumbs` for the other arguments;
+    a `breadcrumbs_instrument.Instrument` measures the run, the
+    package rewrite being its "write" phase.
+    """
+    if instrument is None:
+        return _automatic_breadcrumbs_file(src, dst, settings, toc_dump, None)
+    with instrument.measure():
+        return _automatic_breadcrumbs_file(src, dst, settings, toc_dump, instrument)
+
+def _automatic_breadcrumbs_file(src, dst, settings, toc_dump, instrument) -> bool:
+    if dst is None:
+        dst = src
+    with zipfile.ZipFile(src) as zin:
+        backend = OdfBackend(zin)
+        breadcrumbs.run_automatic_breadcrumbs(backend if instrument is None else instrument.backend(backend),
+                                              settings, toc_dump)
+        if instrument is not None:
+            instrument.enter("write")
+
+        parts = {}
+        if backend.edits:
+            parts[CONTENT] = backend.write_content
+        if backend.styles_modified:
+            parts[STYLES] = backend.write_styles
+        if not parts and os.path.abspath(dst) == os.path.abspath(src):
+            return False
+        with atomic_output(dst, mode_from=src) as tmp:
+            write_package(src, tmp, parts)
+    return bool(parts)
+
+def dry_run_file(src: str, settings: typing.Optional[dict] = None) -> dict:
+    """ `breadcrumbs.dry_run` on the `src` .odp, which is left untouched """
+    with zipfile.ZipFile(src) as zin:
+        return breadcrumbs.dry_run(OdfBackend(zin), settings)
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Regenerate breadcrumbs and TOCs of an .odp deck.")
+    parser.add_argument("src", metavar="deck.odp")
+    parser.add_argument("dst", metavar="output.odp", nargs="?", default=None,
+                        help="default: modify deck.odp in place")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the changes slide by slide, write nothing")
+    parser.add_argument("--json", action="store_true", help="print the --dry-run changes as JSON")
+    parser.add_argument("--instrument", metavar="REPORT", default=None,
+                        help="write call counts and timings of the run to this JSON file")
+    parser.add_argument("--profile", action="store_true", help="add a cProfile summary to --instrument")
+    parser.add_argument("--trace-memory", action="store_true", help="add tracemalloc peaks to --instrument")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        diff = dry_run_file(args.src)
+        print(json.dumps(diff, indent=2, ensure_ascii=False) if args.json else breadcrumbs.format_diff(diff))
+    else:
+        instrument = None
+        if args.instrument is not None:
+            import breadcrumbs_instrument
+            instrument = breadcrumbs_instrument.Instrument(args.profile, args.trace_memory)
+        automatic_breadcrumbs_file(args.src, args.dst, instrument=instrument)
+        if instrument is not None:
+            instrument.write_report(args.instrument)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,612 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Run `automatic_breadcrumbs` on .pptx files without (Libre|Open)Office
+
+    The slides are read straight from their ppt/slides/slideN.xml parts,
+    in the order of ppt/presentation.xml, one part at a time. Only the
+    parts of the slides whose breadcrumb or TOC changed are rewritten;
+    every other part of the package is copied without being
+    decompressed nor recompressed.
+
+    Usage:
+
+    python breadcrumbs_pptx.py deck.pptx [output.pptx]
+    python breadcrumbs_pptx.py --dry-run [--json] deck.pptx
+
+    import breadcrumbs_pptx
+    breadcrumbs_pptx.automatic_breadcrumbs_file('deck.pptx', 'out.pptx')
+
+    Directives, title and TOC shape are found as over UNO. Placeholders
+    without a position of their own take the one of their slide layout
+    or master. PowerPoint having neither graphic styles nor layers:
+    o  breadcrumbs are the shapes named "Breadcrumb (Auto-generated)";
+       their text is rewritten in the formatting of their first
+       paragraph and run, new ones copying the first breadcrumb of the
+       deck,
+    o  `#directives layer` looks for directives in the shapes named
+       "Directives".
+    TOC lines are paragraphs, their NumberingLevel the paragraph level
+    (0 to 8), their color a solid RGB fill of the run.
+"""
+import argparse
+import contextlib
+import copy
+import json
+import os
+import posixpath
+import re
+import sys
+import typing
+import zipfile
+import xml.etree.ElementTree as ET
+
+import breadcrumbs
+import breadcrumbs_odf
+
+NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "pr": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+
+def _qn(qname: str) -> str:
+    prefix, local = qname.split(":")
+    return "{%s}%s" % (NS[prefix], local)
+
+P_SLD_ID = _qn("p:sldId")
+P_SLD_SZ = _qn("p:sldSz")
+P_SP_TREE = _qn("p:spTree")
+P_SP = _qn("p:sp")
+P_NV_SP_PR = _qn("p:nvSpPr")
+P_C_NV_PR = _qn("p:cNvPr")
+P_C_NV_SP_PR = _qn("p:cNvSpPr")
+P_NV_PR = _qn("p:nvPr")
+P_PH = _qn("p:ph")
+P_SP_PR = _qn("p:spPr")
+P_TX_BODY = _qn("p:txBody")
+P_EXT_LST = _qn("p:extLst")
+A_XFRM = _qn("a:xfrm")
+A_OFF = _qn("a:off")
+A_EXT = _qn("a:ext")
+A_BODY_PR = _qn("a:bodyPr")
+A_SP_AUTO_FIT = _qn("a:spAutoFit")
+A_NORM_AUTOFIT = _qn("a:normAutofit")
+A_NO_AUTOFIT = _qn("a:noAutofit")
+A_P = _qn("a:p")
+A_P_PR = _qn("a:pPr")
+A_R = _qn("a:r")
+A_R_PR = _qn("a:rPr")
+A_T = _qn("a:t")
+A_BR = _qn("a:br")
+A_FLD = _qn("a:fld")
+A_END_PARA_R_PR = _qn("a:endParaRPr")
+A_SOLID_FILL = _qn("a:solidFill")
+A_SRGB_CLR = _qn("a:srgbClr")
+R_ID = _qn("r:id")
+PR_RELATIONSHIP = _qn("pr:Relationship")
+
+PRESENTATION = "ppt/presentation.xml"
+REL_SLIDE_LAYOUT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout"
+REL_SLIDE_MASTER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideMaster"
+
+# 1/100 mm in EMU
+EMU_PER_HMM = 360
+# Paragraph levels of DrawingML
+MAX_LEVEL = 8
+# EG_FillProperties, one of which a run may have
+FILL_TAGS = {_qn("a:" + name) for name in ("noFill", "solidFill", "gradFill", "blipFill", "pattFill", "grpFill")}
+# Placeholder types standing in for each other, slide -> layout -> master
+PLACEHOLDER_ALIASES = {"ctrTitle": "title", "subTitle": "body", "obj": "body"}
+
+def to_hmm(emu: typing.Optional[str]) -> int:
+    """ Convert a DrawingML coordinate (EMU) into 1/100 mm
+
+    >>> to_hmm('3600000'), to_hmm(None)
+    (10000, 0)
+    """
+    return int(round(int(emu or 0) / EMU_PER_HMM))
+
+def from_hmm(value: int) -> str:
+    return str(value * EMU_PER_HMM)
+
+def _rels_path(part: str) -> str:
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+def _resolve(part: str, target: str) -> str:
+    """ Part name of a relationship `target` of `part`
+
+    >>> _resolve('ppt/slides/slide1.xml', '../slideLayouts/slideLayout2.xml')
+    'ppt/slideLayouts/slideLayout2.xml'
+    """
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+
+def _parse(source) -> typing.Tuple[ET.Element, breadcrumbs_odf.XmlNamespaces]:
+    return breadcrumbs_odf.parse_xml(source, NS, default_namespace=True)
+
+
+# ======
+#  TEXT
+# ======
+
+def _paragraph_text(p) -> str:
+    parts = []
+    for child in p:
+        if child.tag in (A_R, A_FLD):
+            t = child.find(A_T)
+            if t is not None and t.text:
+                parts.append(t.text)
+        elif child.tag == A_BR:
+            parts.append("\n")
+    return "".join(parts)
+
+def get_shape_string(tx_body) -> str:
+    """ Text of a p:txBody, paragraphs joined by '\\n' as XText.getString() """
+    return "\n".join(_paragraph_text(p) for p in tx_body.iter(A_P))
+
+def get_toc_lines(tx_body) -> typing.Optional[typing.List[tuple]]:
+    """ (text, NumberingLevel, CharColor or None) of the lines of a TOC shape
+
+    Only paragraphs of a single run, as `PptxBackend.write_toc` writes
+    them, are understood; None when the shape holds anything else.
+    """
+    lines = []
+    for p in tx_body.iter(A_P):
+        runs = []
+        for child in p:
+            if child.tag == A_R:
+                runs.append(child)
+            elif child.tag not in (A_P_PR, A_END_PARA_R_PR):
+                return None
+        if len(runs) > 1:
+            return None
+        color = None
+        if runs:
+            fill = runs[0].find(A_R_PR + "/" + A_SOLID_FILL)
+            if fill is not None:
+                rgb = fill.find(A_SRGB_CLR)
+                if len(fill) != 1 or rgb is None or not re.match(r"[0-9a-fA-F]{6}$", rgb.get("val", "")) \
+                        or len(rgb):
+                    return None
+                color = int(rgb.get("val"), 16)
+        p_pr = p.find(A_P_PR)
+        level = int(p_pr.get("lvl", "0")) if p_pr is not None else 0
+        lines.append((_paragraph_text(p), level, color))
+    if lines == [("", 0, None)]:
+        return []  # empty text, still one paragraph
+    return lines
+
+def _text_templates(tx_body) -> typing.Tuple[ET.Element, ET.Element]:
+    """ a:pPr and a:rPr of the first paragraph and run, kept by rewrites """
+    p_pr = tx_body.find(A_P + "/" + A_P_PR)
+    r_pr = tx_body.find(A_P + "/" + A_R + "/" + A_R_PR)
+    if r_pr is None:
+        r_pr = tx_body.find(A_P + "/" + A_END_PARA_R_PR)
+    p_pr = copy.deepcopy(p_pr) if p_pr is not None else ET.Element(A_P_PR)
+    r_pr = copy.deepcopy(r_pr) if r_pr is not None else ET.Element(A_R_PR)
+    r_pr.tag = A_R_PR
+    return p_pr, r_pr
+
+def _new_paragraph(text: str, p_pr: ET.Element, r_pr: ET.Element, level: int = 0,
+                   color: typing.Optional[int] = None) -> ET.Element:
+    p = ET.Element(A_P)
+    p_pr = copy.deepcopy(p_pr)
+    if level:
+        p_pr.set("lvl", str(min(level, MAX_LEVEL)))
+    else:
+        p_pr.attrib.pop("lvl", None)
+    if len(p_pr) or p_pr.attrib:
+        p.append(p_pr)
+    r = ET.SubElement(p, A_R)
+    r_pr = copy.deepcopy(r_pr)
+    if color is not None:
+        for fill in list(r_pr):
+            if fill.tag in FILL_TAGS:
+                r_pr.remove(fill)
+        fill = ET.Element(A_SOLID_FILL)
+        ET.SubElement(fill, A_SRGB_CLR).set("val", "%06X" % color)
+        # a:ln comes before the fill in CT_TextCharacterProperties
+        r_pr.insert(1 if r_pr.find(_qn("a:ln")) is not None else 0, fill)
+    r.append(r_pr)
+    ET.SubElement(r, A_T).text = text
+    return p
+
+def _replace_paragraphs(tx_body, paragraphs: typing.List[ET.Element]):
+    for p in tx_body.findall(A_P):
+        tx_body.remove(p)
+    tx_body.extend(paragraphs)  # after a:bodyPr and a:lstStyle
+
+
+# =========
+#  BACKEND
+# =========
+
+class PptxShape(object):
+    """ Snapshot of a text shape of a slide
+
+    `index` is the position of the p:sp among the p:spTree children, or
+    None for a breadcrumb shape still to be created. As in
+    `breadcrumbs_odf.OdfShape`, the text is only read on demand from
+    `tx_body`, which a write replaces with the `text` and `toc_lines`
+    written.
+    """
+
+    def __init__(self, page_index: int, index: typing.Optional[int], tx_body: typing.Optional[ET.Element] = None,
+                 name: str = "", size: typing.Tuple[int, int] = (0, 0), position: typing.Tuple[int, int] = (0, 0),
+                 auto_grow: bool = False):
+        self.page_index = page_index
+        self.index = index
+        self.tx_body = tx_body
+        self.text = ""
+        self.toc_lines = None
+        self.name = name
+        self.size = size
+        self.position = position
+        self.auto_grow = auto_grow
+
+class PptxPage(object):
+    def __init__(self, index: int, part: str, shapes: typing.List[PptxShape]):
+        self.index = index
+        self.part = part
+        self.shapes = shapes  # until the slide is compiled
+
+class PptxBackend(object):
+    """ Shape access of `breadcrumbs.run_automatic_breadcrumbs` on OOXML
+
+    Like `breadcrumbs_odf.OdfBackend`, every write of the engine is
+    recorded against its slide, then replayed by `write_slide` on the
+    slide parts that have edits.
+    """
+
+    def __init__(self, zin: zipfile.ZipFile):
+        self.zin = zin
+        self.names = set(zin.namelist())
+        presentation, _ = _parse(zin.open(PRESENTATION))
+        size = presentation.find(P_SLD_SZ)
+        self.page_size = (to_hmm(size.get("cx")), to_hmm(size.get("cy"))) if size is not None else (0, 0)
+        self.relationships = {}  # part -> {Id: (type, target part)}
+        targets = self._relationships(PRESENTATION)
+        self.slide_parts = [targets[sld_id.get(R_ID)][1] for sld_id in presentation.iter(P_SLD_ID)]
+        self.placeholders = {}  # layout or master part -> [(type, idx, xfrm)]
+        self.edits = {}  # page index -> [(PptxShape, operation, args)]
+        self.breadcrumb_templates = None  # text templates of the first breadcrumb of the deck
+
+    def _relationships(self, part: str) -> typing.Dict[str, typing.Tuple[str, str]]:
+        """ Id -> (type, target part) of the relationships of `part` """
+        relationships = self.relationships.get(part)
+        if relationships is None:
+            relationships = {}
+            rels_part = _rels_path(part)
+            if rels_part in self.names:
+                rels, _ = _parse(self.zin.open(rels_part))
+                relationships = {rel.get("Id"): (rel.get("Type"), _resolve(part, rel.get("Target")))
+                                 for rel in rels.iter(PR_RELATIONSHIP) if rel.get("TargetMode") != "External"}
+            self.relationships[part] = relationships
+        return relationships
+
+    # --------------
+    #  Placeholders
+    # --------------
+
+    def _related(self, part: str, rel_type: str) -> typing.Optional[str]:
+        for target_type, target in self._relationships(part).values():
+            if target_type == rel_type:
+                return target
+        return None
+
+    def _placeholder_shapes(self, part: str) -> typing.List[tuple]:
+        shapes = self.placeholders.get(part)
+        if shapes is None:
+            shapes = []
+            root, _ = _parse(self.zin.open(part))
+            for sp in root.iter(P_SP):
+                ph = sp.find(P_NV_SP_PR + "/" + P_NV_PR + "/" + P_PH)
+                if ph is not None:
+                    shapes.append((ph.get("type", "obj"), ph.get("idx"), sp.find(P_SP_PR + "/" + A_XFRM)))
+            self.placeholders[part] = shapes
+        return shapes
+
+    @staticmethod
+    def _match_placeholder(shapes: typing.List[tuple], ph_type: str, idx: typing.Optional[str]):
+        if idx is not None:
+            for shape_type, shape_idx, xfrm in shapes:
+                if shape_idx == idx:
+                    return shape_type, shape_idx, xfrm
+        ph_type = PLACEHOLDER_ALIASES.get(ph_type, ph_type)
+        for shape_type, shape_idx, xfrm in shapes:
+            if PLACEHOLDER_ALIASES.get(shape_type, shape_type) == ph_type:
+                return shape_type, shape_idx, xfrm
+        return None
+
+    def _inherited_xfrm(self, slide_part: str, ph) -> typing.Optional[ET.Element]:
+        """ a:xfrm of the layout, else master placeholder a slide one takes after """
+        ph_type, idx = ph.get("type", "obj"), ph.get("idx")
+        part = slide_part
+        for rel_type in (REL_SLIDE_LAYOUT, REL_SLIDE_MASTER):
+            part = self._related(part, rel_type)
+            if part is None or part not in self.names:
+                return None
+            match = self._match_placeholder(self._placeholder_shapes(part), ph_type, idx)
+            if match is None:
+                continue
+            ph_type, idx, xfrm = match
+            if xfrm is not None:
+                return xfrm
+        return None
+
+    # ----------
+    #  Snapshot
+    # ----------
+
+    def _snapshot(self, page_index: int, part: str) -> PptxPage:
+        root, _ = _parse(self.zin.open(part))
+        tree = root.find(".//" + P_SP_TREE)
+        shapes = []
+        for index, sp in enumerate(tree if tree is not None else ()):
+            tx_body = sp.find(P_TX_BODY)
+            if sp.tag != P_SP or tx_body is None:
+                continue
+            xfrm = sp.find(P_SP_PR + "/" + A_XFRM)
+            if xfrm is None:
+                ph = sp.find(P_NV_SP_PR + "/" + P_NV_PR + "/" + P_PH)
+                if ph is not None:
+                    xfrm = self._inherited_xfrm(part, ph)
+            off = xfrm.find(A_OFF) if xfrm is not None else None
+            ext = xfrm.find(A_EXT) if xfrm is not None else None
+            c_nv_pr = sp.find(P_NV_SP_PR + "/" + P_C_NV_PR)
+            name = c_nv_pr.get("name", "") if c_nv_pr is not None else ""
+            if name == breadcrumbs.BREADCRUMB_STYLE_NAME and self.breadcrumb_templates is None:
+                self.breadcrumb_templates = _text_templates(tx_body)
+            body_pr = tx_body.find(A_BODY_PR)
+            shapes.append(PptxShape(
+                page_index, index, tx_body,
+                name=name,
+                size=(to_hmm(ext.get("cx")), to_hmm(ext.get("cy"))) if ext is not None else (0, 0),
+                position=(to_hmm(off.get("x")), to_hmm(off.get("y"))) if off is not None else (0, 0),
+                auto_grow=body_pr is not None and body_pr.get("wrap") == "none"
+                and body_pr.find(A_SP_AUTO_FIT) is not None))
+        return PptxPage(page_index, part, shapes)
+
+    def get_pages(self):
+        for page_index, part in enumerate(self.slide_parts):
+            page = self._snapshot(page_index, part)
+            yield page
+            page.shapes = None  # compiled: the shapes the engine dropped can go
+
+    def snapshot_page(self, page: PptxPage, directive_filter: str) -> typing.List[breadcrumbs.ShapeRecord]:
+        records = []
+        for shape in page.shapes:
+            (width, height), (x, y) = shape.size, shape.position
+            # The shape name stands in for the layer
+            candidate = breadcrumbs.is_directive_candidate(
+                directive_filter, shape.name, x, y, width, height, *self.page_size)
+            records.append(breadcrumbs.ShapeRecord(
+                shape, self.get_string(shape) if candidate else None,
+                shape.name == breadcrumbs.BREADCRUMB_STYLE_NAME,
+                width, height, x, y, shape.auto_grow))
+        return records
+
+    def get_string(self, shape: PptxShape) -> str:
+        if shape.tx_body is not None:
+            return get_shape_string(shape.tx_body)
+        return shape.text
+
+    def edit_session(self):
+        # Edits are only recorded until write_slide: nothing to batch
+        return contextlib.nullcontext()
+
+    def progress(self, phase: str, index: int):
+        pass
+
+    def get_toc_lines(self, shape: PptxShape) -> typing.Optional[typing.List[tuple]]:
+        if shape.tx_body is not None:
+            return get_toc_lines(shape.tx_body)
+        return shape.toc_lines
+
+    def ensure_breadcrumb_style(self, create: bool = True):
+        pass  # breadcrumbs are told by their name
+
+    # -------
+    #  Edits
+    # -------
+
+    def _edit(self, shape: PptxShape, operation: str, *args):
+        self.edits.setdefault(shape.page_index, []).append((shape, operation, args))
+
+    def remove_shape(self, page: PptxPage, shape: PptxShape):
+        self._edit(shape, "remove")
+
+    def write_breadcrumb(self, page: PptxPage, shape: PptxShape, text: str, x: int, y: int):
+        if shape is None:
+            shape = PptxShape(page.index, None, name=breadcrumbs.BREADCRUMB_STYLE_NAME)
+        shape.tx_body = None
+        shape.text = text
+        shape.toc_lines = None
+        shape.position = (x, y)
+        shape.auto_grow = True
+        self._edit(shape, "breadcrumb", text, x, y)
+        return shape
+
+    def set_string(self, shape: PptxShape, text: str):
+        shape.tx_body = None
+        shape.text = text
+        shape.toc_lines = None
+        self._edit(shape, "string", text)
+
+    def write_toc(self, shape: PptxShape, lines: typing.List[tuple]):
+        shape.tx_body = None
+        shape.text = "\n".join(text for text, _, _ in lines)
+        shape.toc_lines = list(lines)
+        self._edit(shape, "toc", lines)
+
+    # --------
+    #  Replay
+    # --------
+
+    def _apply_edits(self, tree: ET.Element, edits):
+        children = list(tree)
+        elements = {}  # PptxShape -> element, once created
+        templates = {}  # element -> text templates before any rewrite
+        for shape, operation, args in edits:
+            elem = elements.get(shape)
+            if elem is None and shape.index is not None:
+                elem = children[shape.index]
+            if elem is not None and elem not in templates:
+                templates[elem] = _text_templates(elem.find(P_TX_BODY))
+            if operation == "remove":
+                tree.remove(elem)
+            elif operation == "breadcrumb":
+                elements[shape] = elem = self._write_breadcrumb_element(tree, elem, *args)
+                # New breadcrumbs take after the first one of the deck
+                templates.setdefault(elem, self.breadcrumb_templates or _text_templates(elem.find(P_TX_BODY)))
+                self._write_string_element(elem, templates[elem], args[0])
+            elif operation == "string":
+                self._write_string_element(elem, templates[elem], *args)
+            elif operation == "toc":
+                p_pr, r_pr = templates[elem]
+                _replace_paragraphs(elem.find(P_TX_BODY), [
+                    _new_paragraph(text, p_pr, r_pr, level, color)
+                    # A text body holds at least one paragraph
+                    for text, level, color in args[0] or [("", 0, None)]])
+
+    def _write_breadcrumb_element(self, tree: ET.Element, elem, text: str, x: int, y: int) -> ET.Element:
+        if elem is None:
+            ids = [int(c_nv_pr.get("id")) for c_nv_pr in tree.iter(P_C_NV_PR)
+                   if (c_nv_pr.get("id") or "").isdigit()]
+            elem = ET.Element(P_SP)
+            nv_sp_pr = ET.SubElement(elem, P_NV_SP_PR)
+            c_nv_pr = ET.SubElement(nv_sp_pr, P_C_NV_PR)
+            c_nv_pr.set("id", str(max(ids + [1]) + 1))
+            c_nv_pr.set("name", breadcrumbs.BREADCRUMB_STYLE_NAME)
+            ET.SubElement(nv_sp_pr, P_C_NV_SP_PR).set("txBox", "1")
+            ET.SubElement(nv_sp_pr, P_NV_PR)
+            sp_pr = ET.SubElement(elem, P_SP_PR)
+            xfrm = ET.SubElement(sp_pr, A_XFRM)
+            ET.SubElement(xfrm, A_OFF)
+            # Auto-fit by PowerPoint once laid out
+            ext = ET.SubElement(xfrm, A_EXT)
+            ext.set("cx", from_hmm(250 * max(len(text), 1)))
+            ext.set("cy", from_hmm(712))
+            geometry = ET.SubElement(sp_pr, _qn("a:prstGeom"))
+            geometry.set("prst", "rect")
+            ET.SubElement(geometry, _qn("a:avLst"))
+            ET.SubElement(sp_pr, _qn("a:noFill"))
+            tx_body = ET.SubElement(elem, P_TX_BODY)
+            ET.SubElement(tx_body, A_BODY_PR)
+            ET.SubElement(tx_body, _qn("a:lstStyle"))
+            ET.SubElement(tx_body, A_P)
+            extensions = tree.find(P_EXT_LST)
+            tree.insert(list(tree).index(extensions) if extensions is not None else len(tree), elem)
+        xfrm = elem.find(P_SP_PR + "/" + A_XFRM)
+        if xfrm is None:
+            sp_pr = elem.find(P_SP_PR)
+            if sp_pr is None:
+                sp_pr = ET.Element(P_SP_PR)
+                elem.insert(1, sp_pr)
+            xfrm = ET.Element(A_XFRM)
+            sp_pr.insert(0, xfrm)
+        off = xfrm.find(A_OFF)
+        if off is None:
+            off = ET.Element(A_OFF)
+            xfrm.insert(0, off)
+        off.set("x", from_hmm(x))
+        off.set("y", from_hmm(y))
+        # TextAutoGrowHeight and TextAutoGrowWidth
+        body_pr = elem.find(P_TX_BODY + "/" + A_BODY_PR)
+        body_pr.set("wrap", "none")
+        for autofit in body_pr.findall(A_NORM_AUTOFIT) + body_pr.findall(A_NO_AUTOFIT):
+            body_pr.remove(autofit)
+        if body_pr.find(A_SP_AUTO_FIT) is None:
+            # after a:prstTxWarp, before a:scene3d/a:sp3d/a:flatTx/a:extLst
+            index = 1 if body_pr.find(_qn("a:prstTxWarp")) is not None else 0
+            body_pr.insert(index, ET.Element(A_SP_AUTO_FIT))
+        return elem
+
+    def _write_string_element(self, elem: ET.Element, templates, text: str):
+        p_pr, r_pr = templates
+        _replace_paragraphs(elem.find(P_TX_BODY), [_new_paragraph(line, p_pr, r_pr) for line in text.split("\n")])
+
+    def write_slide(self, page_index: int, out: typing.BinaryIO):
+        """ The slide part of `page_index`, with its recorded edits """
+        part = self.slide_parts[page_index]
+        root, namespaces = _parse(self.zin.open(part))
+        self._apply_edits(root.find(".//" + P_SP_TREE), self.edits[page_index])
+        out.write(breadcrumbs_odf.serialize_xml(root, namespaces))
+
+    def changed_parts(self) -> typing.Dict[str, typing.Callable[[typing.BinaryIO], None]]:
+        """ Part name -> writer of every part the recorded edits change """
+        parts = {}
+        for page_index in self.edits:
+            parts[self.slide_parts[page_index]] = \
+                lambda out, page_index=page_index: self.write_slide(page_index, out)
+        return parts
+
+def automatic_breadcrumbs_file(src: str, dst: typing.Optional[str] = None,
+                               settings: typing.Optional[dict] = None,
+                               toc_dump: typing.Optional[typing.Callable[[str], None]] = print,
+                               instrument=None) -> bool:
+    """ Run the breadcrumbs pass on the `src` .pptx, saving to `dst` (default: in place)
+
+    Same arguments and result as `breadcrumbs_odf.automatic_breadcrumbs_file`.
+    """
+    if instrument is None:
+        return _automatic_breadcrumbs_file(src, dst, settings, toc_dump, None)
+    with instrument.measure():
+        return _automatic_breadcrumbs_file(src, dst, settings, toc_dump, instrument)
+
+def _automatic_breadcrumbs_file(src, dst, settings, toc_dump, instrument) -> bool:
+    if dst is None:
+        dst = src
+    with zipfile.ZipFile(src) as zin:
+        backend = PptxBackend(zin)
+        breadcrumbs.run_automatic_breadcrumbs(backend if instrument is None else instrument.backend(backend),
+                                              settings, toc_dump)
+        if instrument is not None:
+            instrument.enter("write")
+
+        parts = backend.changed_parts()
+        if not parts and os.path.abspath(dst) == os.path.abspath(src):
+            return False
+        with breadcrumbs_odf.atomic_output(dst, mode_from=src) as tmp:
+            breadcrumbs_odf.write_package(src, tmp, parts)
+    return bool(parts)
+
+def dry_run_file(src: str, settings: typing.Optional[dict] = None) -> dict:
+    """ `breadcrumbs.dry_run` on the `src` .pptx, which is left untouched """
+    with zipfile.ZipFile(src) as zin:
+        return breadcrumbs.dry_run(PptxBackend(zin), settings)
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Regenerate breadcrumbs and TOCs of a .pptx deck.")
+    parser.add_argument("src", metavar="deck.pptx")
+    parser.add_argument("dst", metavar="output.pptx", nargs="?", default=None,
+                        help="default: modify deck.pptx in place")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the changes slide by slide, write nothing")
+    parser.add_argument("--json", action="store_true", help="print the --dry-run changes as JSON")
+    parser.add_argument("--instrument", metavar="REPORT", default=None,
+                        help="write call counts and timings of the run to this JSON file")
+    parser.add_argument("--profile", action="store_true", help="add a cProfile summary to --instrument")
+    parser.add_argument("--trace-memory", action="store_true", help="add tracemalloc peaks to --instrument")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        diff = dry_run_file(args.src)
+        print(json.dumps(diff, indent=2, ensure_ascii=False) if args.json else breadcrumbs.format_diff(diff))
+    else:
+        instrument = None
+        if args.instrument is not None:
+            import breadcrumbs_instrument
+            instrument = breadcrumbs_instrument.Instrument(args.profile, args.trace_memory)
+        automatic_breadcrumbs_file(args.src, args.dst, instrument=instrument)
+        if instrument is not None:
+            instrument.write_report(args.instrument)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Regenerate breadcrumbs of many decks through one (Libre|Open)Office
+
+    Each deck is loaded hidden, processed by `automatic_breadcrumbs`,
+    stored and closed, while the same soffice process stays up for the
+    whole run: its start-up cost is paid once, not once per deck.
+    Unlike breadcrumbs_odf.py, any format soffice can load and store
+    (.odp, .pptx, ..) is accepted.
+
+    Usage:
+
+    python breadcrumbs_uno.py [--pipe NAME | --port PORT [--host HOST]]
+                              [-o OUTPUT_DIR] [--report FILE] [--dry-run]
+                              PATH [PATH ...]
+
+    Without --pipe or --port, IDE_utils starts its own soffice instance.
+    With --instances N, decks are shared among N warm headless instances
+    of an `IDE_utils.Runner` pool, restarted every --recycle decks.
+
+    import IDE_utils, breadcrumbs_uno
+    summary = breadcrumbs_uno.run_uno_batch(IDE_utils.XSCRIPTCONTEXT, ['a.odp', 'b.odp'])
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import typing
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+import breadcrumbs
+import breadcrumbs_batch
+import breadcrumbs_instrument
+
+# Export filters, by output file extension
+STORE_FILTERS = {
+    ".odp": "impress8",
+    ".pptx": "Impress MS PowerPoint 2007 XML",
+    ".ppt": "MS PowerPoint 97",
+}
+
+def close_document(doc):
+    try:
+        doc.close(True)
+    except Exception:  # CloseVetoException, already disposed..
+        doc.dispose()
+
+def process_document(script_context, src: str, dst: typing.Optional[str] = None,
+                     dry_run: bool = False, cancel: typing.Optional[threading.Event] = None,
+                     instrument: bool = False) -> dict:
+    """ Load `src` hidden, run the breadcrumbs pass, store it (to `dst`) and close it
+
+    With `dry_run`, the planned changes are returned as result["diff"]
+    and the document is closed without being stored. Once `cancel` is
+    set, the pass stops at the next page and the deck is not stored.
+    With `instrument`, result["instrument"] reports the pass, UNO calls
+    included.
+    """
+    result = {"path": src, "output": dst or src, "ok": False, "error": None,
+              "size": os.path.getsize(src), "seconds": 0.0}
+    start = time.perf_counter()
+    doc = None
+    try:
+        doc = script_context.loadDocument(uno.systemPathToFileUrl(os.path.abspath(src)))
+        if doc is None:
+            raise IOError("cannot load " + src)
+        if instrument:
+            run_instrument = breadcrumbs_instrument.Instrument()
+            backend = run_instrument.backend(breadcrumbs.UnoBackend(
+                run_instrument.bridge(doc), script_context.getComponentContext(), cancel))
+        else:
+            run_instrument = None
+            backend = breadcrumbs.UnoBackend(doc, script_context.getComponentContext(), cancel)
+        with run_instrument.measure() if run_instrument is not None else contextlib.nullcontext():
+            if dry_run:
+                result["diff"] = breadcrumbs.dry_run(backend)
+            else:
+                breadcrumbs.run_automatic_breadcrumbs(backend, toc_dump=None)
+        if run_instrument is not None:
+            result["instrument"] = run_instrument.report()
+        if dry_run:
+            pass
+        elif dst is None:
+            doc.store()
+        else:
+            extension = os.path.splitext(dst)[1].lower()
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(dst)), (
+                PropertyValue(Name="FilterName", Value=STORE_FILTERS.get(extension, "impress8")),))
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+    finally:
+        if doc is not None:
+            close_document(doc)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def run_uno_batch(script_context, decks: typing.List[str],
+                  output_dir: typing.Optional[str] = None,
+                  on_result: typing.Optional[typing.Callable[[dict], None]] = None,
+                  dry_run: bool = False, instrument: bool = False) -> dict:
+    """ Process `decks` one after the other in the *Office of `script_context` """
+    breadcrumbs_batch.check_output_dir(decks, output_dir)
+    start = time.perf_counter()
+    results = []
+    for deck in decks:
+        result = process_document(script_context, deck, breadcrumbs_batch.output_path(deck, output_dir),
+                                  dry_run, instrument=instrument)
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    return breadcrumbs_batch.summarize(results, time.perf_counter() - start, 1)
+
+def run_uno_pool(runner, decks: typing.List[str],
+                 output_dir: typing.Optional[str] = None,
+                 on_result: typing.Optional[typing.Callable[[dict], None]] = None,
+                 dry_run: bool = False, instrument: bool = False) -> dict:
+    """ Process `decks` over the warm instances of an `IDE_utils.Runner` pool """
+    breadcrumbs_batch.check_output_dir(decks, output_dir)
+    decks = sorted(decks, key=os.path.getsize, reverse=True)
+    cancel = threading.Event()  # set on Ctrl-C: passes in flight stop at the next page
+
+    def job(deck):
+        if cancel.is_set():
+            raise breadcrumbs.Cancelled()
+        with runner.lease() as office:
+            return process_document(office.script_context, deck,
+                                    breadcrumbs_batch.output_path(deck, output_dir), dry_run, cancel,
+                                    instrument)
+
+    start = time.perf_counter()
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(runner.instances)) as executor:
+        try:
+            for future in concurrent.futures.as_completed([executor.submit(job, deck) for deck in decks]):
+                result = future.result()
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+        except KeyboardInterrupt:
+            cancel.set()
+            raise
+    return breadcrumbs_batch.summarize(results, time.perf_counter() - start, len(runner.instances))
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Regenerate breadcrumbs and TOCs of many decks in one (Libre|Open)Office.")
+    parser.add_argument("paths", nargs="+", metavar="PATH", help="deck, directory or glob pattern")
+    connection = parser.add_mutually_exclusive_group()
+    connection.add_argument("--pipe", default=None, help="connect to a running soffice on this named pipe")
+    connection.add_argument("--port", type=int, default=None, help="connect to a running soffice on this port")
+    connection.add_argument("--instances", type=int, default=None,
+                            help="start a pool of this many headless soffice instances")
+    parser.add_argument("--host", default="localhost", help="host of --port (default: localhost)")
+    parser.add_argument("--recycle", type=int, default=None,
+                        help="restart a pooled instance after this many decks")
+    parser.add_argument("-o", "--output-dir", default=None,
+                        help="store decks there instead of in place")
+    parser.add_argument("--pattern", default="*.odp", help="file pattern searched in directories")
+    parser.add_argument("--report", default=None, help="write the JSON summary to this file")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the changes slide by slide, store nothing")
+    parser.add_argument("--instrument", action="store_true",
+                        help="add UNO call counts and timings of each deck to the --report summary")
+    args = parser.parse_args(argv)
+
+    def on_result(result):
+        breadcrumbs_batch.print_result(result)
+        if result.get("diff") is not None:
+            print(breadcrumbs.format_diff(result["diff"]))
+
+    decks = breadcrumbs_batch.collect_decks(args.paths, args.pattern)
+    if not decks:
+        parser.error("no deck found")
+
+    import IDE_utils
+    try:
+        if args.instances is not None:
+            runner = IDE_utils.Runner(soffice={}, size=args.instances,
+                                      max_documents=args.recycle)
+            try:
+                summary = run_uno_pool(runner._start(), decks, output_dir=args.output_dir,
+                                       on_result=on_result, dry_run=args.dry_run,
+                                       instrument=args.instrument)
+            finally:
+                runner._stop()
+        else:
+            if args.pipe is not None or args.port is not None:
+                script_context = IDE_utils.ScriptContext(
+                    IDE_utils.connect(host=args.host, port=args.port, pipe=args.pipe))
+            else:
+                script_context = IDE_utils.XSCRIPTCONTEXT
+            summary = run_uno_batch(script_context, decks, output_dir=args.output_dir,
+                                    on_result=on_result, dry_run=args.dry_run,
+                                    instrument=args.instrument)
+    finally:
+        IDE_utils.stop()  # soffice started by IDE_utils only
+
+    breadcrumbs_batch.print_summary(summary)
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
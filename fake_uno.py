@@ -0,0 +1,884 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" In-process stand-in for the slice of the UNO API breadcrumbs.py uses
+
+    A `FakeDocument` is an Impress document held in Python objects:
+    DrawPages of text shapes (services, string, Position, Size, Style,
+    LayerName, text auto-grow), their paragraphs (CharColor,
+    NumberingLevel) through enumerations, text cursors and
+    appendTextPortion/finishParagraph, the "graphics" StyleFamily,
+    user-defined document properties, and an undo manager that really
+    undoes. `breadcrumbs.UnoBackend` drives it like a document loaded
+    in soffice, in milliseconds and without LibreOffice:
+
+    >>> import breadcrumbs
+    >>> doc = FakeDocument()
+    >>> for title in ("Intro", "Goals"):
+    ...     page = doc.add_page()
+    ...     _ = page.add_text_shape(title, y=1000)
+    ...     _ = page.add_text_shape("#push", x=-5000)
+    >>> breadcrumbs.run_automatic_breadcrumbs(breadcrumbs.UnoBackend(doc, FakeContext()), toc_dump=None)
+    >>> [shape.getString() for shape in doc.DrawPages.getByIndex(1)]
+    ['Goals', '#push', 'Intro']
+    >>> doc.getUndoManager().undo()
+    >>> [shape.getString() for shape in doc.DrawPages.getByIndex(1)]
+    ['Goals', '#push']
+
+    Each call through the document (methods of its objects, property
+    reads and writes, one getByIndex per item iterated) is counted by
+    method in `doc.calls`, and can be slowed down by `latency` seconds
+    to simulate the bridge to a soffice process. The `add_*` builder
+    methods and `load_odf` set up a deck without counting.
+
+    The macros run on it too, with
+    `breadcrumbs.XSCRIPTCONTEXT = FakeScriptContext(doc)`.
+"""
+import bisect
+import collections
+import time
+import typing
+import zipfile
+
+# com.sun.star.drawing services of the shapes the builder adds
+TEXT_SHAPE_SERVICES = ("com.sun.star.drawing.Shape", "com.sun.star.drawing.Text",
+                       "com.sun.star.drawing.TextShape")
+GRAPHIC_SHAPE_SERVICES = ("com.sun.star.drawing.Shape", "com.sun.star.drawing.GraphicObjectShape")
+# Values a new text shape / paragraph starts with
+SHAPE_DEFAULTS = {"LayerName": "layout", "TextAutoGrowHeight": True, "TextAutoGrowWidth": False}
+PARAGRAPH_DEFAULTS = {"CharColor": -1, "NumberingLevel": 0}
+# Paragraph attributes; any other text property applies to characters
+PARAGRAPH_PROPERTIES = {"NumberingLevel", "NumberingIsNumber", "NumberingRules"}
+# Enums ensure_breadcrumb_style looks up, as the TypeDescriptionManager has them
+ENUMS = {
+    "com.sun.star.drawing.TextHorizontalAdjust": ("LEFT", "CENTER", "RIGHT", "BLOCK"),
+    "com.sun.star.drawing.TextVerticalAdjust": ("TOP", "CENTER", "BOTTOM", "BLOCK"),
+    "com.sun.star.drawing.FillStyle": ("NONE", "SOLID", "GRADIENT", "HATCH", "BITMAP"),
+    "com.sun.star.drawing.LineStyle": ("NONE", "SOLID", "DASH"),
+}
+# Impress 4:3, 1/100 mm
+PAGE_WIDTH = 28000
+PAGE_HEIGHT = 21000
+
+class Point(typing.NamedTuple):
+    X: int
+    Y: int
+
+class Size(typing.NamedTuple):
+    Width: int
+    Height: int
+
+class UnknownPropertyException(Exception):
+    pass
+
+class PropertyExistException(Exception):
+    pass
+
+class NoSuchElementException(Exception):
+    pass
+
+def _utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+class _Object(object):
+    """ Anything reached through the document: calls cost a bridge call
+
+    Attributes named like UNO properties (capitalized) live in
+    `_properties`; reading and writing them are bridge calls too.
+    """
+
+    def __init__(self, doc: "FakeDocument", properties: typing.Optional[dict] = None):
+        object.__setattr__(self, "_doc", doc)
+        object.__setattr__(self, "_properties", dict(properties or {}))
+
+    def _call(self, name: str):
+        self._doc._bridge(name)
+
+    def __getattr__(self, name: str):
+        if name[:1].isupper():
+            properties = object.__getattribute__(self, "_properties")
+            if name in properties:
+                self._call("getPropertyValue")
+                return properties[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name: str, value):
+        if not name[:1].isupper():
+            object.__setattr__(self, name, value)
+            return
+        self._call("setPropertyValue")
+        self._set_property(name, value)
+
+    def _set_property(self, name: str, value):
+        properties = self._properties
+        if name in properties:
+            old = properties[name]
+            self._doc._record(lambda: properties.__setitem__(name, old))
+        else:
+            self._doc._record(lambda: properties.pop(name, None))
+        properties[name] = value
+
+    def _get_property(self, name: str):
+        try:
+            return self._properties[name]
+        except KeyError:
+            raise UnknownPropertyException(name) from None
+
+    def getPropertyValue(self, name: str):
+        self._call("getPropertyValue")
+        return self._get_property(name)
+
+    def getPropertyValues(self, names):
+        self._call("getPropertyValues")
+        return tuple(self._get_property(name) for name in names)
+
+    def setPropertyValue(self, name: str, value):
+        self._call("setPropertyValue")
+        self._set_property(name, value)
+
+class _Container(_Object):
+    """ XIndexAccess over a list of objects """
+
+    def __init__(self, doc: "FakeDocument", items: list, properties: typing.Optional[dict] = None):
+        super().__init__(doc, properties)
+        object.__setattr__(self, "_items", items)
+
+    def getCount(self) -> int:
+        self._call("getCount")
+        return len(self._items)
+
+    def getByIndex(self, index: int):
+        self._call("getByIndex")
+        if not 0 <= index < len(self._items):
+            raise IndexError(index)
+        return self._items[index]
+
+    def __len__(self):
+        self._call("getCount")
+        return len(self._items)
+
+    def __iter__(self):
+        # A snapshot, like the indices pyuno walks
+        for item in list(self._items):
+            self._call("getByIndex")
+            yield item
+
+# ==========
+#  DOCUMENT
+# ==========
+
+class FakeDocument(_Object):
+    """ An Impress document: DrawPages, graphic styles, properties, undo
+
+    `latency` seconds are slept on every bridge call. Without a
+    `visible` window, getCurrentController returns None as for a
+    document loaded hidden.
+    """
+
+    def __init__(self, latency: float = 0.0, visible: bool = False,
+                 width: int = PAGE_WIDTH, height: int = PAGE_HEIGHT):
+        super().__init__(None)
+        object.__setattr__(self, "_doc", self)
+        self.latency = latency
+        self.calls = collections.Counter()  # method -> count
+        self.width = width
+        self.height = height
+        self.controller = _Controller(self) if visible else None
+        self.locks = 0  # lockControllers not yet unlocked
+        self.action_locks = 0
+        self.undo_manager = _UndoManager(self)
+        self.user_defined = _UserDefinedProperties(self)
+        self.graphics = _StyleFamily(self, "graphics")
+        self.graphics.add_style("standard")
+        self._properties["DrawPages"] = _Container(self, [])
+        self._properties["StyleFamilies"] = _StyleFamilies(self, {"graphics": self.graphics})
+
+    # ---------
+    #  Builder
+    # ---------
+
+    def add_page(self, width: typing.Optional[int] = None, height: typing.Optional[int] = None) -> "FakePage":
+        page = FakePage(self, self.width if width is None else width, self.height if height is None else height)
+        self._properties["DrawPages"]._items.append(page)
+        return page
+
+    @property
+    def pages(self) -> typing.List["FakePage"]:
+        return self._properties["DrawPages"]._items
+
+    @property
+    def call_count(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def dump(self) -> typing.List[typing.List[tuple]]:
+        """ Each shape of each page: (text, x, y, style name, paragraphs) """
+        return [[shape.dump() for shape in page._items] for page in self.pages]
+
+    # --------
+    #  Bridge
+    # --------
+
+    def _bridge(self, name: str):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _record(self, undo: typing.Callable[[], None]):
+        self.undo_manager.record(undo)
+
+    # -----
+    #  API
+    # -----
+
+    def getUndoManager(self) -> "_UndoManager":
+        self._call("getUndoManager")
+        return self.undo_manager
+
+    def getCurrentController(self):
+        self._call("getCurrentController")
+        return self.controller
+
+    def lockControllers(self):
+        self._call("lockControllers")
+        self.locks += 1
+
+    def unlockControllers(self):
+        self._call("unlockControllers")
+        if self.locks == 0:
+            raise RuntimeError("controllers not locked")
+        self.locks -= 1
+
+    def addActionLock(self):
+        self._call("addActionLock")
+        self.action_locks += 1
+
+    def removeActionLock(self):
+        self._call("removeActionLock")
+        if self.action_locks == 0:
+            raise RuntimeError("no action lock")
+        self.action_locks -= 1
+
+    def createInstance(self, service: str):
+        self._call("createInstance")
+        if service == "com.sun.star.drawing.TextShape":
+            return FakeShape(self, TEXT_SHAPE_SERVICES)
+        if service == "com.sun.star.drawing.GraphicObjectShape":
+            return FakeShape(self, GRAPHIC_SHAPE_SERVICES)
+        raise ValueError("service not supported by the fake document: " + service)
+
+    def getDocumentProperties(self) -> "_DocumentProperties":
+        self._call("getDocumentProperties")
+        return _DocumentProperties(self)
+
+class FakeContext(object):
+    """ Component context: the TypeDescriptionManager singleton only """
+
+    def getByName(self, name: str):
+        if name != "/singletons/com.sun.star.reflection.theTypeDescriptionManager":
+            raise NoSuchElementException(name)
+        return _TypeDescriptionManager()
+
+class FakeScriptContext(object):
+    """ XSCRIPTCONTEXT of a macro run on `doc` """
+
+    def __init__(self, doc: FakeDocument, ctx: typing.Optional[FakeContext] = None):
+        self.doc = doc
+        self.ctx = ctx if ctx is not None else FakeContext()
+
+    def getDocument(self) -> FakeDocument:
+        return self.doc
+
+    def getComponentContext(self) -> FakeContext:
+        return self.ctx
+
+class _TypeDescriptionManager(object):
+    def getByHierarchicalName(self, name: str) -> "_EnumDescription":
+        if name not in ENUMS:
+            raise NoSuchElementException(name)
+        return _EnumDescription(ENUMS[name])
+
+class _EnumDescription(object):
+    def __init__(self, names: typing.Tuple[str, ...]):
+        self.names = names
+
+    def getEnumNames(self) -> typing.Tuple[str, ...]:
+        return self.names
+
+    def getEnumValues(self) -> typing.Tuple[int, ...]:
+        return tuple(range(len(self.names)))
+
+class _Controller(_Object):
+    def __init__(self, doc: FakeDocument):
+        super().__init__(doc)
+        self.frame = _Frame(doc)
+
+    def getFrame(self) -> "_Frame":
+        self._call("getFrame")
+        return self.frame
+
+class _Frame(_Object):
+    def __init__(self, doc: FakeDocument):
+        super().__init__(doc)
+        self.indicators = []
+
+    def createStatusIndicator(self) -> "_StatusIndicator":
+        self._call("createStatusIndicator")
+        self.indicators.append(_StatusIndicator(self._doc))
+        return self.indicators[-1]
+
+class _StatusIndicator(_Object):
+    def __init__(self, doc: FakeDocument):
+        super().__init__(doc)
+        self.text = None
+        self.range = 0
+        self.value = 0
+        self.ended = False
+
+    def start(self, text: str, range_: int):
+        self._call("start")
+        self.text, self.range = text, range_
+
+    def setValue(self, value: int):
+        self._call("setValue")
+        self.value = value
+
+    def end(self):
+        self._call("end")
+        self.ended = True
+
+# ======
+#  UNDO
+# ======
+
+class _UndoManager(_Object):
+    """ Every change made through the API is journaled as its inverse
+
+    Outside of an undo context each change is an undo action of its
+    own; inside, the changes up to the outermost leaveUndoContext make
+    up one action (none if nothing changed).
+    """
+
+    def __init__(self, doc: FakeDocument):
+        super().__init__(doc)
+        self.actions = []  # [(title, [inverse..])], most recent last
+        self.context_title = None
+        self.context_depth = 0
+        self.context_inverses = []
+        self.undoing = False
+
+    def record(self, undo: typing.Callable[[], None]):
+        if self.undoing:
+            return
+        if self.context_depth:
+            self.context_inverses.append(undo)
+        else:
+            self.actions.append(("", [undo]))
+
+    def enterUndoContext(self, title: str):
+        self._call("enterUndoContext")
+        if self.context_depth == 0:
+            self.context_title = title
+            self.context_inverses = []
+        self.context_depth += 1
+
+    def leaveUndoContext(self):
+        self._call("leaveUndoContext")
+        if self.context_depth == 0:
+            raise RuntimeError("no undo context to leave")
+        self.context_depth -= 1
+        if self.context_depth == 0 and self.context_inverses:
+            self.actions.append((self.context_title, self.context_inverses))
+            self.context_inverses = []
+
+    def getAllUndoActionTitles(self) -> typing.Tuple[str, ...]:
+        self._call("getAllUndoActionTitles")
+        return tuple(title for title, _ in reversed(self.actions))
+
+    def isUndoPossible(self) -> bool:
+        self._call("isUndoPossible")
+        return bool(self.actions) and not self.context_depth
+
+    def undo(self):
+        self._call("undo")
+        if self.context_depth:
+            raise RuntimeError("cannot undo within an undo context")
+        if not self.actions:
+            raise RuntimeError("nothing to undo")
+        _, inverses = self.actions.pop()
+        self.undoing = True
+        try:
+            for undo in reversed(inverses):
+                undo()
+        finally:
+            self.undoing = False
+
+# ============
+#  PROPERTIES
+# ============
+
+class _DocumentProperties(_Object):
+    def getUserDefinedProperties(self) -> "_UserDefinedProperties":
+        self._call("getUserDefinedProperties")
+        return self._doc.user_defined
+
+class _UserDefinedProperties(_Object):
+    """ PropertyBag: properties are added and removed at run time """
+
+    def getPropertySetInfo(self) -> "_PropertySetInfo":
+        self._call("getPropertySetInfo")
+        return _PropertySetInfo(self._doc, set(self._properties))
+
+    def addProperty(self, name: str, attributes: int, default):
+        self._call("addProperty")
+        if name in self._properties:
+            raise PropertyExistException(name)
+        self._set_property(name, default)
+
+    def removeProperty(self, name: str):
+        self._call("removeProperty")
+        old = self._get_property(name)
+        properties = self._properties
+        self._doc._record(lambda: properties.__setitem__(name, old))
+        del properties[name]
+
+    def setPropertyValue(self, name: str, value):
+        self._call("setPropertyValue")
+        self._get_property(name)
+        self._set_property(name, value)
+
+class _PropertySetInfo(_Object):
+    def __init__(self, doc: FakeDocument, names: typing.Set[str]):
+        super().__init__(doc)
+        self.names = names
+
+    def hasPropertyByName(self, name: str) -> bool:
+        self._call("hasPropertyByName")
+        return name in self.names
+
+# ========
+#  STYLES
+# ========
+
+class _StyleFamilies(_Object):
+    def __init__(self, doc: FakeDocument, families: dict):
+        super().__init__(doc)
+        self.families = families
+
+    def getByName(self, name: str) -> "_StyleFamily":
+        self._call("getByName")
+        if name not in self.families:
+            raise NoSuchElementException(name)
+        return self.families[name]
+
+    def hasByName(self, name: str) -> bool:
+        self._call("hasByName")
+        return name in self.families
+
+class _StyleFamily(_Object):
+    def __init__(self, doc: FakeDocument, name: str):
+        super().__init__(doc)
+        self.name = name
+        self.styles = {}  # name -> FakeStyle
+
+    def add_style(self, name: str, parent: typing.Optional[str] = None) -> "FakeStyle":
+        """ Builder: the style `name`, created if needed """
+        if name not in self.styles:
+            style = FakeStyle(self._doc)
+            style.name, style.parent = name, parent
+            self.styles[name] = style
+        return self.styles[name]
+
+    def hasByName(self, name: str) -> bool:
+        self._call("hasByName")
+        return name in self.styles
+
+    def getByName(self, name: str) -> "FakeStyle":
+        self._call("getByName")
+        if name not in self.styles:
+            raise NoSuchElementException(name)
+        return self.styles[name]
+
+    def getElementNames(self) -> typing.Tuple[str, ...]:
+        self._call("getElementNames")
+        return tuple(self.styles)
+
+    def createInstance(self) -> "FakeStyle":
+        self._call("createInstance")
+        return FakeStyle(self._doc)
+
+    def insertByName(self, name: str, style: "FakeStyle"):
+        self._call("insertByName")
+        if name in self.styles:
+            raise ValueError("style already exists: " + name)
+        style.name = name
+        self.styles[name] = style
+        self._doc._record(lambda: self.styles.pop(name, None))
+
+class FakeStyle(_Object):
+    def __init__(self, doc: FakeDocument):
+        super().__init__(doc)
+        self.name = None  # until inserted in a family
+        self.parent = None
+
+    def getName(self) -> typing.Optional[str]:
+        self._call("getName")
+        return self.name
+
+    def getParentStyle(self) -> typing.Optional[str]:
+        self._call("getParentStyle")
+        return self.parent
+
+    def setParentStyle(self, parent: str):
+        self._call("setParentStyle")
+        old = self.parent
+        self._doc._record(lambda: setattr(self, "parent", old))
+        self.parent = parent
+
+# =================
+#  PAGES AND SHAPES
+# =================
+
+class FakePage(_Container):
+    def __init__(self, doc: FakeDocument, width: int, height: int):
+        super().__init__(doc, [], {"Width": width, "Height": height})
+
+    def add_text_shape(self, text: str, x: int = 0, y: int = 0, width: int = 10000, height: int = 1000,
+                       layer: str = "layout", style: typing.Optional[str] = None,
+                       auto_grow: bool = False,
+                       paragraphs: typing.Optional[typing.List[tuple]] = None) -> "FakeShape":
+        """ Builder: a text shape, its `style` created if needed
+
+        `paragraphs` are (text, NumberingLevel, CharColor or None) as
+        an alternative to `text`.
+        """
+        shape = FakeShape(self._doc, TEXT_SHAPE_SERVICES)
+        shape._properties.update({
+            "LayerName": layer, "Position": Point(x, y), "Size": Size(width, height),
+            "Style": self._doc.graphics.add_style(style or "standard"),
+            "TextAutoGrowHeight": auto_grow, "TextAutoGrowWidth": auto_grow})
+        if paragraphs is not None:
+            shape.paragraphs = [_Paragraph(line, {"NumberingLevel": level,
+                                                  "CharColor": -1 if color is None else color})
+                                for line, level, color in paragraphs] or [_Paragraph("")]
+        else:
+            shape.paragraphs = [_Paragraph(line) for line in text.split("\n")]
+        self._items.append(shape)
+        return shape
+
+    def add_graphic_shape(self, x: int = 0, y: int = 0, width: int = 10000, height: int = 10000) -> "FakeShape":
+        """ Builder: a shape without text (a picture) """
+        shape = FakeShape(self._doc, GRAPHIC_SHAPE_SERVICES)
+        shape._properties.update({"Position": Point(x, y), "Size": Size(width, height)})
+        self._items.append(shape)
+        return shape
+
+    def add(self, shape: "FakeShape"):
+        self._call("add")
+        if shape in self._items:
+            raise ValueError("shape already on the page")
+        self._items.append(shape)
+        self._doc._record(lambda: self._items.remove(shape))
+
+    def remove(self, shape: "FakeShape"):
+        self._call("remove")
+        index = self._items.index(shape)
+        del self._items[index]
+        self._doc._record(lambda: self._items.insert(index, shape))
+
+class _Paragraph(object):
+    __slots__ = ("text", "properties")
+
+    def __init__(self, text: str, properties: typing.Optional[dict] = None):
+        self.text = text
+        self.properties = dict(PARAGRAPH_DEFAULTS)
+        if properties:
+            self.properties.update(properties)
+
+    def copy(self) -> "_Paragraph":
+        return _Paragraph(self.text, self.properties)
+
+class FakeShape(_Object):
+    """ A drawing shape; text shapes are their own XText
+
+    The text is a list of paragraphs. Character properties are held per
+    paragraph: setting one on a range sets it on every paragraph the
+    range has a character of.
+    """
+
+    def __init__(self, doc: FakeDocument, services: typing.Tuple[str, ...]):
+        super().__init__(doc, {"Position": Point(0, 0), "Size": Size(0, 0),
+                               "Style": doc.graphics.styles["standard"]})
+        if "com.sun.star.drawing.Text" in services:
+            self._properties.update(SHAPE_DEFAULTS)
+        self.services = services
+        self.paragraphs = [_Paragraph("")]
+        self._starts = None  # UTF-16 offset of each paragraph, cached
+
+    def dump(self) -> tuple:
+        style = self._properties.get("Style")
+        position = self._properties["Position"]
+        return ("\n".join(paragraph.text for paragraph in self.paragraphs), position.X, position.Y,
+                style.name if style is not None else None,
+                [(paragraph.text, paragraph.properties["NumberingLevel"],
+                  paragraph.properties["CharColor"] if paragraph.properties["CharColor"] != -1 else None)
+                 for paragraph in self.paragraphs])
+
+    # -------
+    #  Shape
+    # -------
+
+    def getSupportedServiceNames(self) -> typing.Tuple[str, ...]:
+        self._call("getSupportedServiceNames")
+        return self.services
+
+    def supportsService(self, service: str) -> bool:
+        self._call("supportsService")
+        return service in self.services
+
+    def getPosition(self) -> Point:
+        self._call("getPosition")
+        return self._properties["Position"]
+
+    def setPosition(self, position):
+        self._call("setPosition")
+        self._set_property("Position", Point(position.X, position.Y))
+
+    def getSize(self) -> Size:
+        self._call("getSize")
+        return self._properties["Size"]
+
+    def setSize(self, size):
+        self._call("setSize")
+        self._set_property("Size", Size(size.Width, size.Height))
+
+    # ------
+    #  Text
+    # ------
+
+    def _set_paragraphs(self, paragraphs: typing.List[_Paragraph]):
+        old = self.paragraphs
+        self._doc._record(lambda: self._restore_paragraphs(old))
+        self._restore_paragraphs(paragraphs)
+
+    def _restore_paragraphs(self, paragraphs: typing.List[_Paragraph]):
+        self.paragraphs = paragraphs
+        self._starts = None
+
+    def _paragraph_starts(self) -> typing.List[int]:
+        if self._starts is None:
+            starts, offset = [], 0
+            for paragraph in self.paragraphs:
+                starts.append(offset)
+                offset += _utf16_length(paragraph.text) + 1
+            self._starts = starts
+        return self._starts
+
+    def _length(self) -> int:
+        return self._paragraph_starts()[-1] + _utf16_length(self.paragraphs[-1].text)
+
+    def _set_range_property(self, start: int, end: int, name: str, value):
+        """ Set `name` on the paragraphs of [start, end) """
+        starts = self._paragraph_starts()
+        first = bisect.bisect_right(starts, start) - 1
+        changed = []
+        for i in range(first, len(starts)):
+            paragraph_start = starts[i]
+            paragraph_end = paragraph_start + _utf16_length(self.paragraphs[i].text)
+            if paragraph_start > end:
+                break
+            if name in PARAGRAPH_PROPERTIES:
+                touched = True  # the range starts, ends or goes through it
+            elif paragraph_end > paragraph_start:
+                touched = max(start, paragraph_start) < min(end, paragraph_end)
+            else:  # empty paragraph: its break is selected
+                touched = start <= paragraph_start < end
+            if touched:
+                changed.append(i)
+        if not changed:
+            return
+        old = [(i, self.paragraphs[i].properties.get(name)) for i in changed]
+
+        def undo():
+            for i, value in old:
+                self.paragraphs[i].properties[name] = value
+        self._doc._record(undo)
+        for i in changed:
+            self.paragraphs[i].properties[name] = value
+
+    def getText(self) -> "FakeShape":
+        self._call("getText")
+        return self
+
+    def getString(self) -> str:
+        self._call("getString")
+        return "\n".join(paragraph.text for paragraph in self.paragraphs)
+
+    def setString(self, text: str):
+        self._call("setString")
+        self._set_paragraphs([_Paragraph(line) for line in text.split("\n")])
+
+    def createEnumeration(self) -> "_Enumeration":
+        self._call("createEnumeration")
+        return _Enumeration(self._doc, [_TextParagraph(self._doc, self, paragraph)
+                                        for paragraph in self.paragraphs])
+
+    def createTextCursor(self) -> "_TextCursor":
+        self._call("createTextCursor")
+        return _TextCursor(self._doc, self)
+
+    def appendTextPortion(self, text: str, properties=()):
+        """ XTextPortionAppend: `text` at the end of the last paragraph """
+        self._call("appendTextPortion")
+        paragraphs = [paragraph.copy() for paragraph in self.paragraphs]
+        lines = text.split("\n")
+        paragraphs[-1].text += lines[0]
+        paragraphs += [_Paragraph(line, paragraphs[-1].properties) for line in lines[1:]]
+        start = self._length()
+        self._set_paragraphs(paragraphs)
+        for prop in properties:
+            self._set_range_property(start, self._length(), prop.Name, prop.Value)
+
+    def finishParagraph(self, properties=()):
+        """ XParagraphAppend: `properties` on the last paragraph, then a new one """
+        self._call("finishParagraph")
+        last = self.paragraphs[-1]
+        self._set_paragraphs(self.paragraphs + [_Paragraph("", last.properties)])
+        for prop in properties:
+            self._set_range_property(self._paragraph_starts()[-2], self._paragraph_starts()[-2], prop.Name,
+                                     prop.Value)
+
+class _Enumeration(_Object):
+    def __init__(self, doc: FakeDocument, items: list):
+        super().__init__(doc)
+        self.items = collections.deque(items)
+
+    def hasMoreElements(self) -> bool:
+        self._call("hasMoreElements")
+        return bool(self.items)
+
+    def nextElement(self):
+        self._call("nextElement")
+        if not self.items:
+            raise NoSuchElementException()
+        return self.items.popleft()
+
+class _TextParagraph(_Object):
+    """ A paragraph of a text, as enumerated """
+
+    def __init__(self, doc: FakeDocument, shape: FakeShape, paragraph: _Paragraph):
+        super().__init__(doc)
+        self.shape = shape
+        self.paragraph = paragraph
+
+    def getString(self) -> str:
+        self._call("getString")
+        return self.paragraph.text
+
+    def _get_property(self, name: str):
+        if name not in self.paragraph.properties:
+            raise UnknownPropertyException(name)
+        return self.paragraph.properties[name]
+
+    def _set_property(self, name: str, value):
+        start = self.shape._paragraph_starts()[self.shape.paragraphs.index(self.paragraph)]
+        self.shape._set_range_property(start, start + max(_utf16_length(self.paragraph.text), 1), name, value)
+
+class _TextCursor(_Object):
+    """ A selection [start, end) of a text, in UTF-16 code units """
+
+    def __init__(self, doc: FakeDocument, shape: FakeShape):
+        super().__init__(doc)
+        self.shape = shape
+        self.anchor = 0
+        self.position = 0
+
+    def _range(self) -> typing.Tuple[int, int]:
+        return min(self.anchor, self.position), max(self.anchor, self.position)
+
+    def _move(self, position: int, expand: bool):
+        self.position = position
+        if not expand:
+            self.anchor = position
+
+    def gotoStart(self, expand: bool):
+        self._call("gotoStart")
+        self._move(0, expand)
+
+    def gotoEnd(self, expand: bool):
+        self._call("gotoEnd")
+        self._move(self.shape._length(), expand)
+
+    def goRight(self, count: int, expand: bool) -> bool:
+        self._call("goRight")
+        if not 0 <= count <= 0x7fff:
+            raise OverflowError("goRight takes a short")
+        # As far as the end of the text, False if it is not that far
+        target = self.position + count
+        self._move(min(target, self.shape._length()), expand)
+        return self.position == target
+
+    def goLeft(self, count: int, expand: bool) -> bool:
+        self._call("goLeft")
+        if not 0 <= count <= 0x7fff:
+            raise OverflowError("goLeft takes a short")
+        target = self.position - count
+        self._move(max(target, 0), expand)
+        return self.position == target
+
+    def collapseToStart(self):
+        self._call("collapseToStart")
+        self.anchor = self.position = self._range()[0]
+
+    def collapseToEnd(self):
+        self._call("collapseToEnd")
+        self.anchor = self.position = self._range()[1]
+
+    def getString(self) -> str:
+        self._call("getString")
+        start, end = self._range()
+        text = "\n".join(paragraph.text for paragraph in self.shape.paragraphs)
+        return text.encode("utf-16-le")[2 * start:2 * end].decode("utf-16-le")
+
+    def _set_property(self, name: str, value):
+        start, end = self._range()
+        if start < end:  # a collapsed cursor has no text to set it on
+            self.shape._set_range_property(start, end, name, value)
+
+    def setPropertyToDefault(self, name: str):
+        self._call("setPropertyToDefault")
+        self._set_property(name, PARAGRAPH_DEFAULTS.get(name))
+
+    def _get_property(self, name: str):
+        start = self._range()[0]
+        starts = self.shape._paragraph_starts()
+        paragraph = self.shape.paragraphs[bisect.bisect_right(starts, start) - 1]
+        if name not in paragraph.properties:
+            raise UnknownPropertyException(name)
+        return paragraph.properties[name]
+
+# =====
+#  ODF
+# =====
+
+def load_odf(path: str, latency: float = 0.0, visible: bool = False) -> FakeDocument:
+    """ A fake document with the text shapes of an .odp """
+    import breadcrumbs_odf
+    doc = None
+    with zipfile.ZipFile(path) as zin:
+        backend = breadcrumbs_odf.OdfBackend(zin)
+        for odf_page in backend.get_pages():
+            if doc is None:
+                doc = FakeDocument(latency, visible, *(odf_page.size if odf_page.size[0] else
+                                                       (PAGE_WIDTH, PAGE_HEIGHT)))
+            page = doc.add_page(*(odf_page.size if odf_page.size[0] else (None, None)))
+            for shape in odf_page.shapes:
+                (width, height), (x, y) = shape.size, shape.position
+                page.add_text_shape(backend.get_string(shape), x, y, width, height, layer=shape.layer or "layout",
+                                    style=shape.style_name or None, auto_grow=shape.auto_grow,
+                                    paragraphs=backend.get_toc_lines(shape))
+        if doc is None:
+            doc = FakeDocument(latency, visible)
+    return doc